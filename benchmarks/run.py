@@ -0,0 +1,297 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from loguru import logger
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.backtest.backtester import Backtester
+from src.execution.paper_trader import PaperTrader
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.strategy.indicators import add_all_indicators, align_panel
+
+
+# Benchmark offline (nessun MT5 o TwelveData) su OHLCV sintetico
+# deterministico. Uso:
+#   python -m benchmarks.run                      # profilo quick, confronto con la baseline
+#   python -m benchmarks.run --profile full --update-baseline
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+
+# (barre totali, simboli): le barre sono divise tra i simboli, così la
+# memoria dipende solo dalla dimensione e non dal numero di simboli
+PROFILES = {
+    'quick': [(10_000, 1), (10_000, 10)],
+    'full': [(10_000, 1), (100_000, 10), (1_000_000, 1), (1_000_000, 10), (1_000_000, 50)],
+    'large': [(10_000_000, 1), (10_000_000, 50)],
+}
+
+# Chiamate da cronometrare per un'esecuzione del caso
+Calls = Iterable[Callable[[], object]]
+
+
+def synthetic_bars(periods: int, seed: int, start: str = '2020-01-01', freq: str = '5min') -> pd.DataFrame:
+    # Random walk con spread e volumi casuali, sempre uguale a parità di seed
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0004, periods))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0003, periods))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, periods).astype(float),
+    }, index=pd.date_range(start=start, periods=periods, freq=freq))
+
+
+def synthetic_symbols(bars: int, symbols: int) -> Dict[str, pd.DataFrame]:
+    per_symbol = bars // symbols
+    return {f'SYM{i:02d}': synthetic_bars(per_symbol, i) for i in range(symbols)}
+
+
+def bench_indicators(data: Dict[str, pd.DataFrame]) -> Calls:
+    return [lambda df=df: add_all_indicators(df) for df in data.values()]
+
+
+def bench_signals(data: Dict[str, pd.DataFrame]) -> Calls:
+    strategy = EMAVWAPStrategy()
+    return [lambda df=df: strategy.generate_signals(df) for df in data.values()]
+
+
+def bench_panel_signals(data: Dict[str, pd.DataFrame]) -> Calls:
+    # Tutti i simboli in un solo passaggio, come PortfolioBacktester
+    strategy = EMAVWAPStrategy()
+    _, _, panel = align_panel(data)
+    return [lambda: strategy.generate_panel_signals(panel)]
+
+
+def bench_paper_update(data: Dict[str, pd.DataFrame], positions: int = 5) -> Calls:
+    # Una chiamata per barra e simbolo, come nel loop di paper trading:
+    # update_bar valuta le posizioni aperte e quelle chiuse vengono
+    # riaperte, così il libro resta di `positions` posizioni per simbolo
+    trader = PaperTrader()
+    arrays = {
+        symbol: (df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy())
+        for symbol, df in data.items()
+    }
+
+    def refill(symbol: str, price: float):
+        for k in range(positions - len(trader.book.get(symbol, ()))):
+            width = 0.001 * (k + 1)
+            if k % 2:
+                trader.open_position(symbol, 'short', price, 0.1, price + width, price - 2 * width)
+            else:
+                trader.open_position(symbol, 'long', price, 0.1, price - width, price + 2 * width)
+
+    for symbol, (_, _, close) in arrays.items():
+        refill(symbol, close[0])
+
+    def step(symbol: str, i: int):
+        high, low, close = arrays[symbol]
+        trader.update_bar(symbol, high[i], low[i])
+        refill(symbol, close[i])
+
+    length = min(len(values[0]) for values in arrays.values())
+    return (
+        lambda symbol=symbol, i=i: step(symbol, i)
+        for i in range(1, length)
+        for symbol in arrays
+    )
+
+
+def bench_backtest(data: Dict[str, pd.DataFrame]) -> Calls:
+    return [lambda df=df: Backtester().run(df) for df in data.values()]
+
+
+# nome -> (preparazione, barre totali massime). backtrader elabora qualche
+# migliaio di barre al secondo e update_bar è una chiamata Python per barra:
+# oltre il limite il caso viene saltato
+CASES: Dict[str, Tuple[Callable[[Dict[str, pd.DataFrame]], Calls], Optional[int]]] = {
+    'indicators': (bench_indicators, None),
+    'signals': (bench_signals, None),
+    'panel_signals': (bench_panel_signals, None),
+    'paper_update': (bench_paper_update, 100_000),
+    'backtest': (bench_backtest, 100_000),
+}
+
+
+def run_case(
+    name: str,
+    data: Dict[str, pd.DataFrame],
+    repeat: int = 3
+) -> Dict[str, float]:
+    prepare, _ = CASES[name]
+    bars = sum(len(df) for df in data.values())
+
+    # Tempi senza tracemalloc (rallenta le allocazioni): throughput dalla
+    # ripetizione migliore, latenze per chiamata su tutte le ripetizioni
+    latencies: List[int] = []
+    best = float('inf')
+    for _ in range(repeat):
+        calls = prepare(data)
+        total = 0
+        for call in calls:
+            started = time.perf_counter_ns()
+            call()
+            elapsed = time.perf_counter_ns() - started
+            latencies.append(elapsed)
+            total += elapsed
+        best = min(best, total / 1e9)
+
+    # Picco di memoria allocata durante una ripetizione separata
+    calls = prepare(data)
+    tracemalloc.start()
+    try:
+        for call in calls:
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies_us = np.asarray(latencies) / 1e3
+    return {
+        'case': name,
+        'bars': bars,
+        'symbols': len(data),
+        'calls': len(latencies) // repeat,
+        'seconds': best,
+        'throughput': bars / best if best else 0.0,
+        'p50_us': float(np.percentile(latencies_us, 50)),
+        'p99_us': float(np.percentile(latencies_us, 99)),
+        'max_us': float(latencies_us.max()),
+        'peak_mb': peak / 1024 / 1024,
+    }
+
+
+def run_profile(
+    sizes: List[Tuple[int, int]],
+    cases: Optional[List[str]] = None,
+    repeat: int = 3
+) -> List[Dict[str, float]]:
+    results = []
+    for bars, symbols in sizes:
+        data = synthetic_symbols(bars, symbols)
+        for name in cases or list(CASES):
+            limit = CASES[name][1]
+            if limit is not None and bars > limit:
+                logger.info(f"Skipping {name} at {bars} bars (limit {limit})")
+                continue
+            logger.info(f"Running {name} on {bars} bars x {symbols} symbols")
+            results.append(run_case(name, data, repeat))
+        del data
+    return results
+
+
+def result_key(result: Dict) -> str:
+    return f"{result['case']}/{result['bars']}x{result['symbols']}"
+
+
+def compare(
+    results: List[Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float = 0.3,
+    memory_tolerance: float = 0.2
+) -> List[str]:
+    # Regressioni rispetto alla baseline: throughput più basso o latenza
+    # mediana più alta oltre tolerance, picco di memoria oltre
+    # memory_tolerance (con 1 MB di margine per i casi piccoli)
+    regressions = []
+    for result in results:
+        key = result_key(result)
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result['throughput'] < reference['throughput'] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['throughput']:.0f} < {reference['throughput']:.0f} bars/s"
+            )
+        if result['p50_us'] > reference['p50_us'] * (1 + tolerance):
+            regressions.append(
+                f"{key}: p50 latency {result['p50_us']:.1f} > {reference['p50_us']:.1f} µs"
+            )
+        if result['peak_mb'] > reference['peak_mb'] * (1 + memory_tolerance) + 1.0:
+            regressions.append(
+                f"{key}: peak memory {result['peak_mb']:.1f} > {reference['peak_mb']:.1f} MB"
+            )
+    return regressions
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+
+def load_baseline(path: Path) -> Dict:
+    if not path.exists():
+        return {'machine': {}, 'results': {}}
+    return json.loads(path.read_text())
+
+
+def save_baseline(path: Path, results: List[Dict[str, float]]):
+    # Aggiorna solo i casi eseguiti, gli altri restano
+    baseline = load_baseline(path)
+    baseline['machine'] = machine_info()
+    baseline['results'].update({result_key(result): result for result in results})
+    baseline['results'] = dict(sorted(baseline['results'].items()))
+    path.write_text(json.dumps(baseline, indent=2) + '\n')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Offline performance benchmarks')
+    parser.add_argument('--profile', default='quick', choices=list(PROFILES), help='Data sizes to run')
+    parser.add_argument('--case', action='append', choices=list(CASES), help='Run only these cases')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed repetitions per case')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed throughput/latency regression')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='Allowed peak memory regression')
+    parser.add_argument('--update-baseline', action='store_true', help='Store results as the new baseline')
+    parser.add_argument('--output', type=Path, help='Save results to JSON')
+    args = parser.parse_args(argv)
+
+    # I log delle operazioni misurate (trade aperti, backtest) falserebbero i tempi
+    logger.disable('src')
+    try:
+        results = run_profile(PROFILES[args.profile], args.case, args.repeat)
+    finally:
+        logger.enable('src')
+
+    table = pd.DataFrame(results)[
+        ['case', 'bars', 'symbols', 'seconds', 'throughput', 'p50_us', 'p99_us', 'max_us', 'peak_mb']
+    ]
+    logger.info(f"\n{table.to_string(index=False, float_format=lambda value: f'{value:.2f}')}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        logger.info(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline['machine'] and baseline['machine'] != machine_info():
+        logger.warning(f"Baseline recorded on a different setup: {baseline['machine']}")
+    missing = [result_key(result) for result in results if result_key(result) not in baseline['results']]
+    if missing:
+        logger.warning(f"No baseline for: {', '.join(missing)}")
+
+    regressions = compare(results, baseline['results'], args.tolerance, args.memory_tolerance)
+    for regression in regressions:
+        logger.error(f"Regression {regression}")
+    if regressions:
+        return 1
+    logger.info("No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
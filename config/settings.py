@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,15 @@ class Settings(BaseSettings):
     mt5_password: str
     mt5_server: str
     
+    # Terminale MT5 simulato (src/data/mt5_sim.py), per Linux e test di carico
+    mt5_simulator: bool = False
+    mt5_sim_bar_store: str = ""  # archivio con le barre da servire; vuoto: sintetiche
+    mt5_sim_latency: float = 0.02  # secondi per chiamata
+    mt5_sim_order_latency: float = 0.08  # round-trip di order_send
+    mt5_sim_jitter: float = 0.005  # deviazione standard della latenza
+    mt5_sim_reject_rate: float = 0.0  # probabilità di rifiuto degli ordini
+    mt5_sim_error_rate: float = 0.0  # probabilità di errore di copy_rates_range
+    
     # TwelveData Configuration
     twelvedata_api_key: str
     
@@ -26,6 +35,34 @@ class Settings(BaseSettings):
     
     # Execution
     mode: str = "paper"  # backtest, paper, live
+    bar_close_offset: float = 2.0  # secondi dopo la chiusura della barra
+    loop_workers: int = 8  # thread per l'analisi parallela dei simboli
+    broker_utc_offset_hours: float = 0.0  # orario del server MT5 meno UTC, per trovare le barre chiuse
+    
+    # Metriche di latenza (paper/live), endpoint Prometheus locale
+    metrics_enabled: bool = True
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9108
+    
+    # Failover dati: TwelveData come riserva di MT5 nel loop di trading
+    use_data_hedging: bool = False
+    hedge_after: float = 2.0  # secondi di attesa del primario prima della richiesta di riserva
+    # Differenza tra orario del broker e TwelveData (UTC): obbligatoria con
+    # l'hedging, altrimenti si mescolerebbero barre con orari diversi
+    twelvedata_time_offset_hours: Optional[float] = None
+    
+    # Archivio locale delle barre (Parquet)
+    use_bar_store: bool = True
+    bar_store_path: str = "data/bars"
+    resample_from_m1: bool = True  # scarica solo M1 e aggrega gli altri timeframe
+    intrabar_fills: bool = True  # paper trading: barre con SL e TP risolte con i dati M1
+    
+    # Cache dei risultati dei backtest
+    use_result_cache: bool = True
+    result_cache_path: str = "data/cache/backtests"
+    result_cache_max_mb: float = 512.0
+    indicator_cache_max_mb: float = 256.0  # serie di indicatori in memoria (ottimizzazione)
+    indicator_cache_path: str = "data/cache/indicators.pkl"  # conservate tra un'esecuzione e l'altra
     
     # Logging
     log_level: str = "INFO"
@@ -0,0 +1,445 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+
+# Metriche di performance su array NumPy, condivise da backtest (equity
+# per barra) e paper trading (equity per trade chiuso). Convenzioni:
+# drawdown in percentuale dal picco (incluso il capitale iniziale),
+# durate del drawdown in numero di punti dell'equity, rapporti annualizzati
+# con periods_per_year punti per anno, None quando non calcolabili.
+
+YEAR = np.timedelta64(int(365.25 * 24 * 3600), 's')
+
+# Righe per blocco nelle finestre mobili (righe x finestra valori)
+ROLLING_BLOCK = 1 << 22
+
+ArrayLike = Union[np.ndarray, pd.Series, list]
+
+
+def _values(values: ArrayLike) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def simple_returns(equity: ArrayLike, initial: Optional[float] = None) -> np.ndarray:
+    equity = _values(equity)
+    previous = equity[:-1] if initial is None else np.concatenate(([initial], equity[:-1]))
+    current = equity[1:] if initial is None else equity
+    return current / previous - 1.0
+
+
+def periods_per_year(times: ArrayLike) -> float:
+    # Punti per anno osservati nei dati: tiene conto di weekend e buchi,
+    # a differenza di una frequenza nominale
+    times = np.asarray(times, dtype='datetime64[ns]')
+    if len(times) < 2:
+        return 1.0
+    span = (times[-1] - times[0]) / YEAR
+    return (len(times) - 1) / span if span > 0 else 1.0
+
+
+def drawdown(equity: ArrayLike, initial: Optional[float] = None) -> np.ndarray:
+    # Drawdown per punto, come frazione del picco
+    equity = _values(equity)
+    if len(equity) == 0:
+        return equity
+    peak = np.maximum.accumulate(equity if initial is None else np.maximum(equity, initial))
+    return (peak - equity) / peak
+
+
+def max_drawdown(equity: ArrayLike, initial: Optional[float] = None) -> float:
+    dd = drawdown(equity, initial)
+    return float(dd.max() * 100) if len(dd) else 0.0
+
+
+def _underwater_lengths(equity: np.ndarray, initial: Optional[float] = None) -> np.ndarray:
+    # Punti trascorsi dall'ultimo picco, per ogni punto
+    peak = np.maximum.accumulate(equity if initial is None else np.maximum(equity, initial))
+    index = np.arange(len(equity))
+    at_peak = equity >= peak
+    start = -1 if initial is not None and equity[0] < initial else 0
+    last_peak = np.maximum.accumulate(np.where(at_peak, index, start))
+    return index - last_peak
+
+
+def max_drawdown_duration(equity: ArrayLike, initial: Optional[float] = None) -> int:
+    equity = _values(equity)
+    if len(equity) == 0:
+        return 0
+    return int(_underwater_lengths(equity, initial).max())
+
+
+def sharpe_ratio(
+    returns: ArrayLike,
+    periods_per_year: float = 1.0,
+    riskfree: float = 0.0
+) -> Optional[float]:
+    # riskfree annuo, riportato al periodo dei rendimenti
+    excess = _values(returns) - riskfree / periods_per_year
+    if len(excess) < 2:
+        return None
+    deviation = excess.std()
+    if deviation == 0 or np.isnan(deviation):
+        return None
+    return float(excess.mean() / deviation * np.sqrt(periods_per_year))
+
+
+def sortino_ratio(
+    returns: ArrayLike,
+    periods_per_year: float = 1.0,
+    riskfree: float = 0.0
+) -> Optional[float]:
+    # Come Sharpe, ma con la sola deviazione dei rendimenti negativi
+    excess = _values(returns) - riskfree / periods_per_year
+    if len(excess) < 2:
+        return None
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    if downside == 0 or np.isnan(downside):
+        return None
+    return float(excess.mean() / downside * np.sqrt(periods_per_year))
+
+
+def annualized_return(total_return: float, years: float) -> Optional[float]:
+    # total_return come frazione (0.1 = +10%)
+    if years <= 0 or total_return <= -1.0:
+        return None
+    # Periodi brevissimi (es. pochi trade ravvicinati) non sono annualizzabili
+    with np.errstate(over='ignore'):
+        cagr = np.float64(1.0 + total_return) ** (1.0 / years) - 1.0
+    return float(cagr) if np.isfinite(cagr) else None
+
+
+def calmar_ratio(
+    equity: ArrayLike,
+    periods_per_year: float = 1.0,
+    initial: Optional[float] = None
+) -> Optional[float]:
+    # Rendimento annualizzato / max drawdown
+    equity = _values(equity)
+    if len(equity) < 2:
+        return None
+    start = equity[0] if initial is None else initial
+    years = (len(equity) - (1 if initial is None else 0)) / periods_per_year
+    cagr = annualized_return(equity[-1] / start - 1.0, years)
+    dd = max_drawdown(equity, initial) / 100
+    if cagr is None or dd == 0:
+        return None
+    return float(cagr / dd)
+
+
+def annual_sharpe_ratio(
+    equity: pd.Series,
+    initial: float,
+    riskfree: float = 0.01
+) -> Optional[float]:
+    # Definizione del SharpeRatio di backtrader (default dei backtest):
+    # rendimenti per anno solare, deviazione standard di popolazione
+    if equity.empty:
+        return None
+    return _annual_sharpe(equity.groupby(equity.index.year).last().to_numpy(), initial, riskfree)
+
+
+def _annual_sharpe(year_end: np.ndarray, initial: float, riskfree: float = 0.01) -> Optional[float]:
+    # year_end: equity all'ultima osservazione di ogni anno solare, in ordine
+    previous = np.concatenate(([initial], year_end[:-1]))
+    excess = year_end / previous - 1.0 - riskfree
+    deviation = excess.std()
+    if deviation == 0 or np.isnan(deviation):
+        return None
+    return float(excess.mean() / deviation)
+
+
+def trade_metrics(
+    profit: ArrayLike,
+    entry_time: Optional[ArrayLike] = None,
+    exit_time: Optional[ArrayLike] = None
+) -> Dict[str, Optional[float]]:
+    profit = _values(profit)
+    gross_profit = float(profit[profit > 0].sum())
+    gross_loss = float(-profit[profit < 0].sum())
+    duration = None
+    if entry_time is not None and exit_time is not None and len(profit):
+        held = np.asarray(exit_time, dtype='datetime64[ns]') - np.asarray(entry_time, dtype='datetime64[ns]')
+        duration = float(held.astype(np.int64).mean() / 60e9)
+    return {
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else None,
+        'expectancy': float(profit.mean()) if len(profit) else None,
+        'average_trade_duration': duration,
+    }
+
+
+def summarize(
+    equity: ArrayLike,
+    times: Optional[ArrayLike] = None,
+    initial: Optional[float] = None,
+    profit: Optional[ArrayLike] = None,
+    entry_time: Optional[ArrayLike] = None,
+    exit_time: Optional[ArrayLike] = None,
+    periods: Optional[float] = None
+) -> Dict[str, Optional[float]]:
+    # Metriche aggiuntive comuni a tutti i motori e al paper trading
+    equity = _values(equity)
+    if periods is None:
+        periods = periods_per_year(times) if times is not None else 1.0
+    returns = simple_returns(equity, initial)
+    return {
+        'sortino_ratio': sortino_ratio(returns, periods),
+        'calmar_ratio': calmar_ratio(equity, periods, initial),
+        'max_drawdown_duration': max_drawdown_duration(equity, initial),
+        **trade_metrics([] if profit is None else profit, entry_time, exit_time),
+    }
+
+
+# Versioni mobili: valore della metrica sulla finestra che termina in ogni
+# punto (NaN per i primi window - 1). Somme mobili con cumsum, O(n).
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumsum = np.concatenate(([0.0], np.cumsum(values)))
+        out[window - 1:] = cumsum[window:] - cumsum[:-window]
+    return out
+
+
+def rolling_sharpe(returns: ArrayLike, window: int, periods_per_year: float = 1.0) -> np.ndarray:
+    returns = _values(returns)
+    mean = _rolling_sum(returns, window) / window
+    variance = np.maximum(_rolling_sum(returns ** 2, window) / window - mean ** 2, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = mean / np.sqrt(variance) * np.sqrt(periods_per_year)
+    return np.where(variance > 0, ratio, np.nan)
+
+
+def rolling_sortino(returns: ArrayLike, window: int, periods_per_year: float = 1.0) -> np.ndarray:
+    returns = _values(returns)
+    mean = _rolling_sum(returns, window) / window
+    downside = np.sqrt(_rolling_sum(np.minimum(returns, 0.0) ** 2, window) / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = mean / downside * np.sqrt(periods_per_year)
+    return np.where(downside > 0, ratio, np.nan)
+
+
+def _combine_drawdown(first: tuple, second: tuple) -> tuple:
+    # (massimo, minimo, max drawdown frazionario) di due tratti consecutivi:
+    # il drawdown a cavallo va dal massimo del primo al minimo del secondo
+    high_a, low_a, dd_a = first
+    high_b, low_b, dd_b = second
+    cross = 1.0 - low_b / high_a
+    return (
+        np.maximum(high_a, high_b),
+        np.minimum(low_a, low_b),
+        np.maximum(np.maximum(dd_a, dd_b), cross)
+    )
+
+
+def rolling_max_drawdown(equity: ArrayLike, window: int) -> np.ndarray:
+    # Max drawdown (%) per finestra in O(n log window): i tratti di
+    # lunghezza 2^k si ottengono unendo due tratti di 2^(k-1), e ogni
+    # finestra è l'unione dei tratti corrispondenti ai bit di window
+    equity = _values(equity)
+    n = len(equity)
+    out = np.full(n, np.nan)
+    if n < window or window < 1:
+        return out
+
+    count = n - window + 1
+    power = (equity, equity, np.zeros(n))
+    length = 1
+    acc = None
+    covered = 0
+    while True:
+        if window & length:
+            piece = tuple(values[covered:covered + count] for values in power)
+            acc = piece if acc is None else _combine_drawdown(acc, piece)
+            covered += length
+        if covered == window:
+            break
+        size = len(power[0]) - length
+        power = _combine_drawdown(
+            tuple(values[:size] for values in power),
+            tuple(values[length:] for values in power)
+        )
+        length *= 2
+
+    out[window - 1:] = acc[2] * 100
+    return out
+
+
+def rolling_max_drawdown_duration(equity: ArrayLike, window: int) -> np.ndarray:
+    # Durata massima sotto il picco per finestra. Le finestre sono viste
+    # (sliding_window_view) elaborate a blocchi per limitare la memoria a
+    # ROLLING_BLOCK valori; costo O(n x window)
+    equity = _values(equity)
+    n = len(equity)
+    duration = np.full(n, np.nan)
+    if n < window or window < 1:
+        return duration
+
+    windows = np.lib.stride_tricks.sliding_window_view(equity, window)
+    index = np.arange(window)
+    rows = max(1, ROLLING_BLOCK // window)
+    for start in range(0, len(windows), rows):
+        block = windows[start:start + rows]
+        peak = np.maximum.accumulate(block, axis=1)
+        last_peak = np.maximum.accumulate(np.where(block >= peak, index, 0), axis=1)
+        duration[window - 1 + start:window - 1 + start + len(block)] = (index - last_peak).max(axis=1)
+    return duration
+
+
+def rolling_calmar(equity: ArrayLike, window: int, periods_per_year: float = 1.0) -> np.ndarray:
+    equity = _values(equity)
+    out = np.full(len(equity), np.nan)
+    if len(equity) < window:
+        return out
+    growth = equity[window - 1:] / equity[:len(equity) - window + 1]
+    cagr = growth ** (periods_per_year / (window - 1)) - 1.0 if window > 1 else np.zeros(len(growth))
+    dd = rolling_max_drawdown(equity, window)[window - 1:] / 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[window - 1:] = np.where(dd > 0, cagr / dd, np.nan)
+    return out
+
+
+def rolling_profit_factor(profit: ArrayLike, window: int) -> np.ndarray:
+    profit = _values(profit)
+    gains = _rolling_sum(np.maximum(profit, 0.0), window)
+    losses = _rolling_sum(np.maximum(-profit, 0.0), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(losses > 0, gains / losses, np.nan)
+
+
+def rolling_expectancy(profit: ArrayLike, window: int) -> np.ndarray:
+    return _rolling_sum(_values(profit), window) / window
+
+
+def rolling_trade_duration(entry_time: ArrayLike, exit_time: ArrayLike, window: int) -> np.ndarray:
+    held = np.asarray(exit_time, dtype='datetime64[ns]') - np.asarray(entry_time, dtype='datetime64[ns]')
+    return _rolling_sum(held.astype(np.int64) / 60e9, window) / window
+
+
+class PerformanceTracker:
+    # Stato incrementale delle stesse metriche, per la dashboard live:
+    # ogni aggiornamento (uno o più punti di equity, uno o più trade) costa
+    # quanto i nuovi valori e summary() è O(1), indipendentemente dallo
+    # storico. I risultati coincidono con le funzioni sugli array completi.
+    def __init__(self, initial_capital: float, periods_per_year: float = 1.0):
+        self.initial_capital = initial_capital
+        self.periods_per_year = periods_per_year
+        self.equity = initial_capital
+        self.peak = initial_capital
+        self.max_drawdown = 0.0
+        self.since_peak = 0
+        self.max_duration = 0
+        self.points = 0
+        self.sum_returns = 0.0
+        self.sum_squares = 0.0
+        self.sum_downside = 0.0
+        self.first_time: Optional[np.datetime64] = None
+        self.last_time: Optional[np.datetime64] = None
+        # Ultima equity di ogni anno solare, per annual_sharpe_ratio
+        self.year_end: Dict[int, float] = {}
+
+        self.trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.total_profit = 0.0
+        self.total_minutes = 0.0
+        self.timed_trades = 0
+
+    def update(
+        self,
+        equity: Union[float, ArrayLike],
+        time: Optional[Union[datetime, ArrayLike]] = None
+    ):
+        values = np.atleast_1d(_values(equity))
+        if len(values) == 0:
+            return
+
+        returns = values / np.concatenate(([self.equity], values[:-1])) - 1.0
+        self.sum_returns += float(returns.sum())
+        self.sum_squares += float((returns ** 2).sum())
+        self.sum_downside += float((np.minimum(returns, 0.0) ** 2).sum())
+
+        peak = np.maximum.accumulate(np.maximum(values, self.peak))
+        self.max_drawdown = max(self.max_drawdown, float(((peak - values) / peak).max() * 100))
+
+        # Durata sotto il picco, proseguendo quella in corso
+        index = np.arange(len(values))
+        last_peak = np.maximum.accumulate(np.where(values >= peak, index, -1 - self.since_peak))
+        underwater = index - last_peak
+        self.max_duration = max(self.max_duration, int(underwater.max()))
+        self.since_peak = int(underwater[-1])
+
+        self.peak = float(peak[-1])
+        self.equity = float(values[-1])
+        self.points += len(values)
+
+        if time is not None:
+            times = np.atleast_1d(np.asarray(time, dtype='datetime64[ns]'))
+            if self.first_time is None:
+                self.first_time = times[0]
+            self.last_time = times[-1]
+
+            # Ultimo punto di ogni anno presente nel blocco
+            years = np.broadcast_to(times, values.shape).astype('datetime64[Y]').astype(np.int64) + 1970
+            last = np.append(np.flatnonzero(years[1:] != years[:-1]), len(years) - 1)
+            for i in last:
+                self.year_end[int(years[i])] = float(values[i])
+
+    def add_trades(
+        self,
+        profit: Union[float, ArrayLike],
+        entry_time: Optional[ArrayLike] = None,
+        exit_time: Optional[ArrayLike] = None
+    ):
+        profit = np.atleast_1d(_values(profit))
+        self.trades += len(profit)
+        self.gross_profit += float(profit[profit > 0].sum())
+        self.gross_loss += float(-profit[profit < 0].sum())
+        self.total_profit += float(profit.sum())
+        if entry_time is not None and exit_time is not None:
+            held = (
+                np.atleast_1d(np.asarray(exit_time, dtype='datetime64[ns]'))
+                - np.atleast_1d(np.asarray(entry_time, dtype='datetime64[ns]'))
+            )
+            self.total_minutes += float(held.astype(np.int64).sum() / 60e9)
+            self.timed_trades += len(held)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        n = self.points
+        periods = self.periods_per_year
+        sharpe = sortino = calmar = None
+        if n >= 2:
+            mean = self.sum_returns / n
+            deviation = np.sqrt(max(self.sum_squares / n - mean ** 2, 0.0))
+            downside = np.sqrt(self.sum_downside / n)
+            sharpe = float(mean / deviation * np.sqrt(periods)) if deviation > 0 else None
+            sortino = float(mean / downside * np.sqrt(periods)) if downside > 0 else None
+
+            # Con i tempi l'anno è quello di calendario, altrimenti n / periods
+            if self.first_time is not None and self.last_time > self.first_time:
+                years = (self.last_time - self.first_time) / YEAR
+            else:
+                years = n / periods
+            cagr = annualized_return(self.equity / self.initial_capital - 1.0, years)
+            if cagr is not None and self.max_drawdown > 0:
+                calmar = cagr / (self.max_drawdown / 100)
+
+        annual_sharpe = None
+        if self.year_end:
+            year_end = np.array([self.year_end[year] for year in sorted(self.year_end)])
+            annual_sharpe = _annual_sharpe(year_end, self.initial_capital)
+
+        return {
+            'total_return': (self.equity / self.initial_capital - 1.0) * 100,
+            'sharpe_ratio': sharpe,
+            # Come annual_sharpe_ratio sull'equity completa (richiede i tempi)
+            'annual_sharpe_ratio': annual_sharpe,
+            'sortino_ratio': sortino,
+            'calmar_ratio': calmar,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_duration': self.max_duration,
+            'profit_factor': self.gross_profit / self.gross_loss if self.gross_loss > 0 else None,
+            'expectancy': self.total_profit / self.trades if self.trades else None,
+            'average_trade_duration': self.total_minutes / self.timed_trades if self.timed_trades else None,
+        }
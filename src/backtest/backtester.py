@@ -1,8 +1,75 @@
+import time
+import tracemalloc
 import backtrader as bt
+import numpy as np
 import pandas as pd
+from array import array
 from datetime import datetime
+from typing import Optional
 from loguru import logger
 from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.backtest.numpy_feed import NumpyData, bt_times
+from src.analytics.performance import annual_sharpe_ratio, max_drawdown, summarize
+
+
+class SeededEMA(bt.Indicator):
+    # EMA come calculate_ema (ewm con adjust=False): parte dal primo valore
+    # invece che dalla media delle prime period barre come bt.indicators.EMA.
+    # Il periodo minimo resta period, come l'EMA di backtrader
+    lines = ('ema',)
+    params = (('period', 9),)
+
+    def __init__(self):
+        self.alpha = 2.0 / (1.0 + self.p.period)
+        self.alpha1 = 1.0 - self.alpha
+        self.addminperiod(self.p.period)
+
+    def prenext(self):
+        if len(self) == 1:
+            self.lines.ema[0] = self.data[0]
+        else:
+            self.lines.ema[0] = self.lines.ema[-1] * self.alpha1 + self.data[0] * self.alpha
+
+    def next(self):
+        self.prenext()
+
+    def preonce(self, start, end):
+        self.once(start, end)
+
+    def once(self, start, end):
+        darray = self.data.array
+        larray = self.lines.ema.array
+        alpha, alpha1 = self.alpha, self.alpha1
+        prev = larray[start - 1] if start > 0 else darray[0]
+        for i in range(start, end):
+            larray[i] = prev = prev * alpha1 + darray[i] * alpha
+
+
+class CumulativeVWAP(bt.Indicator):
+    # VWAP come calculate_vwap, cumulato dall'inizio dei dati. Le somme
+    # sono tenute negli attributi: con exactbars=1 la linea non conserva
+    # il valore precedente (bt.indicators.Accum darebbe NaN)
+    lines = ('vwap',)
+
+    def __init__(self):
+        self.value = 0.0
+        self.volume = 0.0
+
+    def _update(self, high: float, low: float, close: float, volume: float) -> float:
+        self.value += (high + low + close) / 3 * volume
+        self.volume += volume
+        return self.value / self.volume if self.volume else float('nan')
+
+    def next(self):
+        data = self.data
+        self.lines.vwap[0] = self._update(data.high[0], data.low[0], data.close[0], data.volume[0])
+
+    def once(self, start, end):
+        data = self.data
+        high, low, close, volume = data.high.array, data.low.array, data.close.array, data.volume.array
+        larray = self.lines.vwap.array
+        for i in range(start, end):
+            larray[i] = self._update(high[i], low[i], close[i], volume[i])
 
 
 class EMAVWAPBTStrategy(bt.Strategy):
@@ -16,14 +83,13 @@ class EMAVWAPBTStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        self.ema_fast = bt.indicators.EMA(self.data.close, period=self.params.ema_fast)
-        self.ema_slow = bt.indicators.EMA(self.data.close, period=self.params.ema_slow)
-        self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
-        
-        # VWAP calculation
-        typical_price = (self.data.high + self.data.low + self.data.close) / 3
-        self.vwap = bt.indicators.SumN(typical_price * self.data.volume, period=20) / \
-                    bt.indicators.SumN(self.data.volume, period=20)
+        # Stessi indicatori di src.strategy.indicators (strategia live e
+        # motore vettoriale): EMA dal primo valore, ATR come media semplice
+        # del true range, VWAP cumulato dall'inizio dei dati
+        self.ema_fast = SeededEMA(self.data.close, period=self.params.ema_fast)
+        self.ema_slow = SeededEMA(self.data.close, period=self.params.ema_slow)
+        self.atr = bt.indicators.SMA(bt.indicators.TrueRange(self.data), period=self.params.atr_period)
+        self.vwap = CumulativeVWAP(self.data)
         
         self.order = None
         self.trades_count = 0
@@ -60,9 +126,10 @@ class EMAVWAPBTStrategy(bt.Strategy):
             sl_price = self.data.close[0] - (self.params.atr_sl_multiplier * self.atr[0])
             tp_price = self.data.close[0] + (self.params.atr_tp_multiplier * self.atr[0])
             
+            # SL e TP in OCO: eseguito uno, l'altro viene cancellato
             self.order = self.buy(size=size)
-            self.sell(size=size, exectype=bt.Order.Stop, price=sl_price)
-            self.sell(size=size, exectype=bt.Order.Limit, price=tp_price)
+            stop = self.sell(size=size, exectype=bt.Order.Stop, price=sl_price)
+            self.sell(size=size, exectype=bt.Order.Limit, price=tp_price, oco=stop)
         
         # Condizioni per SHORT
         elif self.ema_fast[0] < self.ema_slow[0] and \
@@ -78,38 +145,68 @@ class EMAVWAPBTStrategy(bt.Strategy):
             tp_price = self.data.close[0] - (self.params.atr_tp_multiplier * self.atr[0])
             
             self.order = self.sell(size=size)
-            self.buy(size=size, exectype=bt.Order.Stop, price=sl_price)
-            self.buy(size=size, exectype=bt.Order.Limit, price=tp_price)
+            stop = self.buy(size=size, exectype=bt.Order.Stop, price=sl_price)
+            self.buy(size=size, exectype=bt.Order.Limit, price=tp_price, oco=stop)
+
+
+class EquityRecorder(bt.Analyzer):
+    # Valore del conto a ogni barra e trade chiusi, in array compatti, per
+    # le metriche di src.analytics.performance
+    def start(self):
+        self.times = array('d')
+        self.values = array('d')
+        self.trades = {name: array('d') for name in ['entry', 'exit', 'pnlcomm']}
+
+    def next(self):
+        self.times.append(self.data.datetime[0])
+        self.values.append(self.strategy.broker.getvalue())
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self.trades['entry'].append(trade.dtopen)
+            self.trades['exit'].append(trade.dtclose)
+            self.trades['pnlcomm'].append(trade.pnlcomm)
+
+    def get_analysis(self):
+        return {
+            'times': bt_times(np.frombuffer(self.times)),
+            'equity': np.frombuffer(self.values),
+            'entry_time': bt_times(np.frombuffer(self.trades['entry'])),
+            'exit_time': bt_times(np.frombuffer(self.trades['exit'])),
+            'pnlcomm': np.frombuffer(self.trades['pnlcomm']),
+        }
 
 
 class Backtester:
     def __init__(
         self, 
         initial_capital: float = 10000.0,
-        commission: float = 0.0001
+        commission: float = 0.0001,
+        low_memory: bool = False,
+        trace_memory: bool = False
     ):
         self.initial_capital = initial_capital
         self.commission = commission
+        # exactbars=1: ogni linea tiene solo le barre che servono agli
+        # indicatori (niente preload né runonce, più lento ma a memoria
+        # costante); gli analizzatori usati non leggono lo storico delle linee
+        self.low_memory = low_memory
+        # Picco di memoria allocata durante il singolo run via tracemalloc
+        # (rallenta backtrader di diverse volte, quindi solo su richiesta)
+        self.trace_memory = trace_memory
         self.cerebro = None
+        self.stats: Optional[dict] = None
     
     def run(
         self, 
         data: pd.DataFrame, 
         strategy_params: dict = None
     ) -> dict:
-        self.cerebro = bt.Cerebro()
+        # Niente observer standard: servono solo per i grafici
+        self.cerebro = bt.Cerebro(stdstats=False)
         
-        # Converti DataFrame in formato Backtrader
-        bt_data = bt.feeds.PandasData(
-            dataname=data,
-            datetime=None,
-            open='Open',
-            high='High',
-            low='Low',
-            close='Close',
-            volume='Volume',
-            openinterest=-1
-        )
+        # Feed dagli array NumPy (DataFrame o MmapBars senza copie)
+        bt_data = NumpyData(dataname=data)
         
         self.cerebro.adddata(bt_data)
         
@@ -124,35 +221,73 @@ class Backtester:
         self.cerebro.broker.setcommission(commission=self.commission)
         
         # Aggiungi analizzatori
-        self.cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-        self.cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-        self.cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
-        self.cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
+        # Equity e trade registrati una volta: le metriche vengono da
+        # src.analytics.performance, come per gli altri motori
+        self.cerebro.addanalyzer(EquityRecorder, _name='equity')
         
         logger.info(f'Starting Portfolio Value: {self.cerebro.broker.getvalue():.2f}')
         
         # Esegui backtest
-        results = self.cerebro.run()
+        peak = None
+        # Se il tracing è già attivo (es. benchmark) si azzera solo il picco
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            if self.low_memory:
+                results = self.cerebro.run(exactbars=1)
+            else:
+                results = self.cerebro.run()
+            elapsed = time.perf_counter() - started
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            if tracing:
+                tracemalloc.stop()
         strat = results[0]
         
         final_value = self.cerebro.broker.getvalue()
         logger.info(f'Final Portfolio Value: {final_value:.2f}')
         
+        self.stats = {
+            'bars': len(data),
+            'elapsed': elapsed,
+            'bars_per_sec': len(data) / elapsed if elapsed else 0.0,
+            'peak_memory_mb': peak,
+        }
+        logger.info(
+            f"Run: {len(data)} bars in {elapsed:.2f}s ({self.stats['bars_per_sec']:.0f} bars/sec)"
+            f"{f', peak memory {peak:.1f} MB' if peak is not None else ''}"
+            f"{' (low memory)' if self.low_memory else ''}"
+        )
+        
         # Estrai metriche
-        sharpe = strat.analyzers.sharpe.get_analysis()
-        drawdown = strat.analyzers.drawdown.get_analysis()
-        trades = strat.analyzers.trades.get_analysis()
-        returns = strat.analyzers.returns.get_analysis()
+        recorded = strat.analyzers.equity.get_analysis()
+        equity = pd.Series(recorded['equity'], index=pd.DatetimeIndex(recorded['times']), name='Equity')
+        pnlcomm = recorded['pnlcomm']
+        total_trades = len(pnlcomm)
+        # Come TradeAnalyzer: un trade in pari conta come vinto
+        won_trades = int((pnlcomm >= 0).sum())
         
         return {
             'initial_value': self.initial_capital,
             'final_value': final_value,
             'total_return': ((final_value - self.initial_capital) / self.initial_capital) * 100,
-            'sharpe_ratio': sharpe.get('sharperatio', 0),
-            'max_drawdown': drawdown.max.drawdown,
-            'total_trades': trades.total.closed if hasattr(trades.total, 'closed') else 0,
-            'won_trades': trades.won.total if hasattr(trades, 'won') else 0,
-            'lost_trades': trades.lost.total if hasattr(trades, 'lost') else 0,
-            'win_rate': (trades.won.total / trades.total.closed * 100) 
-                       if hasattr(trades.total, 'closed') and trades.total.closed > 0 else 0
-        }
\ No newline at end of file
+            'sharpe_ratio': annual_sharpe_ratio(equity, self.initial_capital),
+            'max_drawdown': max_drawdown(recorded['equity'], self.initial_capital),
+            'total_trades': total_trades,
+            'won_trades': won_trades,
+            'lost_trades': total_trades - won_trades,
+            'win_rate': (won_trades / total_trades * 100) if total_trades > 0 else 0,
+            **summarize(
+                recorded['equity'],
+                recorded['times'],
+                self.initial_capital,
+                pnlcomm,
+                recorded['entry_time'],
+                recorded['exit_time']
+            )
+        }
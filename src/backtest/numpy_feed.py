@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import backtrader as bt
+from backtrader.utils import date2num
+from src.data.mmap_bars import MmapBars, column_values
+
+
+# Linee OHLCV di backtrader -> colonne delle barre
+LINE_COLUMNS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume',
+}
+
+
+# date2num(1970-01-01)
+EPOCH_ORDINAL = 719163
+
+
+def to_bt_datetimes(index: pd.DatetimeIndex) -> np.ndarray:
+    # Stessa conversione di PandasData (date2num su ogni timestamp, con
+    # gli indici tz-aware riportati a UTC), fatta una volta sola all'avvio
+    return np.fromiter(
+        (date2num(dt) for dt in index.to_pydatetime()),
+        dtype=np.float64,
+        count=len(index)
+    )
+
+
+def bt_times(values: np.ndarray) -> np.ndarray:
+    # Inverso di to_bt_datetimes: giorni di backtrader -> datetime64[ns] UTC.
+    # Un float di giorni ha una risoluzione di circa 10 µs: arrotondamento a
+    # 100 µs, come la correzione degli errori di arrotondamento di num2date
+    days = np.floor(values)
+    micros = np.round((values - days) * 864e6).astype(np.int64) * 100
+    epoch = (days.astype(np.int64) - EPOCH_ORDINAL) * 86_400_000_000 + micros
+    return epoch.astype('datetime64[us]').astype('datetime64[ns]')
+
+
+class NumpyData(bt.feed.DataBase):
+    # Feed backtrader da array NumPy: dataname è un DataFrame o un MmapBars
+    # (anche dall'archivio locale, senza copia in un DataFrame). I valori
+    # vengono estratti una volta in start(); il preload riempie i buffer
+    # delle linee in blocco invece di leggere il DataFrame riga per riga
+    # come PandasData. Con exactbars (niente preload) _load legge dagli
+    # stessi array.
+    def start(self):
+        super().start()
+        bars = self.p.dataname
+        if not isinstance(bars, (pd.DataFrame, MmapBars)):
+            raise TypeError("NumpyData requires a DataFrame or MmapBars")
+
+        self._arrays = {'datetime': to_bt_datetimes(bars.index)}
+        for line, column in LINE_COLUMNS.items():
+            self._arrays[line] = np.asarray(column_values(bars, column), dtype=np.float64)
+        self._length = len(bars)
+        self._idx = -1
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= self._length:
+            return False
+
+        for line, values in self._arrays.items():
+            getattr(self.lines, line)[0] = float(values[self._idx])
+        return True
+
+    def _bulk_preload(self) -> bool:
+        # Il percorso standard serve solo con filtri, fuso orario in
+        # ingresso o intervallo di date sul feed
+        return (
+            not self._filters
+            and not self._ffilters
+            and not self._tzinput
+            and self.fromdate == float('-inf')
+            and self.todate == float('inf')
+        )
+
+    def preload(self):
+        if not self._bulk_preload():
+            return super().preload()
+
+        n = self._length
+        for name in self.getlinealiases():
+            line = getattr(self.lines, name)
+            values = self._arrays.get(name)
+            if values is None:
+                # openinterest: assente come in PandasData
+                values = np.full(n, np.nan)
+            line.array.frombytes(np.ascontiguousarray(values).tobytes())
+            # Stato dei buffer dopo n chiamate a forward()
+            line.idx = n - 1
+            line.lencount = n
+
+        # I valori ora sono nei buffer delle linee
+        self._arrays = None
+        self._idx = n
+        self._last()
+        self.home()
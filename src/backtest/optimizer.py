@@ -0,0 +1,384 @@
+import os
+import sys
+import inspect
+import json
+import tempfile
+import itertools
+import contextlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from loguru import logger
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.strategy.indicator_cache import IndicatorCache
+from src.backtest.vectorized import VectorizedBacktester
+from src.data.mmap_bars import MmapBars, column_values
+from src.backtest.result_cache import ResultCache, hash_bars, source_hash
+from src.analytics.performance import periods_per_year, sharpe_ratio, simple_returns
+
+
+# Range ottimizzabili documentati in ADVANCED.md
+DEFAULT_GRID = {
+    'ema_fast': [5, 7, 9, 12, 15],
+    'ema_slow': [15, 21, 30, 40, 50],
+    'atr_period': [10, 14, 20],
+    'atr_sl_multiplier': [1.5, 2.0, 2.5, 3.0],
+    'atr_tp_multiplier': [2.0, 2.5, 3.0, 4.0],
+}
+
+PARAM_NAMES = list(DEFAULT_GRID.keys())
+
+# Valori di default della strategia, per i parametri assenti da una griglia
+DEFAULT_PARAMS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(EMAVWAPStrategy.__init__).parameters.items()
+    if name in PARAM_NAMES
+}
+
+# Metriche in cui un valore più basso è migliore
+ASCENDING_METRICS = {'max_drawdown'}
+
+
+def load_grid(value: Optional[str]) -> Dict[str, List]:
+    # Accetta un JSON inline o il percorso di un file JSON
+    if not value:
+        return dict(DEFAULT_GRID)
+    if os.path.isfile(value):
+        with open(value) as f:
+            grid = json.load(f)
+    else:
+        grid = json.loads(value)
+
+    unknown = set(grid) - set(PARAM_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown grid parameters: {sorted(unknown)}")
+
+    return {
+        name: list(values) if isinstance(values, (list, tuple)) else [values]
+        for name, values in grid.items()
+    }
+
+
+def resolve_grid(grid: Optional[Dict[str, List]]) -> Dict[str, List]:
+    # Senza griglia quella di default; altrimenti solo gli assi indicati,
+    # con i parametri mancanti fissati al default della strategia
+    if not grid:
+        return dict(DEFAULT_GRID)
+    return {name: list(grid[name]) if name in grid else [DEFAULT_PARAMS[name]] for name in PARAM_NAMES}
+
+
+def expand_grid(grid: Dict[str, List]) -> List[dict]:
+    # Prodotto cartesiano della griglia, scartando EMA veloce >= EMA lenta
+    names = list(grid.keys())
+    combinations = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        if params.get('ema_fast', 0) >= params.get('ema_slow', np.inf):
+            continue
+        combinations.append(params)
+    return combinations
+
+
+def build_indicator_cache(
+    data,
+    grid: Dict[str, List],
+    indicator_cache: Optional[IndicatorCache] = None,
+    symbol: Optional[str] = None,
+    timeframe: Optional[int] = None
+) -> dict:
+    # Ogni periodo EMA/ATR distinto viene calcolato una sola volta per
+    # simbolo e condiviso da tutte le combinazioni che lo usano; con
+    # indicator_cache anche tra esecuzioni successive sugli stessi dati.
+    # data può essere un DataFrame o un MmapBars
+    ema_periods = set(grid.get('ema_fast', [])) | set(grid.get('ema_slow', []))
+    atr_periods = set(grid.get('atr_period', []))
+    if indicator_cache is None:
+        # Senza simbolo IndicatorCache calcola sempre da capo, senza conservare nulla
+        indicator_cache, symbol = IndicatorCache(), None
+
+    return {
+        'bars': data,
+        'vwap': indicator_cache.vwap(data, symbol, timeframe).to_numpy(dtype=float),
+        # Volume cumulato: il VWAP di una sottofinestra si ricava dalle
+        # somme cumulate senza ricalcolarlo (vedi window_vwap)
+        'cum_volume': np.cumsum(column_values(data, 'Volume'), dtype=np.float64),
+        'ema': {
+            period: indicator_cache.ema(data['Close'], period, symbol, timeframe).to_numpy(dtype=float)
+            for period in ema_periods
+        },
+        'atr': {
+            period: indicator_cache.atr(data, period, symbol, timeframe).to_numpy(dtype=float)
+            for period in atr_periods
+        },
+    }
+
+
+class _SharedArray:
+    # Array salvato su disco e riaperto in memmap da ogni worker: i
+    # processi condividono una sola copia tramite la page cache
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> np.ndarray:
+        return np.load(self.path, mmap_mode='r')
+
+
+def _share_cache(cache: Dict[str, dict], directory: str) -> Dict[str, dict]:
+    shared = {}
+    for symbol, entry in cache.items():
+        base = Path(directory) / symbol
+        base.mkdir(parents=True, exist_ok=True)
+
+        bars = entry['bars']
+        if not isinstance(bars, MmapBars) or bars.path is None:
+            bars = MmapBars.write(base / "bars", bars)
+
+        def spill(name: str, values: np.ndarray) -> _SharedArray:
+            path = str(base / f"{name}.npy")
+            np.save(path, values)
+            return _SharedArray(path)
+
+        shared[symbol] = {
+            'bars': bars,
+            'vwap': spill('vwap', entry['vwap']),
+            'cum_volume': spill('cum_volume', entry['cum_volume']),
+            'ema': {p: spill(f'ema_{p}', v) for p, v in entry['ema'].items()},
+            'atr': {p: spill(f'atr_{p}', v) for p, v in entry['atr'].items()},
+        }
+    return shared
+
+
+def _resolve_cache(entry: dict) -> dict:
+    def resolve(value):
+        return value.load() if isinstance(value, _SharedArray) else value
+
+    return {
+        'bars': entry['bars'],
+        'vwap': resolve(entry['vwap']),
+        'cum_volume': resolve(entry['cum_volume']),
+        'ema': {p: resolve(v) for p, v in entry['ema'].items()},
+        'atr': {p: resolve(v) for p, v in entry['atr'].items()},
+    }
+
+
+# Cache degli indicatori nel processo worker, impostata dall'initializer
+_worker_cache: Dict[str, dict] = {}
+_worker_settings: dict = {}
+
+
+def _init_worker(cache: Dict[str, dict], settings: dict):
+    global _worker_cache, _worker_settings
+    _worker_cache = {symbol: _resolve_cache(entry) for symbol, entry in cache.items()}
+    _worker_settings = settings
+    # Evita migliaia di righe di log per singola combinazione
+    logger.disable('src.backtest.vectorized')
+
+
+def window_vwap(vwap: np.ndarray, cum_volume: np.ndarray, start: int, stop: int) -> np.ndarray:
+    # VWAP ancorato all'inizio della finestra [start, stop), come
+    # calculate_vwap sulle sole barre della finestra, dalle somme cumulate
+    # dell'intero storico: O(finestra) invece di ricalcolare da capo
+    volume = cum_volume[start:stop]
+    value = vwap[start:stop] * volume
+    if start > 0:
+        volume = volume - cum_volume[start - 1]
+        value = value - vwap[start - 1] * cum_volume[start - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return value / volume
+
+
+def _evaluate(task) -> dict:
+    # task: (symbol, params), con opzionale finestra di barre (start, stop)
+    # e detail=True per restituire anche equity e trade del backtest
+    symbol, params, *options = task
+    window = options[0] if options else None
+    detail = len(options) > 1 and options[1]
+    cache = _worker_cache[symbol]
+    bars = cache['bars']
+
+    start, stop = window or (0, len(bars))
+    ema_fast = cache['ema'][params['ema_fast']][start:stop]
+    ema_slow = cache['ema'][params['ema_slow']][start:stop]
+    close = bars['Close'].to_numpy(dtype=float)[start:stop]
+    if window is None:
+        vwap = cache['vwap']
+    else:
+        vwap = window_vwap(cache['vwap'], cache['cum_volume'], start, stop)
+
+    # Stesse condizioni di EMAVWAPStrategy.generate_signals
+    long_signal = (ema_fast > ema_slow) & (close > vwap)
+    short_signal = (ema_fast < ema_slow) & (close < vwap)
+
+    strategy = EMAVWAPStrategy(**params)
+    backtester = VectorizedBacktester(
+        initial_capital=_worker_settings['initial_capital'],
+        commission=_worker_settings['commission']
+    )
+    results = backtester.run_arrays(
+        bars.index[start:stop],
+        bars['Open'].to_numpy(dtype=float)[start:stop],
+        bars['High'].to_numpy(dtype=float)[start:stop],
+        bars['Low'].to_numpy(dtype=float)[start:stop],
+        close,
+        cache['atr'][params['atr_period']][start:stop],
+        long_signal,
+        short_signal,
+        strategy,
+        _worker_settings['risk_percent']
+    )
+
+    row = {'symbol': symbol, **params, **results}
+    # Sharpe per barra annualizzato con le barre/anno osservate: quello
+    # dei backtest (per anno solare) è None su finestre sotto i due anni
+    # e non permetterebbe di ordinare le combinazioni
+    equity = backtester.equity_curve
+    row['sharpe_ratio'] = sharpe_ratio(
+        simple_returns(equity.to_numpy(), _worker_settings['initial_capital']),
+        periods_per_year(equity.index)
+    )
+    if detail:
+        row['equity'] = backtester.equity_curve
+        row['trades'] = backtester.trades
+    return row
+
+
+@contextlib.contextmanager
+def evaluation_pool(
+    cache: Dict[str, dict],
+    settings: dict,
+    workers: int
+) -> Iterator[Callable[[list], list]]:
+    # Funzione che valuta una lista di task con gli indicatori in cache,
+    # nel processo corrente o su un pool di processi che condividono
+    # la cache su disco; il pool resta aperto per più chiamate
+    if workers == 1:
+        _init_worker(cache, settings)
+        try:
+            yield lambda tasks: [_evaluate(task) for task in tasks]
+        finally:
+            logger.enable('src.backtest.vectorized')
+        return
+
+    with tempfile.TemporaryDirectory(prefix='optimizer-') as directory:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(_share_cache(cache, directory), settings)
+        ) as executor:
+            def evaluate(tasks: list) -> list:
+                chunksize = max(1, len(tasks) // (workers * 4))
+                return list(executor.map(_evaluate, tasks, chunksize=chunksize))
+
+            yield evaluate
+
+
+class ParameterOptimizer:
+    def __init__(
+        self,
+        grid: Optional[Dict[str, List]] = None,
+        initial_capital: float = 10000.0,
+        commission: float = 0.0001,
+        risk_percent: float = 1.0,
+        workers: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        indicator_cache: Optional[IndicatorCache] = None
+    ):
+        self.grid = resolve_grid(grid)
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.risk_percent = risk_percent
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.indicator_cache = indicator_cache
+        self.results: Optional[pd.DataFrame] = None
+
+    def run(
+        self,
+        data: Dict[str, Union[pd.DataFrame, MmapBars]],
+        rank_by: str = 'total_return',
+        timeframe: Optional[int] = None
+    ) -> pd.DataFrame:
+        combinations = expand_grid(self.grid)
+        settings = {
+            'initial_capital': self.initial_capital,
+            'commission': self.commission,
+            'risk_percent': self.risk_percent,
+        }
+        tasks = [
+            (symbol, params)
+            for symbol in data
+            for params in combinations
+        ]
+
+        # Combinazioni già valutate sugli stessi dati: solo le nuove vengono eseguite
+        rows: List[Optional[dict]] = [None] * len(tasks)
+        keys = self._cache_keys(data, tasks, settings)
+        if keys:
+            for i, key in enumerate(keys):
+                rows[i] = self.cache.get(key)
+        pending = [i for i, row in enumerate(rows) if row is None]
+
+        logger.info(
+            f"Optimizing {len(combinations)} combinations over {len(data)} symbols "
+            f"({len(tasks)} backtests, {len(tasks) - len(pending)} cached, {self.workers} workers)"
+        )
+
+        # Indicatori calcolati solo per i simboli con backtest da eseguire
+        symbols = {tasks[i][0] for i in pending}
+        cache = {
+            symbol: build_indicator_cache(df, self.grid, self.indicator_cache, symbol, timeframe)
+            for symbol, df in data.items()
+            if symbol in symbols
+        }
+        pending_tasks = [tasks[i] for i in pending]
+
+        if not pending_tasks:
+            computed = []
+        else:
+            with evaluation_pool(cache, settings, self.workers) as evaluate:
+                computed = evaluate(pending_tasks)
+
+        for i, row in zip(pending, computed):
+            rows[i] = row
+            if keys:
+                self.cache.put(keys[i], row)
+
+        self.results = pd.DataFrame(rows)
+        return self.rank(self.results, rank_by)
+
+    def _cache_keys(self, data, tasks: list, settings: dict) -> List[str]:
+        if self.cache is None:
+            return []
+        hashes = {symbol: hash_bars(df) for symbol, df in data.items()}
+        # Il risultato dipende anche da _evaluate, non solo dal motore
+        source = source_hash(VectorizedBacktester, sys.modules[__name__])
+        return [
+            self.cache.key('optimizer', hashes[symbol], {'symbol': symbol, **params}, settings, source)
+            for symbol, params in tasks
+        ]
+
+    @staticmethod
+    def rank(results: pd.DataFrame, rank_by: str = 'total_return') -> pd.DataFrame:
+        # Una riga per combinazione, con le metriche aggregate sui simboli
+        param_columns = [name for name in ['timeframe'] + PARAM_NAMES if name in results.columns]
+        results = results.assign(sharpe_ratio=pd.to_numeric(results['sharpe_ratio']))
+        if results[rank_by].isna().all():
+            raise ValueError(f"No {rank_by} values to rank by (e.g. no trades in the period)")
+        table = results.groupby(param_columns, as_index=False).agg(
+            total_return=('total_return', 'mean'),
+            sharpe_ratio=('sharpe_ratio', 'mean'),
+            max_drawdown=('max_drawdown', 'max'),
+            total_trades=('total_trades', 'sum'),
+            win_rate=('win_rate', 'mean'),
+            symbols=('symbol', 'nunique'),
+        )
+        table = table.sort_values(
+            rank_by,
+            ascending=rank_by in ASCENDING_METRICS,
+            na_position='last',
+            kind='stable'
+        ).reset_index(drop=True)
+        table.insert(0, 'rank', np.arange(1, len(table) + 1))
+        return table
@@ -0,0 +1,34 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
+from typing import Callable, Iterator, List, Optional, Tuple
+
+
+def run_per_symbol(
+    fn: Callable[..., Optional[dict]],
+    symbols: List[str],
+    *args,
+    workers: int = 1
+) -> Iterator[Tuple[str, Optional[dict]]]:
+    # Esegue fn(symbol, *args) per ogni simbolo e restituisce (symbol,
+    # risultato) man mano che i backtest terminano. Con workers > 1 ogni
+    # simbolo gira in un processo separato: fn deve essere una funzione a
+    # livello di modulo e caricare da sé i dati (nessun DataFrame da
+    # serializzare verso i worker). Un simbolo fallito restituisce None.
+    if workers <= 1 or len(symbols) <= 1:
+        for symbol in symbols:
+            try:
+                yield symbol, fn(symbol, *args)
+            except Exception as e:
+                logger.error(f"Backtest failed for {symbol}: {e}")
+                yield symbol, None
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(symbols))) as executor:
+        futures = {executor.submit(fn, symbol, *args): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                yield symbol, future.result()
+            except Exception as e:
+                logger.error(f"Backtest failed for {symbol}: {e}")
+                yield symbol, None
@@ -0,0 +1,281 @@
+import heapq
+import numpy as np
+import pandas as pd
+from typing import Dict
+from loguru import logger
+from src.backtest.vectorized import VectorizedBacktester
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.strategy.indicators import align_panel
+from src.analytics.performance import annual_sharpe_ratio, max_drawdown, summarize
+
+
+class PortfolioBacktester(VectorizedBacktester):
+    # Backtest di tutti i simboli in un'unica simulazione con capitale
+    # condiviso: stesse regole per simbolo di VectorizedBacktester, più i
+    # vincoli di RiskManager (massimo max_positions posizioni aperte, nessun
+    # nuovo ingresso oltre max_drawdown% dal picco del capitale realizzato).
+    # Gli ingressi di tutti i simboli sono elaborati in ordine temporale da
+    # una coda di priorità: il costo dipende dal numero di trade, non da
+    # simboli x barre, e non serve un motore per coppia.
+    def __init__(
+        self,
+        initial_capital: float = 10000.0,
+        commission: float = 0.0001,
+        max_positions: int = 3,
+        max_drawdown: float = 50.0
+    ):
+        super().__init__(initial_capital, commission)
+        self.max_positions = max_positions
+        self.max_drawdown = max_drawdown
+        self.symbol_results: Dict[str, dict] = {}
+
+    def run(
+        self,
+        data: Dict[str, pd.DataFrame],
+        strategy_params: dict = None
+    ) -> dict:
+        params = dict(strategy_params or {})
+        risk_percent = params.pop('risk_percent', 1.0)
+        strategy = EMAVWAPStrategy(**params)
+
+        # Indicatori e segnali di tutti i simboli in un solo passaggio sul
+        # pannello allineato, poi per simbolo le sole barre presenti
+        index, names, panel = align_panel(data)
+        signals = strategy.generate_panel_signals(panel)
+        valid = ~np.isnan(panel['Close'])
+
+        symbols = {}
+        for j, symbol in enumerate(names):
+            rows = valid[:, j]
+            symbols[symbol] = {
+                'index': index[rows],
+                'open': signals['Open'][rows, j],
+                'high': signals['High'][rows, j],
+                'low': signals['Low'][rows, j],
+                'close': signals['Close'][rows, j],
+                'atr': signals['ATR'][rows, j],
+                'long_signal': signals['Long_Signal'][rows, j],
+                'short_signal': signals['Short_Signal'][rows, j],
+            }
+
+        return self.run_arrays(symbols, strategy, risk_percent)
+
+    def run_arrays(
+        self,
+        symbols: Dict[str, dict],
+        strategy: EMAVWAPStrategy,
+        risk_percent: float = 1.0
+    ) -> dict:
+        # symbols: per simbolo index e array open/high/low/close/atr e
+        # long_signal/short_signal, come gli argomenti di run_arrays
+        names = list(symbols)
+        warmup = max(strategy.ema_slow, strategy.atr_period + 1) - 1
+        risk_fraction = risk_percent / 100
+        floor = 1.0 - self.max_drawdown / 100
+
+        state = []
+        entries = []
+        for i, name in enumerate(names):
+            s = symbols[name]
+            atr = s['atr']
+            valid = ~np.isnan(atr) & (atr > 0)
+            valid[:warmup] = False
+            long_signal = s['long_signal'] & valid
+            short_signal = s['short_signal'] & valid & ~long_signal
+            candidates = np.flatnonzero((long_signal | short_signal)[:-1])
+            times = s['index'].asi8
+            state.append({
+                **s,
+                'times': times,
+                'long_signal': long_signal,
+                'candidates': candidates,
+                'candidate_times': times[candidates],
+            })
+            if len(candidates):
+                entries.append((int(times[candidates[0]]), i, 0))
+        heapq.heapify(entries)
+
+        logger.info(f'Starting Portfolio Value: {self.initial_capital:.2f} ({len(names)} symbols)')
+
+        cash = self.initial_capital
+        peak = cash
+        open_count = 0
+        exits = []
+        trade_rows = [[] for _ in names]
+        open_at_end = []
+        blocked = np.zeros(len(names), dtype=np.int64)
+
+        while entries:
+            signal_time, i, k = heapq.heappop(entries)
+
+            # Chiusure avvenute entro la barra del segnale liberano capitale e slot
+            while exits and exits[0][0] <= signal_time:
+                _, _, pnlcomm = heapq.heappop(exits)
+                cash += pnlcomm
+                peak = max(peak, cash)
+                open_count -= 1
+
+            s = state[i]
+            candidates = s['candidates']
+
+            if open_count >= self.max_positions or cash < peak * floor:
+                if not exits:
+                    # Nessuna chiusura in arrivo: il vincolo non si sblocca
+                    # più, bloccati anche tutti i segnali successivi
+                    blocked[i] += len(candidates) - k
+                    continue
+                # Riprova con il primo segnale dopo la prossima chiusura: fino
+                # ad allora il vincolo resta, i segnali saltati sono bloccati
+                next_k = int(np.searchsorted(s['candidate_times'], exits[0][0], side='left'))
+                blocked[i] += next_k - k
+                if next_k < len(candidates):
+                    heapq.heappush(entries, (int(s['candidate_times'][next_k]), i, next_k))
+                continue
+
+            signal_bar = candidates[k]
+            open_, high, low, close, atr = s['open'], s['high'], s['low'], s['close'], s['atr']
+            n = len(close)
+            direction = 1.0 if s['long_signal'][signal_bar] else -1.0
+
+            risk_amount = cash * risk_fraction
+            sl_distance = strategy.atr_sl_multiplier * atr[signal_bar]
+            size = risk_amount / sl_distance
+            size = max(0.01, min(size, 10.0))
+
+            sl = close[signal_bar] - direction * sl_distance
+            tp = close[signal_bar] + direction * strategy.atr_tp_multiplier * atr[signal_bar]
+
+            fill_bar = signal_bar + 1
+            entry_price = open_[fill_bar]
+            entry_commission = size * entry_price * self.commission
+
+            if direction > 0:
+                exit_bar, stopped = self._first_hit(
+                    lambda a, b: low[a:b] <= sl,
+                    lambda a, b: high[a:b] >= tp,
+                    fill_bar, n, self.SEARCH_CHUNK
+                )
+            else:
+                exit_bar, stopped = self._first_hit(
+                    lambda a, b: high[a:b] >= sl,
+                    lambda a, b: low[a:b] <= tp,
+                    fill_bar, n, self.SEARCH_CHUNK
+                )
+
+            open_count += 1
+
+            if exit_bar < 0:
+                # Posizione ancora aperta a fine dati: valutata a mercato
+                # e slot occupato fino alla fine
+                open_at_end.append((i, fill_bar, direction, size, entry_price, entry_commission))
+                continue
+
+            if stopped:
+                exit_price = min(open_[exit_bar], sl) if direction > 0 else max(open_[exit_bar], sl)
+            else:
+                exit_price = max(open_[exit_bar], tp) if direction > 0 else min(open_[exit_bar], tp)
+
+            exit_commission = size * exit_price * self.commission
+            pnl = direction * size * (exit_price - entry_price)
+            pnlcomm = pnl - entry_commission - exit_commission
+            heapq.heappush(exits, (int(s['times'][exit_bar]), i, pnlcomm))
+
+            trade_rows[i].append((
+                fill_bar,
+                exit_bar,
+                direction,
+                size,
+                entry_price,
+                exit_price,
+                pnl,
+                pnlcomm,
+                stopped
+            ))
+
+            k = int(np.searchsorted(candidates, exit_bar))
+            if k < len(candidates):
+                heapq.heappush(entries, (int(s['candidate_times'][k]), i, k))
+
+        trades = []
+        for i, name in enumerate(names):
+            symbol_trades = self._build_trades(state[i]['index'], trade_rows[i])
+            symbol_trades.insert(0, 'symbol', name)
+            trades.append(symbol_trades)
+        self.trades = pd.concat(trades, ignore_index=True).sort_values(
+            ['entry_time', 'symbol'], kind='stable'
+        ).reset_index(drop=True)
+
+        equity = self._equity(state, trade_rows, open_at_end)
+        self.equity_curve = equity
+        equity_values = equity.to_numpy()
+
+        final_value = float(equity_values[-1]) if len(equity_values) else self.initial_capital
+        logger.info(f'Final Portfolio Value: {final_value:.2f}')
+
+        self.symbol_results = {}
+        for i, name in enumerate(names):
+            pnlcomm = np.array([row[7] for row in trade_rows[i]], dtype=float)
+            won = int((pnlcomm >= 0).sum())
+            self.symbol_results[name] = {
+                'total_trades': len(pnlcomm),
+                'won_trades': won,
+                'lost_trades': len(pnlcomm) - won,
+                'win_rate': (won / len(pnlcomm) * 100) if len(pnlcomm) > 0 else 0,
+                'net_profit': float(pnlcomm.sum()),
+                'return_contribution': float(pnlcomm.sum()) / self.initial_capital * 100,
+                'blocked_signals': int(blocked[i]),
+            }
+
+        pnlcomm = self.trades['pnlcomm'].to_numpy()
+        total_trades = len(pnlcomm)
+        won_trades = int((pnlcomm >= 0).sum())
+
+        return {
+            'initial_value': self.initial_capital,
+            'final_value': final_value,
+            'total_return': ((final_value - self.initial_capital) / self.initial_capital) * 100,
+            'sharpe_ratio': annual_sharpe_ratio(equity, self.initial_capital),
+            'max_drawdown': max_drawdown(equity_values, self.initial_capital),
+            'total_trades': total_trades,
+            'won_trades': won_trades,
+            'lost_trades': total_trades - won_trades,
+            'win_rate': (won_trades / total_trades * 100) if total_trades > 0 else 0,
+            **summarize(
+                equity_values,
+                equity.index,
+                self.initial_capital,
+                pnlcomm,
+                self.trades['entry_time'],
+                self.trades['exit_time']
+            ),
+            'blocked_signals': int(blocked.sum()),
+            'symbols': self.symbol_results
+        }
+
+    def _equity(self, state: list, trade_rows: list, open_at_end: list) -> pd.Series:
+        # Equity sull'unione dei timestamp di tutti i simboli: capitale
+        # realizzato più il valore a mercato delle posizioni aperte, con
+        # l'ultima chiusura nota per i simboli senza barra in quell'istante
+        union = np.unique(np.concatenate([s['times'] for s in state]))
+        realized = np.zeros(len(union))
+        unrealized = np.zeros(len(union))
+
+        def mark(s, fill_bar, end, direction, size, entry_price, entry_commission):
+            a = np.searchsorted(union, s['times'][fill_bar])
+            b = len(union) if end is None else np.searchsorted(union, s['times'][end])
+            rows = np.searchsorted(s['times'], union[a:b], side='right') - 1
+            unrealized[a:b] += direction * size * (s['close'][rows] - entry_price) - entry_commission
+
+        for s, rows in zip(state, trade_rows):
+            for fill_bar, exit_bar, direction, size, entry_price, _, _, pnlcomm, _ in rows:
+                mark(s, fill_bar, exit_bar, direction, size, entry_price, size * entry_price * self.commission)
+                realized[np.searchsorted(union, s['times'][exit_bar])] += pnlcomm
+
+        for i, fill_bar, direction, size, entry_price, entry_commission in open_at_end:
+            mark(state[i], fill_bar, None, direction, size, entry_price, entry_commission)
+
+        tz = state[0]['index'].tz if state else None
+        index = pd.to_datetime(union, utc=tz is not None)
+        if tz is not None:
+            index = index.tz_convert(tz)
+        return pd.Series(self.initial_capital + np.cumsum(realized) + unrealized, index=index, name='Equity')
@@ -0,0 +1,218 @@
+import os
+import sys
+import pickle
+import hashlib
+import inspect
+import json
+import numpy as np
+import pandas as pd
+import backtrader as bt
+from pathlib import Path
+from functools import lru_cache
+from loguru import logger
+from typing import Dict, Optional, Union
+from src.data.mmap_bars import MmapBars, PRICE_COLUMNS, column_values, time_values
+from src.strategy import ema_vwap_strategy, indicator_cache, indicators
+from src.analytics import performance
+
+
+# Da incrementare se cambia il formato dei risultati o la semantica dei
+# backtest senza che cambi il sorgente (es. dipendenze esterne)
+CACHE_VERSION = 1
+
+Bars = Union[pd.DataFrame, MmapBars]
+
+
+def hash_bars(data: Union[Bars, Dict[str, Bars]]) -> str:
+    # Impronta del contenuto delle barre (timestamp e OHLCV), non del
+    # percorso: gli stessi dati caricati da MT5 o dall'archivio coincidono
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(data, dict):
+        for symbol in sorted(data):
+            digest.update(symbol.encode())
+            digest.update(hash_bars(data[symbol]).encode())
+        return digest.hexdigest()
+
+    digest.update(np.ascontiguousarray(time_values(data)).tobytes())
+    for name in PRICE_COLUMNS:
+        digest.update(np.ascontiguousarray(column_values(data, name), dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _project_imports(module) -> set:
+    # Moduli del progetto usati da module: importati direttamente o da
+    # cui provengono le classi e funzioni importate
+    found = set()
+    for value in vars(module).values():
+        name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+        if isinstance(name, str) and name.startswith('src.') and name in sys.modules:
+            found.add(sys.modules[name])
+    return found
+
+
+@lru_cache(maxsize=None)
+def source_hash(*objects) -> str:
+    # Sorgente dei moduli del progetto da cui dipende il risultato: le
+    # classi indicate (con le loro basi), la strategia, gli indicatori, le
+    # metriche di performance e tutti i moduli del progetto che questi
+    # importano (es. il feed NumPy del motore backtrader)
+    modules = {ema_vwap_strategy, indicators, indicator_cache, performance}
+    for obj in objects:
+        if inspect.ismodule(obj):
+            modules.add(obj)
+            continue
+        for cls in obj.__mro__:
+            if cls.__module__.startswith('src.'):
+                modules.add(sys.modules[cls.__module__])
+
+    pending = list(modules)
+    while pending:
+        for module in _project_imports(pending.pop()) - modules:
+            modules.add(module)
+            pending.append(module)
+
+    digest = hashlib.sha256()
+    for module in sorted(modules, key=lambda m: m.__name__):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+def engine_config(backtester) -> dict:
+    # Impostazioni scalari del motore (capitale, commissioni, limiti di rischio)
+    return {
+        name: value
+        for name, value in sorted(vars(backtester).items())
+        if isinstance(value, (bool, int, float, str))
+    }
+
+
+class ResultCache:
+    # Cache su disco dei risultati dei backtest, indirizzata dal contenuto:
+    # la chiave è l'hash di dati, parametri, configurazione del motore,
+    # versione e sorgente di motore e strategia, quindi una modifica a uno
+    # qualsiasi di questi produce una chiave nuova senza invalidare a mano.
+    # Un file pickle per risultato; l'mtime fa da timestamp LRU e oltre
+    # max_size_mb vengono rimossi i risultati usati meno di recente.
+    def __init__(self, root: str = "data/cache/backtests", max_size_mb: float = 512.0):
+        self.root = Path(root)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self,
+        engine: str,
+        data_hash: str,
+        params: dict,
+        config: dict,
+        source: str
+    ) -> str:
+        payload = {
+            'version': CACHE_VERSION,
+            'engine': engine,
+            'data': data_hash,
+            'params': params,
+            'config': config,
+            'source': source,
+            'libraries': [np.__version__, pd.__version__, bt.__version__],
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        # Aggiorna l'mtime: il file diventa il più recente per l'eviction
+        os.utime(path)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Scrittura atomica: processi concorrenti leggono il file completo o nulla
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            # La stessa chiave può essere già stata scritta (es. da un altro worker)
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += path.stat().st_size - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        return list(self.root.glob("*/*.pkl")) if self.root.exists() else []
+
+    def size(self) -> int:
+        return sum(path.stat().st_size for path in self._entries())
+
+    def evict(self):
+        # Rimuove i risultati meno recenti fino a scendere sotto il 90% del limite
+        entries = sorted((path.stat().st_mtime, path.stat().st_size, path) for path in self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            logger.info(f"Result cache: evicted {removed} entries ({total / 1024 / 1024:.1f} MB left)")
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        # Senza chiave svuota tutta la cache; restituisce i file rimossi
+        entries = [self._path(key)] if key else self._entries()
+        removed = 0
+        for path in entries:
+            if path.exists():
+                path.unlink()
+                removed += 1
+        self._size = None
+        return removed
+
+    def run(
+        self,
+        backtester,
+        data: Union[Bars, Dict[str, Bars]],
+        strategy_params: Optional[dict] = None,
+        data_hash: Optional[str] = None
+    ) -> dict:
+        # backtester.run(data, strategy_params) con i risultati in cache
+        engine = type(backtester)
+        key = self.key(
+            f"{engine.__module__}.{engine.__qualname__}",
+            data_hash or hash_bars(data),
+            strategy_params or {},
+            engine_config(backtester),
+            source_hash(engine)
+        )
+        result = self.get(key)
+        if result is not None:
+            logger.info(f"Backtest result loaded from cache ({key[:12]})")
+            return result
+
+        result = backtester.run(data, strategy_params)
+        self.put(key, result)
+        return result
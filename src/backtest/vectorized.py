@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+from loguru import logger
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.analytics.performance import annual_sharpe_ratio, max_drawdown, summarize
+
+
+class VectorizedBacktester:
+    # Alternativa a Backtester senza backtrader: i segnali arrivano da
+    # EMAVWAPStrategy.generate_signals e le uscite SL/TP vengono risolte
+    # con ricerche NumPy, iterando solo sui trade e non sulle barre.
+    # Replica le regole di EMAVWAPBTStrategy: ingresso quando flat e
+    # condizione attiva, esecuzione all'apertura della barra successiva,
+    # stop valutato prima del take profit, gap eseguiti all'apertura.
+    SEARCH_CHUNK = 256
+
+    def __init__(
+        self,
+        initial_capital: float = 10000.0,
+        commission: float = 0.0001
+    ):
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.equity_curve: Optional[pd.Series] = None
+        self.trades: Optional[pd.DataFrame] = None
+
+    @staticmethod
+    def _first_hit(
+        stop_mask,
+        target_mask,
+        start: int,
+        n: int,
+        chunk: int
+    ) -> Tuple[int, bool]:
+        # Cerca la prima barra che tocca SL o TP a blocchi crescenti, così
+        # il costo dipende dalla durata del trade e non dalla lunghezza dei dati
+        pos = start
+        while pos < n:
+            end = min(n, pos + chunk)
+            stop_hit = stop_mask(pos, end)
+            hit = stop_hit | target_mask(pos, end)
+            if hit.any():
+                offset = int(np.argmax(hit))
+                return pos + offset, bool(stop_hit[offset])
+            pos = end
+            chunk *= 2
+        return -1, False
+
+    def run(
+        self,
+        data: pd.DataFrame,
+        strategy_params: dict = None
+    ) -> dict:
+        params = dict(strategy_params or {})
+        risk_percent = params.pop('risk_percent', 1.0)
+        strategy = EMAVWAPStrategy(**params)
+
+        signals = strategy.generate_signals(data)
+
+        return self.run_arrays(
+            signals.index,
+            signals['Open'].to_numpy(dtype=float),
+            signals['High'].to_numpy(dtype=float),
+            signals['Low'].to_numpy(dtype=float),
+            signals['Close'].to_numpy(dtype=float),
+            signals['ATR'].to_numpy(dtype=float),
+            signals['Long_Signal'].to_numpy(dtype=bool),
+            signals['Short_Signal'].to_numpy(dtype=bool),
+            strategy,
+            risk_percent
+        )
+
+    def run_arrays(
+        self,
+        index: pd.Index,
+        open_: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        atr: np.ndarray,
+        long_signal: np.ndarray,
+        short_signal: np.ndarray,
+        strategy: EMAVWAPStrategy,
+        risk_percent: float = 1.0
+    ) -> dict:
+        # Variante di run su array già pronti (es. indicatori in cache)
+        n = len(close)
+
+        # Stesso periodo minimo degli indicatori di backtrader
+        warmup = max(strategy.ema_slow, strategy.atr_period + 1) - 1
+        valid = ~np.isnan(atr) & (atr > 0)
+        valid[:warmup] = False
+
+        long_signal = long_signal & valid
+        short_signal = short_signal & valid & ~long_signal
+        # L'ordine a mercato viene eseguito sulla barra successiva
+        candidates = np.flatnonzero((long_signal | short_signal)[:-1])
+
+        logger.info(f'Starting Portfolio Value: {self.initial_capital:.2f}')
+
+        equity = np.empty(n)
+        cash = self.initial_capital
+        risk_fraction = risk_percent / 100
+        cursor = 0
+        filled = 0
+        trade_rows = []
+
+        while True:
+            k = np.searchsorted(candidates, cursor)
+            if k >= len(candidates):
+                break
+
+            signal_bar = candidates[k]
+            direction = 1.0 if long_signal[signal_bar] else -1.0
+
+            risk_amount = cash * risk_fraction
+            sl_distance = strategy.atr_sl_multiplier * atr[signal_bar]
+            size = risk_amount / sl_distance
+            size = max(0.01, min(size, 10.0))
+
+            sl = close[signal_bar] - direction * sl_distance
+            tp = close[signal_bar] + direction * strategy.atr_tp_multiplier * atr[signal_bar]
+
+            fill_bar = signal_bar + 1
+            entry_price = open_[fill_bar]
+            entry_commission = size * entry_price * self.commission
+
+            if direction > 0:
+                exit_bar, stopped = self._first_hit(
+                    lambda a, b: low[a:b] <= sl,
+                    lambda a, b: high[a:b] >= tp,
+                    fill_bar, n, self.SEARCH_CHUNK
+                )
+            else:
+                exit_bar, stopped = self._first_hit(
+                    lambda a, b: high[a:b] >= sl,
+                    lambda a, b: low[a:b] <= tp,
+                    fill_bar, n, self.SEARCH_CHUNK
+                )
+
+            equity[filled:fill_bar] = cash
+            holding_end = n if exit_bar < 0 else exit_bar
+            equity[fill_bar:holding_end] = (
+                cash - entry_commission
+                + direction * size * (close[fill_bar:holding_end] - entry_price)
+            )
+
+            if exit_bar < 0:
+                # Posizione ancora aperta a fine dati: valutata a mercato
+                filled = n
+                break
+
+            if stopped:
+                exit_price = min(open_[exit_bar], sl) if direction > 0 else max(open_[exit_bar], sl)
+            else:
+                exit_price = max(open_[exit_bar], tp) if direction > 0 else min(open_[exit_bar], tp)
+
+            exit_commission = size * exit_price * self.commission
+            pnl = direction * size * (exit_price - entry_price)
+            pnlcomm = pnl - entry_commission - exit_commission
+            cash += pnlcomm
+            equity[exit_bar] = cash
+
+            trade_rows.append((
+                fill_bar,
+                exit_bar,
+                direction,
+                size,
+                entry_price,
+                exit_price,
+                pnl,
+                pnlcomm,
+                stopped
+            ))
+
+            filled = exit_bar + 1
+            cursor = exit_bar
+
+        equity[filled:] = cash
+
+        self.equity_curve = pd.Series(equity, index=index, name='Equity')
+        self.trades = self._build_trades(index, trade_rows)
+
+        final_value = float(equity[-1]) if n else self.initial_capital
+        logger.info(f'Final Portfolio Value: {final_value:.2f}')
+
+        pnlcomm = self.trades['pnlcomm'].to_numpy()
+        total_trades = len(pnlcomm)
+        won_trades = int((pnlcomm >= 0).sum())
+
+        return {
+            'initial_value': self.initial_capital,
+            'final_value': final_value,
+            'total_return': ((final_value - self.initial_capital) / self.initial_capital) * 100,
+            'sharpe_ratio': annual_sharpe_ratio(self.equity_curve, self.initial_capital),
+            'max_drawdown': max_drawdown(equity, self.initial_capital),
+            'total_trades': total_trades,
+            'won_trades': won_trades,
+            'lost_trades': total_trades - won_trades,
+            'win_rate': (won_trades / total_trades * 100) if total_trades > 0 else 0,
+            **summarize(
+                equity,
+                index,
+                self.initial_capital,
+                pnlcomm,
+                self.trades['entry_time'],
+                self.trades['exit_time']
+            )
+        }
+
+    @staticmethod
+    def _build_trades(index: pd.Index, trade_rows: list) -> pd.DataFrame:
+        # Conversione in blocco a fine simulazione, evitando accessi
+        # all'indice pandas per ogni trade
+        columns = np.array(trade_rows, dtype=float).reshape(-1, 9).T
+        fill_bars = columns[0].astype(np.int64)
+        exit_bars = columns[1].astype(np.int64)
+
+        return pd.DataFrame({
+            'entry_time': index[fill_bars],
+            'exit_time': index[exit_bars],
+            'direction': np.where(columns[2] > 0, 'long', 'short'),
+            'size': columns[3],
+            'entry_price': columns[4],
+            'exit_price': columns[5],
+            'pnl': columns[6],
+            'pnlcomm': columns[7],
+            'status': np.where(columns[8] > 0, 'stop_loss', 'take_profit'),
+        })
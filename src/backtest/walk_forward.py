@@ -0,0 +1,229 @@
+import os
+import numpy as np
+import pandas as pd
+from loguru import logger
+from typing import Dict, List, Optional, Tuple, Union
+from src.backtest.optimizer import (
+    PARAM_NAMES,
+    ParameterOptimizer,
+    build_indicator_cache,
+    evaluation_pool,
+    expand_grid,
+    resolve_grid,
+)
+from src.data.mmap_bars import MmapBars
+from src.strategy.indicator_cache import IndicatorCache
+from src.analytics.performance import annual_sharpe_ratio, max_drawdown, summarize
+
+
+Window = Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, pd.Timestamp]
+
+
+def walk_forward_windows(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    train: pd.Timedelta,
+    test: pd.Timedelta,
+    anchored: bool = False
+) -> List[Window]:
+    # Finestre (train_start, train_end, test_start, test_end), estremi
+    # finali esclusi. Le finestre out-of-sample sono contigue e coprono
+    # lo storico dopo il primo in-sample; l'ultima può essere più corta.
+    # anchored: l'in-sample parte sempre dall'inizio dello storico
+    windows = []
+    train_start = start
+    train_end = start + train
+    while train_end < end:
+        test_end = min(train_end + test, end)
+        windows.append((start if anchored else train_start, train_end, train_end, test_end))
+        train_start += test
+        train_end += test
+    return windows
+
+
+class WalkForwardOptimizer:
+    # Ottimizzazione walk-forward: per ogni finestra in-sample la griglia
+    # viene valutata come in ParameterOptimizer (metriche aggregate sui
+    # simboli), la combinazione migliore viene eseguita sulla finestra
+    # out-of-sample successiva e le equity out-of-sample sono concatenate.
+    # Gli indicatori sono calcolati una volta sull'intero storico e le
+    # finestre ne usano delle slice: EMA e ATR arrivano già a regime come
+    # nel live, il VWAP viene ancorato all'inizio di ogni finestra come in
+    # un backtest su quel periodo. Tutte le combinazioni di tutte le
+    # finestre (e poi tutti gli out-of-sample) girano sullo stesso pool.
+    def __init__(
+        self,
+        train: pd.Timedelta,
+        test: pd.Timedelta,
+        grid: Optional[Dict[str, List]] = None,
+        anchored: bool = False,
+        initial_capital: float = 10000.0,
+        commission: float = 0.0001,
+        risk_percent: float = 1.0,
+        workers: Optional[int] = None,
+        indicator_cache: Optional[IndicatorCache] = None
+    ):
+        self.train = pd.Timedelta(train)
+        self.test = pd.Timedelta(test)
+        self.grid = resolve_grid(grid)
+        self.anchored = anchored
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.risk_percent = risk_percent
+        self.workers = workers or os.cpu_count() or 1
+        self.indicator_cache = indicator_cache
+        self.in_sample: Optional[pd.DataFrame] = None
+        self.folds: Optional[pd.DataFrame] = None
+        self.equity: Dict[str, pd.Series] = {}
+        self.trades: Optional[pd.DataFrame] = None
+        self.summary: Optional[pd.DataFrame] = None
+
+    def run(
+        self,
+        data: Dict[str, Union[pd.DataFrame, MmapBars]],
+        rank_by: str = 'total_return',
+        timeframe: Optional[int] = None
+    ) -> pd.DataFrame:
+        indexes = {symbol: bars.index for symbol, bars in data.items()}
+        start = min(index[0] for index in indexes.values())
+        end = max(index[-1] for index in indexes.values())
+        windows = walk_forward_windows(start, end, self.train, self.test, self.anchored)
+        if not windows:
+            raise ValueError("History shorter than one in-sample window")
+
+        # Posizioni delle finestre nelle barre di ogni simbolo; l'ultima
+        # finestra include la barra finale dello storico
+        bounds = {}
+        for symbol, index in indexes.items():
+            bounds[symbol] = index.searchsorted([edge for window in windows for edge in window]).reshape(-1, 4)
+            bounds[symbol][-1, 3] = index.searchsorted(windows[-1][3], side='right')
+
+        combinations = expand_grid(self.grid)
+        settings = {
+            'initial_capital': self.initial_capital,
+            'commission': self.commission,
+            'risk_percent': self.risk_percent,
+        }
+        in_sample_tasks = []
+        for fold in range(len(windows)):
+            for symbol in data:
+                train_start, train_end, _, _ = bounds[symbol][fold]
+                if train_end - train_start < 2:
+                    continue
+                for params in combinations:
+                    in_sample_tasks.append((fold, (symbol, params, (int(train_start), int(train_end)))))
+
+        logger.info(
+            f"Walk-forward: {len(windows)} folds x {len(combinations)} combinations "
+            f"over {len(data)} symbols ({len(in_sample_tasks)} in-sample backtests, {self.workers} workers)"
+        )
+
+        cache = {
+            symbol: build_indicator_cache(bars, self.grid, self.indicator_cache, symbol, timeframe)
+            for symbol, bars in data.items()
+        }
+        with evaluation_pool(cache, settings, self.workers) as evaluate:
+            rows = evaluate([task for _, task in in_sample_tasks])
+            self.in_sample = pd.DataFrame(rows).assign(fold=[fold for fold, _ in in_sample_tasks])
+
+            best = {}
+            for fold, results in self.in_sample.groupby('fold'):
+                try:
+                    table = ParameterOptimizer.rank(results, rank_by)
+                except ValueError as e:
+                    # Metrica non disponibile nella finestra (es. nessun trade)
+                    logger.warning(f"Fold {fold}: {e}, ranking by total_return")
+                    table = ParameterOptimizer.rank(results, 'total_return')
+                # Per colonna: una riga di DataFrame convertirebbe i periodi in float
+                best[fold] = {name: _native(table[name].iloc[0]) for name in table.columns}
+
+            out_of_sample_tasks = []
+            for fold, row in best.items():
+                params = {name: row[name] for name in PARAM_NAMES if name in row}
+                for symbol in data:
+                    _, _, test_start, test_end = bounds[symbol][fold]
+                    if test_end - test_start < 2:
+                        continue
+                    out_of_sample_tasks.append((fold, (symbol, params, (int(test_start), int(test_end)), True)))
+            out_of_sample = evaluate([task for _, task in out_of_sample_tasks])
+
+        self.folds = self._folds(windows, best, out_of_sample_tasks, out_of_sample, rank_by)
+        self._stitch(out_of_sample_tasks, out_of_sample)
+        return self.folds
+
+    def _folds(self, windows, best, tasks, results, rank_by) -> pd.DataFrame:
+        # Una riga per finestra: periodi, parametri scelti, metrica
+        # in-sample e metriche out-of-sample medie sui simboli
+        out_of_sample = pd.DataFrame([
+            {'fold': fold, **{key: value for key, value in row.items() if key not in ('equity', 'trades')}}
+            for (fold, _), row in zip(tasks, results)
+        ])
+        rows = []
+        for fold, row in best.items():
+            train_start, train_end, test_start, test_end = windows[fold]
+            fold_results = out_of_sample[out_of_sample['fold'] == fold] if len(out_of_sample) else out_of_sample
+            rows.append({
+                'fold': fold,
+                'train_start': train_start,
+                'train_end': train_end,
+                'test_start': test_start,
+                'test_end': test_end,
+                **{name: row[name] for name in PARAM_NAMES if name in row},
+                f'is_{rank_by}': row[rank_by],
+                'oos_total_return': fold_results['total_return'].mean() if len(fold_results) else np.nan,
+                'oos_sharpe_ratio': pd.to_numeric(fold_results['sharpe_ratio']).mean() if len(fold_results) else np.nan,
+                'oos_max_drawdown': fold_results['max_drawdown'].max() if len(fold_results) else np.nan,
+                'oos_trades': int(fold_results['total_trades'].sum()) if len(fold_results) else 0,
+            })
+        return pd.DataFrame(rows)
+
+    def _stitch(self, tasks, results):
+        # Equity out-of-sample concatenata per simbolo: ogni finestra parte
+        # dal capitale iniziale, quindi viene riscalata sul capitale finale
+        # della precedente (rendimenti composti)
+        by_symbol: Dict[str, list] = {}
+        for (fold, (symbol, *_)), row in zip(tasks, results):
+            by_symbol.setdefault(symbol, []).append((fold, row))
+
+        self.equity = {}
+        trades = []
+        summary = []
+        for symbol, rows in by_symbol.items():
+            scale = 1.0
+            curves = []
+            fold_trades = []
+            for fold, row in sorted(rows, key=lambda item: item[0]):
+                curves.append(row['equity'] * scale)
+                fold_trades.append(row['trades'].assign(symbol=symbol, fold=fold))
+                scale *= row['final_value'] / self.initial_capital
+            equity = pd.concat(curves)
+            self.equity[symbol] = equity
+
+            symbol_trades = pd.concat(fold_trades, ignore_index=True)
+            trades.append(symbol_trades)
+            final_value = float(equity.iloc[-1])
+            summary.append({
+                'symbol': symbol,
+                'folds': len(rows),
+                'final_value': final_value,
+                'total_return': (final_value / self.initial_capital - 1.0) * 100,
+                'sharpe_ratio': annual_sharpe_ratio(equity, self.initial_capital),
+                'max_drawdown': max_drawdown(equity.to_numpy(), self.initial_capital),
+                'total_trades': len(symbol_trades),
+                **summarize(
+                    equity.to_numpy(),
+                    equity.index,
+                    self.initial_capital,
+                    symbol_trades['pnlcomm'],
+                    symbol_trades['entry_time'],
+                    symbol_trades['exit_time']
+                ),
+            })
+
+        self.trades = pd.concat(trades, ignore_index=True) if trades else pd.DataFrame()
+        self.summary = pd.DataFrame(summary)
+
+
+def _native(value):
+    # Valori NumPy della tabella -> tipi Python (parametri e CSV)
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,237 @@
+import json
+import time
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from loguru import logger
+from typing import Callable, Dict, List, Optional, Tuple
+from src.data.mmap_bars import MmapBars
+
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Funzione di download: (start, end) -> DataFrame OHLCV o None
+FetchFn = Callable[[datetime, datetime], Optional[pd.DataFrame]]
+
+
+class BarStore:
+    # Archivio locale delle barre in formato Parquet, una directory per
+    # simbolo e timeframe. Ogni aggiornamento scrive un nuovo file "part"
+    # con solo le barre scaricate; il nome contiene un numero progressivo
+    # e il primo/ultimo timestamp, così le letture per intervallo aprono
+    # solo i file che servono. In caso di sovrapposizione vince il part
+    # più recente. meta.json registra l'intervallo già sincronizzato.
+    # I timestamp delle barre sono nell'orario del server del broker:
+    # utc_offset_hours (server meno UTC) serve a sapere quali sono chiuse.
+    TIME_FORMAT = '%Y%m%dT%H%M%S'
+
+    def __init__(
+        self,
+        root: str = "data/bars",
+        max_parts: int = 32,
+        utc_offset_hours: float = 0.0,
+        clock: Callable[[], float] = time.time
+    ):
+        self.root = Path(root)
+        self.max_parts = max_parts
+        self.utc_offset = pd.Timedelta(hours=utc_offset_hours)
+        self.clock = clock
+        self._meta_cache: Dict[Tuple[str, int], dict] = {}
+
+    def _series_path(self, symbol: str, timeframe: int) -> Path:
+        return self.root / symbol / f"M{timeframe}"
+
+    def _parts(self, symbol: str, timeframe: int) -> List[Tuple[int, pd.Timestamp, pd.Timestamp, Path]]:
+        path = self._series_path(symbol, timeframe)
+        if not path.exists():
+            return []
+
+        parts = []
+        for file in path.glob("part-*.parquet"):
+            _, seq, first, last = file.stem.split('-')
+            parts.append((
+                int(seq),
+                pd.Timestamp(datetime.strptime(first, self.TIME_FORMAT)),
+                pd.Timestamp(datetime.strptime(last, self.TIME_FORMAT)),
+                file
+            ))
+        return sorted(parts)
+
+    def _read_meta(self, symbol: str, timeframe: int) -> dict:
+        key = (symbol, timeframe)
+        if key not in self._meta_cache:
+            meta_file = self._series_path(symbol, timeframe) / "meta.json"
+            meta = {}
+            if meta_file.exists():
+                raw = json.loads(meta_file.read_text())
+                meta = {name: pd.Timestamp(value) for name, value in raw.items()}
+            self._meta_cache[key] = meta
+        return self._meta_cache[key]
+
+    def _write_meta(self, symbol: str, timeframe: int, meta: dict):
+        path = self._series_path(symbol, timeframe)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "meta.json").write_text(
+            json.dumps({name: value.isoformat() for name, value in meta.items()})
+        )
+        self._meta_cache[(symbol, timeframe)] = meta
+
+    def coverage(self, symbol: str, timeframe: int) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        meta = self._read_meta(symbol, timeframe)
+        if not meta:
+            return None
+        return meta['synced_from'], meta['synced_to']
+
+    def last_timestamp(self, symbol: str, timeframe: int) -> Optional[pd.Timestamp]:
+        parts = self._parts(symbol, timeframe)
+        if not parts:
+            return None
+        return max(last for _, _, last, _ in parts)
+
+    @staticmethod
+    def _read_parts(files: List[Path]) -> pd.DataFrame:
+        # I part sono in ordine di scrittura: a parità di timestamp
+        # resta la barra scritta per ultima
+        df = pd.concat(pd.read_parquet(file) for file in files)
+        df = df[~df.index.duplicated(keep='last')]
+        return df.sort_index()
+
+    def _write_part(self, path: Path, seq: int, df: pd.DataFrame):
+        first = df.index[0].strftime(self.TIME_FORMAT)
+        last = df.index[-1].strftime(self.TIME_FORMAT)
+        df.index.name = 'time'
+        df.to_parquet(path / f"part-{seq:06d}-{first}-{last}.parquet")
+
+    def append(self, symbol: str, timeframe: int, df: pd.DataFrame):
+        if df is None or df.empty:
+            return
+
+        df = df[BAR_COLUMNS].sort_index()
+        df = df[~df.index.duplicated(keep='last')]
+
+        path = self._series_path(symbol, timeframe)
+        path.mkdir(parents=True, exist_ok=True)
+
+        parts = self._parts(symbol, timeframe)
+        seq = parts[-1][0] + 1 if parts else 0
+        self._write_part(path, seq, df)
+
+        if len(parts) + 1 > self.max_parts:
+            # Unisce solo i part recenti, lasciando intatto il primo
+            # (di solito lo storico più grande)
+            self.compact(symbol, timeframe, keep_base=True)
+
+    def compact(self, symbol: str, timeframe: int, keep_base: bool = False):
+        parts = self._parts(symbol, timeframe)
+        if keep_base:
+            parts = parts[1:]
+        if len(parts) <= 1:
+            return
+
+        df = self._read_parts([file for _, _, _, file in parts])
+        for _, _, _, file in parts:
+            file.unlink()
+        self._write_part(self._series_path(symbol, timeframe), parts[-1][0], df)
+        logger.debug(f"Compacted {len(parts)} parts for {symbol} M{timeframe}")
+
+    def load(
+        self,
+        symbol: str,
+        timeframe: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Optional[pd.DataFrame]:
+        files = [
+            file
+            for _, first, last, file in self._parts(symbol, timeframe)
+            if (end is None or first <= pd.Timestamp(end))
+            and (start is None or last >= pd.Timestamp(start))
+        ]
+        if not files:
+            return None
+
+        df = self._read_parts(files).loc[start:end]
+        if df.empty:
+            return None
+        return df[BAR_COLUMNS]
+
+    def load_mmap(
+        self,
+        symbol: str,
+        timeframe: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Optional[MmapBars]:
+        # Stesso contenuto di load, ma come MmapBars: la copia binaria viene
+        # rigenerata solo quando i part cambiano
+        parts = self._parts(symbol, timeframe)
+        if not parts:
+            return None
+
+        mmap_path = self._series_path(symbol, timeframe) / "mmap"
+        signature_file = mmap_path / "signature"
+        signature = f"{parts[-1][0]}-{len(parts)}"
+        if not signature_file.exists() or signature_file.read_text() != signature:
+            MmapBars.write(mmap_path, self._read_parts([file for _, _, _, file in parts]))
+            signature_file.write_text(signature)
+            logger.debug(f"Rebuilt memory-mapped bars for {symbol} M{timeframe}")
+
+        bars = MmapBars.open(mmap_path).between(start, end)
+        if bars.empty:
+            return None
+        return bars
+
+    def sync(
+        self,
+        symbol: str,
+        timeframe: int,
+        start: datetime,
+        end: datetime,
+        fetch: FetchFn
+    ) -> int:
+        # Scarica solo le parti di [start, end] non ancora in archivio:
+        # la testa mancante e la coda a partire dall'ultima barra salvata,
+        # che viene riscaricata perché poteva essere ancora in formazione.
+        # fetch deve restituire None in caso di errore e un DataFrame
+        # (anche vuoto) se il periodo non contiene barre.
+        # Restituisce il numero di barre scaricate.
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        coverage = self.coverage(symbol, timeframe)
+
+        if coverage is None:
+            ranges = [(start, end)]
+            synced_from, synced_to = start, start
+        else:
+            synced_from, synced_to = coverage
+            ranges = []
+            if start < synced_from:
+                ranges.append((start, synced_from))
+            if end > synced_to:
+                last = self.last_timestamp(symbol, timeframe)
+                tail_start = synced_to if last is None else min(last, synced_to)
+                ranges.append((tail_start, end))
+
+        if not ranges:
+            return 0
+
+        fetched = 0
+        for range_start, range_end in ranges:
+            df = fetch(range_start.to_pydatetime(), range_end.to_pydatetime())
+            if df is None:
+                # Errore di download: la copertura resta invariata e il
+                # prossimo sync riproverà
+                return fetched
+            self.append(symbol, timeframe, df)
+            fetched += len(df)
+
+        # Il periodo conta come sincronizzato solo fino all'ultima barra
+        # sicuramente chiusa, nell'orario del server come le barre
+        now = pd.Timestamp(self.clock(), unit='s') + self.utc_offset
+        closed_until = now - pd.Timedelta(minutes=timeframe)
+        self._write_meta(symbol, timeframe, {
+            'synced_from': min(start, synced_from),
+            'synced_to': max(synced_to, min(end, closed_until))
+        })
+        logger.debug(f"Synced {fetched} bars for {symbol} M{timeframe}")
+
+        return fetched
@@ -0,0 +1,213 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+from collections import deque
+from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from loguru import logger
+from typing import Any, Dict, List, Optional
+from src.data.twelvedata_downloader import BAR_COLUMNS, INTERVAL_MINUTES
+
+
+class LatencyTracker:
+    # Ultime window latenze (in secondi) di un provider
+    def __init__(self, window: int = 1000):
+        self.samples: deque = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+
+    def record(self, seconds: float, ok: bool = True):
+        with self.lock:
+            self.requests += 1
+            self.samples.append(seconds)
+            if not ok:
+                self.errors += 1
+
+    def record_win(self):
+        with self.lock:
+            self.wins += 1
+
+    def get_statistics(self) -> Dict:
+        with self.lock:
+            samples = np.array(self.samples)
+            stats = {'requests': self.requests, 'errors': self.errors, 'wins': self.wins}
+
+        if len(samples) == 0:
+            stats.update(p50=None, p90=None, p99=None, max=None)
+            return stats
+
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+        stats.update(p50=p50, p90=p90, p99=p99, max=samples.max())
+        return stats
+
+
+class TwelveDataSource:
+    # Adatta TwelveDataProvider al contratto di MT5Provider:
+    # timeframe in minuti e date come datetime. time_offset sposta i
+    # timestamp sull'orario del server del broker.
+    def __init__(self, provider: Any, time_offset: timedelta = timedelta(0)):
+        self.provider = provider
+        self.time_offset = time_offset
+        self.intervals = {minutes: interval for interval, minutes in INTERVAL_MINUTES.items()}
+
+    def get_historical_data(
+        self,
+        symbol: str,
+        timeframe: int,
+        start: datetime,
+        end: datetime
+    ) -> Optional[pd.DataFrame]:
+        interval = self.intervals.get(timeframe)
+        if interval is None:
+            logger.error(f"Timeframe M{timeframe} not available on TwelveData")
+            return None
+
+        df = self.provider.get_historical_data(
+            symbol,
+            interval,
+            (start - self.time_offset).strftime('%Y-%m-%d %H:%M:%S'),
+            (end - self.time_offset).strftime('%Y-%m-%d %H:%M:%S')
+        )
+        if df is None:
+            return None
+
+        df = df.copy()
+        df.index = df.index + self.time_offset
+        return df
+
+
+class HedgedProvider:
+    # Provider composito con lo stesso get_historical_data di MT5Provider.
+    # La richiesta parte sul primario; se non risponde entro hedge_after
+    # secondi (o fallisce) parte la stessa richiesta sul secondario e vince
+    # la prima risposta valida. Le richieste perdenti ancora in coda vengono
+    # annullate; quelle già in corso non si possono interrompere, quindi
+    # finché il primario ha una richiesta in corso per il simbolo non ne
+    # parte un'altra (un solo worker occupato per simbolo) e si va subito
+    # sul secondario. La latenza delle richieste lente viene comunque
+    # registrata per i percentili.
+    def __init__(
+        self,
+        primary: Any,
+        secondary: Any,
+        hedge_after: float = 2.0,
+        timeout: float = 30.0,
+        names: Optional[List[str]] = None,
+        max_workers: int = 8
+    ):
+        self.providers = [primary, secondary]
+        self.names = names or [type(primary).__name__, type(secondary).__name__]
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='provider')
+        self.latency = {name: LatencyTracker() for name in self.names}
+        self.hedged = 0
+        # Richieste del primario ancora in corso, per simbolo
+        self.inflight: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        # Stesse colonne e ordinamento indipendentemente dalla fonte
+        if df is None or df.empty:
+            return None
+        if 'Volume' not in df.columns or not (df['Volume'].fillna(0.0) > 0).any():
+            # Fonte senza volumi (es. TwelveData sul forex): volume unitario,
+            # così la VWAP resta calcolabile (media del prezzo tipico)
+            # invece di diventare NaN e bloccare i segnali
+            df = df.assign(Volume=1.0)
+        df = df[BAR_COLUMNS].astype(float)
+        df.index.name = 'time'
+        return df if df.index.is_monotonic_increasing else df.sort_index()
+
+    def _call(self, index: int, symbol: str, timeframe: int, start: datetime, end: datetime) -> Optional[pd.DataFrame]:
+        tracker = self.latency[self.names[index]]
+        started = time.perf_counter()
+        try:
+            df = self._normalize(self.providers[index].get_historical_data(symbol, timeframe, start, end))
+        except Exception as e:
+            tracker.record(time.perf_counter() - started, ok=False)
+            logger.error(f"{self.names[index]} failed for {symbol}: {e}")
+            return None
+
+        tracker.record(time.perf_counter() - started, ok=df is not None)
+        return df
+
+    def get_historical_data(
+        self,
+        symbol: str,
+        timeframe: int,
+        start: datetime,
+        end: datetime
+    ) -> Optional[pd.DataFrame]:
+        deadline = time.monotonic() + self.timeout
+        futures: Dict[Future, int] = {}
+        with self.lock:
+            running = self.inflight.get(symbol)
+            if running is None or running.done():
+                primary = self.executor.submit(self._call, 0, symbol, timeframe, start, end)
+                self.inflight[symbol] = primary
+                futures[primary] = 0
+
+        if futures:
+            # Fuori dal lock: se la richiesta è già finita la callback parte subito
+            primary.add_done_callback(lambda future: self._release(symbol, future))
+            done, _ = wait(set(futures), timeout=self.hedge_after)
+            for future in done:
+                if future.result() is not None:
+                    self.latency[self.names[0]].record_win()
+                    return future.result()
+            reason = 'slow or failed'
+        else:
+            reason = 'still busy with the previous request'
+
+        # Primario lento o fallito: richiesta di riserva sul secondario
+        self.hedged += 1
+        logger.warning(f"{self.names[0]} {reason} for {symbol}, hedging on {self.names[1]}")
+        futures[self.executor.submit(self._call, 1, symbol, timeframe, start, end)] = 1
+
+        pending = {future for future in futures if not future.done() or future.result() is not None}
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    if future.result() is not None:
+                        self.latency[self.names[futures[future]]].record_win()
+                        return future.result()
+        finally:
+            # Le richieste perdenti non ancora partite non occupano worker
+            for future in pending:
+                future.cancel()
+
+        logger.error(f"No data retrieved for {symbol} from any provider")
+        return None
+
+    def _release(self, symbol: str, future: Future):
+        with self.lock:
+            if self.inflight.get(symbol) is future:
+                del self.inflight[symbol]
+
+    def get_statistics(self) -> Dict:
+        stats = {name: tracker.get_statistics() for name, tracker in self.latency.items()}
+        stats['hedged'] = self.hedged
+        return stats
+
+    def log_statistics(self):
+        for name, tracker in self.latency.items():
+            stats = tracker.get_statistics()
+            if stats['p50'] is None:
+                continue
+            logger.info(
+                f"{name} latency p50={stats['p50'] * 1000:.0f}ms "
+                f"p90={stats['p90'] * 1000:.0f}ms p99={stats['p99'] * 1000:.0f}ms | "
+                f"requests={stats['requests']} errors={stats['errors']} wins={stats['wins']}"
+            )
+        logger.info(f"Hedged requests: {self.hedged}")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
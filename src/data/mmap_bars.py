@@ -0,0 +1,141 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+
+# Formato binario a dtype fisso: un file .npy per campo, così ogni
+# colonna è contigua su disco e una slice è una vista senza copie
+BAR_FIELDS = {
+    'time': np.dtype('datetime64[ns]'),
+    'Open': np.dtype('float64'),
+    'High': np.dtype('float64'),
+    'Low': np.dtype('float64'),
+    'Close': np.dtype('float64'),
+    'Volume': np.dtype('float64'),
+}
+
+PRICE_COLUMNS = [name for name in BAR_FIELDS if name != 'time']
+
+
+class MmapBars:
+    # Storico OHLCV aperto con numpy.memmap in sola lettura. Più processi
+    # che aprono lo stesso file condividono le pagine tramite la page cache
+    # del sistema operativo. Supporta l'accesso per colonna come un
+    # DataFrame (bars['Close'] -> pd.Series senza copia), per cui le
+    # funzioni in src.strategy.indicators lo accettano direttamente.
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        path: Optional[Path] = None,
+        start: int = 0
+    ):
+        self.columns = columns
+        self.path = path
+        self.start = start
+        self._index: Optional[pd.DatetimeIndex] = None
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> 'MmapBars':
+        path = Path(path)
+        columns = {
+            name: np.load(path / f"{name}.npy", mmap_mode='r')
+            for name in BAR_FIELDS
+        }
+        return cls(columns, path)
+
+    @classmethod
+    def write(cls, path: Union[str, Path], df: pd.DataFrame) -> 'MmapBars':
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        values = {'time': df.index.to_numpy(dtype='datetime64[ns]')}
+        values.update({name: df[name].to_numpy(dtype=float) for name in PRICE_COLUMNS})
+
+        for name, dtype in BAR_FIELDS.items():
+            # Scrittura su file temporaneo e rename atomico: chi ha già il
+            # file mappato continua a leggere la versione precedente
+            tmp = path / f".{name}.npy.tmp"
+            out = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(len(df),))
+            out[:] = values[name]
+            out.flush()
+            del out
+            os.replace(tmp, path / f"{name}.npy")
+
+        return cls.open(path)
+
+    def __len__(self) -> int:
+        return len(self.columns['time'])
+
+    def __reduce__(self):
+        # In un process pool viaggia solo il percorso, non i dati
+        if self.path is None:
+            return (MmapBars, (self.columns,))
+        return (_reopen, (str(self.path), self.start, self.start + len(self)))
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        if self._index is None:
+            self._index = pd.DatetimeIndex(self.columns['time'], copy=False)
+        return self._index
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("MmapBars slices must be contiguous")
+            return MmapBars(
+                {name: column[start:stop] for name, column in self.columns.items()},
+                self.path,
+                self.start + start
+            )
+        return pd.Series(self.columns[key], index=self.index, name=key, copy=False)
+
+    def to_numpy(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> 'MmapBars':
+        # Selezione per timestamp (estremi inclusi), sempre senza copia
+        time = self.columns['time']
+        first = 0 if start is None else int(np.searchsorted(time, np.datetime64(start, 'ns'), side='left'))
+        last = len(self) if end is None else int(np.searchsorted(time, np.datetime64(end, 'ns'), side='right'))
+        return self[first:last]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {name: self.columns[name] for name in PRICE_COLUMNS},
+            index=self.index,
+            copy=False
+        )
+
+
+def _reopen(path: str, start: int, stop: int) -> MmapBars:
+    return MmapBars.open(path)[start:stop]
+
+
+def time_values(bars: Union[pd.DataFrame, MmapBars]) -> np.ndarray:
+    # Timestamp come int64 (ns dall'epoch), senza copia
+    if isinstance(bars, MmapBars):
+        return bars.columns['time'].view(np.int64)
+    return bars.index.asi8
+
+
+def column_values(bars: Union[pd.DataFrame, MmapBars], name: str) -> np.ndarray:
+    # Colonna di prezzi come array NumPy, senza copia
+    if isinstance(bars, MmapBars):
+        return bars.columns[name]
+    return bars[name].to_numpy()
@@ -1,24 +1,52 @@
-import MetaTrader5 as mt5
+import time
 import pandas as pd
 from datetime import datetime, timedelta
+from types import ModuleType
 from loguru import logger
-from typing import Optional
+from typing import Optional, Tuple
+from src.data.bar_store import BarStore
+from src.data.mmap_bars import MmapBars
+from src.data.resampler import resample_bars, resample_columns
+from src.monitoring.metrics import MetricsRegistry
+
+try:
+    import MetaTrader5 as mt5
+except ImportError:  # Linux/macOS: solo il terminale simulato (src.data.mt5_sim)
+    mt5 = None
 
 
 class MT5Provider:
-    def __init__(self, login: int, password: str, server: str):
+    def __init__(
+        self, 
+        login: int, 
+        password: str, 
+        server: str,
+        bar_store: Optional[BarStore] = None,
+        resample_from: Optional[int] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        terminal: Optional[ModuleType] = None
+    ):
+        # terminal: modulo con l'interfaccia di MetaTrader5, di default il
+        # pacchetto reale (es. src.data.mt5_sim per il terminale simulato)
+        self.mt5 = terminal if terminal is not None else mt5
+        if self.mt5 is None:
+            raise ImportError("MetaTrader5 package not available: use the simulated terminal (src.data.mt5_sim)")
         self.login = login
         self.password = password
         self.server = server
         self.connected = False
+        self.bar_store = bar_store
+        self.resample_from = resample_from
+        # Latenza delle chiamate al terminale (copy_rates_range, order_send)
+        self.metrics = metrics
     
     def connect(self) -> bool:
-        if not mt5.initialize():
+        if not self.mt5.initialize():
             logger.error("MT5 initialization failed")
             return False
         
-        if not mt5.login(self.login, self.password, self.server):
-            logger.error(f"MT5 login failed: {mt5.last_error()}")
+        if not self.mt5.login(self.login, self.password, self.server):
+            logger.error(f"MT5 login failed: {self.mt5.last_error()}")
             return False
         
         self.connected = True
@@ -27,7 +55,7 @@ class MT5Provider:
     
     def disconnect(self):
         if self.connected:
-            mt5.shutdown()
+            self.mt5.shutdown()
             self.connected = False
             logger.info("Disconnected from MT5")
     
@@ -38,28 +66,142 @@ class MT5Provider:
         start: datetime, 
         end: datetime
     ) -> Optional[pd.DataFrame]:
+        if self.bar_store is not None:
+            return self._get_stored_data(symbol, timeframe, start, end)
+        
         if not self.connected:
             logger.error("Not connected to MT5")
             return None
         
+        df = self._fetch_rates(symbol, timeframe, start, end)
+        
+        if df is None or df.empty:
+            logger.warning(f"No data retrieved for {symbol}")
+            return None
+        
+        logger.info(f"Retrieved {len(df)} bars for {symbol}")
+        return df
+    
+    def get_historical_bars(
+        self, 
+        symbol: str, 
+        timeframe: int, 
+        start: datetime, 
+        end: datetime
+    ) -> Optional[MmapBars]:
+        # Come get_historical_data, ma restituisce una vista memory-mapped
+        # dell'archivio locale invece di un DataFrame
+        if self.bar_store is None:
+            logger.error("Memory-mapped bars require a bar store")
+            return None
+        
+        source, downloaded = self._sync_store(symbol, timeframe, start, end)
+        
+        if source == timeframe:
+            bars = self.bar_store.load_mmap(symbol, timeframe, start, end)
+        else:
+            # Le barre aggregate sono piccole: restano in memoria
+            base = self.bar_store.load_mmap(symbol, source, start, self._source_end(timeframe, source, end))
+            bars = None
+            if base is not None:
+                bars = MmapBars(resample_columns(base, timeframe)).between(start, end)
+                bars = None if bars.empty else bars
+        
+        if bars is None:
+            logger.warning(f"No data retrieved for {symbol}")
+            return None
+        
+        logger.info(f"Mapped {len(bars)} bars for {symbol} ({downloaded} downloaded)")
+        return bars
+    
+    def _get_stored_data(
+        self, 
+        symbol: str, 
+        timeframe: int, 
+        start: datetime, 
+        end: datetime
+    ) -> Optional[pd.DataFrame]:
+        source, downloaded = self._sync_store(symbol, timeframe, start, end)
+        
+        if source == timeframe:
+            df = self.bar_store.load(symbol, timeframe, start, end)
+        else:
+            df = self.bar_store.load(symbol, source, start, self._source_end(timeframe, source, end))
+            if df is not None:
+                df = resample_bars(df, timeframe, source).loc[start:end]
+                df = None if df.empty else df
+        
+        if df is None:
+            logger.warning(f"No data retrieved for {symbol}")
+            return None
+        
+        logger.info(f"Retrieved {len(df)} bars for {symbol} ({downloaded} downloaded)")
+        return df
+    
+    def _source_timeframe(self, timeframe: int) -> int:
+        # Timeframe scaricato dal terminale: con resample_from i timeframe
+        # superiori vengono aggregati in locale dalle stesse barre di base
+        if self.resample_from and timeframe % self.resample_from == 0:
+            return self.resample_from
+        return timeframe
+    
+    @staticmethod
+    def _source_end(timeframe: int, source: int, end: datetime) -> datetime:
+        # L'ultima barra aggregata (apertura <= end) comprende anche le
+        # barre di base successive a end
+        return end + timedelta(minutes=timeframe - source)
+    
+    def _sync_store(
+        self, 
+        symbol: str, 
+        timeframe: int, 
+        start: datetime, 
+        end: datetime
+    ) -> Tuple[int, int]:
+        # Scarica dal terminale solo le barre mancanti nell'archivio locale
+        source = self._source_timeframe(timeframe)
+        
+        def fetch(range_start: datetime, range_end: datetime) -> Optional[pd.DataFrame]:
+            if not self.connected:
+                logger.error("Not connected to MT5")
+                return None
+            return self._fetch_rates(symbol, source, range_start, range_end)
+        
+        source_end = self._source_end(timeframe, source, end)
+        downloaded = self.bar_store.sync(symbol, source, start, source_end, fetch)
+        return source, downloaded
+    
+    def _fetch_rates(
+        self, 
+        symbol: str, 
+        timeframe: int, 
+        start: datetime, 
+        end: datetime
+    ) -> Optional[pd.DataFrame]:
         # Converti timeframe minuti a MT5 timeframe
         tf_map = {
-            1: mt5.TIMEFRAME_M1,
-            5: mt5.TIMEFRAME_M5,
-            15: mt5.TIMEFRAME_M15,
-            30: mt5.TIMEFRAME_M30,
-            60: mt5.TIMEFRAME_H1,
+            1: self.mt5.TIMEFRAME_M1,
+            5: self.mt5.TIMEFRAME_M5,
+            15: self.mt5.TIMEFRAME_M15,
+            30: self.mt5.TIMEFRAME_M30,
+            60: self.mt5.TIMEFRAME_H1,
         }
         
-        mt5_timeframe = tf_map.get(timeframe, mt5.TIMEFRAME_M5)
+        mt5_timeframe = tf_map.get(timeframe, self.mt5.TIMEFRAME_M5)
         
-        rates = mt5.copy_rates_range(symbol, mt5_timeframe, start, end)
+        started = time.perf_counter()
+        rates = self.mt5.copy_rates_range(symbol, mt5_timeframe, start, end)
+        if self.metrics:
+            self.metrics.observe('mt5_call_seconds', time.perf_counter() - started, call='copy_rates_range', symbol=symbol)
         
-        if rates is None or len(rates) == 0:
-            logger.warning(f"No data retrieved for {symbol}")
+        if rates is None:
+            logger.error(f"copy_rates_range failed for {symbol}: {self.mt5.last_error()}")
             return None
         
         df = pd.DataFrame(rates)
+        if df.empty:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        
         df['time'] = pd.to_datetime(df['time'], unit='s')
         df.set_index('time', inplace=True)
         df.rename(columns={
@@ -70,14 +212,13 @@ class MT5Provider:
             'tick_volume': 'Volume'
         }, inplace=True)
         
-        logger.info(f"Retrieved {len(df)} bars for {symbol}")
         return df[['Open', 'High', 'Low', 'Close', 'Volume']]
     
     def get_account_info(self) -> dict:
         if not self.connected:
             return {}
         
-        account = mt5.account_info()
+        account = self.mt5.account_info()
         if account is None:
             return {}
         
@@ -102,27 +243,35 @@ class MT5Provider:
             logger.error("Not connected to MT5")
             return None
         
-        point = mt5.symbol_info(symbol).point
-        price = mt5.symbol_info_tick(symbol).ask if order_type == 'buy' else mt5.symbol_info_tick(symbol).bid
+        point = self.mt5.symbol_info(symbol).point
+        price = self.mt5.symbol_info_tick(symbol).ask if order_type == 'buy' else self.mt5.symbol_info_tick(symbol).bid
         
         request = {
-            "action": mt5.TRADE_ACTION_DEAL,
+            "action": self.mt5.TRADE_ACTION_DEAL,
             "symbol": symbol,
             "volume": volume,
-            "type": mt5.ORDER_TYPE_BUY if order_type == 'buy' else mt5.ORDER_TYPE_SELL,
+            "type": self.mt5.ORDER_TYPE_BUY if order_type == 'buy' else self.mt5.ORDER_TYPE_SELL,
             "price": price,
             "sl": sl,
             "tp": tp,
             "deviation": 20,
             "magic": 234000,
             "comment": comment,
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": mt5.ORDER_FILLING_IOC,
+            "type_time": self.mt5.ORDER_TIME_GTC,
+            "type_filling": self.mt5.ORDER_FILLING_IOC,
         }
         
-        result = mt5.order_send(request)
+        started = time.perf_counter()
+        result = self.mt5.order_send(request)
+        if self.metrics:
+            # Round-trip dell'ordine: invio e conferma del server
+            self.metrics.observe('mt5_call_seconds', time.perf_counter() - started, call='order_send', symbol=symbol)
+        
+        if result is None:
+            logger.error(f"order_send failed: {self.mt5.last_error()}")
+            return None
         
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
+        if result.retcode != self.mt5.TRADE_RETCODE_DONE:
             logger.error(f"Order failed: {result.retcode} - {result.comment}")
             return None
         
@@ -0,0 +1,544 @@
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple, Union
+from src.data.bar_store import BarStore
+
+
+# Terminale MT5 simulato: stessa interfaccia del pacchetto MetaTrader5
+# (solo Windows) per le funzioni usate da MT5Provider, così il loop di
+# paper/live gira anche su Linux per test di carico e latenza. Il modulo
+# sostituisce MetaTrader5 (MT5Provider(..., terminal=mt5_sim)); come nel
+# pacchetto reale il terminale è unico per processo, configure(...) lo
+# ricrea con latenza, rifiuti e sorgente delle barre.
+
+# Costanti con gli stessi valori di MetaTrader5
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+TRADE_ACTION_DEAL = 1
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+
+RES_S_OK = 1
+RES_E_FAIL = -1
+RES_E_INTERNAL_FAIL_INIT = -10005
+RES_E_NO_IPC = -10004
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+    ('real_volume', '<u8'),
+])
+
+SymbolInfo = namedtuple('SymbolInfo', [
+    'name', 'visible', 'digits', 'point', 'spread', 'trade_contract_size',
+    'volume_min', 'volume_max', 'volume_step', 'bid', 'ask'
+])
+Tick = namedtuple('Tick', ['time', 'bid', 'ask', 'last', 'volume', 'time_msc', 'flags', 'volume_real'])
+AccountInfo = namedtuple('AccountInfo', [
+    'login', 'server', 'name', 'currency', 'leverage', 'balance', 'equity',
+    'profit', 'margin', 'margin_free', 'margin_level'
+])
+TradePosition = namedtuple('TradePosition', [
+    'ticket', 'time', 'type', 'volume', 'price_open', 'sl', 'tp',
+    'price_current', 'profit', 'symbol', 'comment', 'magic'
+])
+OrderSendResult = namedtuple('OrderSendResult', [
+    'retcode', 'deal', 'order', 'volume', 'price', 'bid', 'ask', 'comment',
+    'request_id', 'retcode_external', 'request'
+])
+
+# Prezzo di partenza dei simboli sintetici (1.0 per gli altri)
+BASE_PRICES = {
+    'EURUSD': 1.08,
+    'GBPUSD': 1.27,
+    'USDJPY': 150.0,
+    'AUDUSD': 0.66,
+    'USDCHF': 0.88,
+    'USDCAD': 1.36,
+    'NZDUSD': 0.61,
+    'XAUUSD': 2000.0,
+}
+
+# Componenti periodiche del prezzo sintetico: (periodo in minuti, ampiezza
+# del logaritmo del prezzo). Danno trend e inversioni su più scale
+CYCLES = ((90, 0.0008), (660, 0.002), (5330, 0.006), (24480, 0.015))
+
+
+def _splitmix(x: np.ndarray) -> np.ndarray:
+    # Hash uint64 → uint64: rumore deterministico per indice, senza stato
+    z = x + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _uniform(seed: int, minutes: np.ndarray, channel: int) -> np.ndarray:
+    keys = (minutes.astype(np.uint64) << np.uint64(3)) + np.uint64(channel)
+    keys ^= np.uint64(seed) << np.uint64(40)
+    return (_splitmix(keys) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def timeframe_minutes(timeframe: int) -> int:
+    # TIMEFRAME_H*/D1 hanno il bit 0x4000 e il numero di ore nei bit bassi
+    if timeframe & 0x4000:
+        return (timeframe & 0x3FFF) * 60
+    return timeframe
+
+
+def _epoch(value: Union[datetime, pd.Timestamp, int, float]) -> int:
+    # Come MetaTrader5: datetime senza timezone sono in UTC
+    if isinstance(value, (int, float, np.integer)):
+        return int(value)
+    stamp = pd.Timestamp(value)
+    if stamp.tz is None:
+        stamp = stamp.tz_localize('UTC')
+    return stamp.value // 10**9
+
+
+def _market_open(minutes: np.ndarray) -> np.ndarray:
+    # Forex chiuso da venerdì 22:00 a domenica 22:00 UTC
+    weekday = (minutes // 1440 + 3) % 7
+    minute_of_day = minutes % 1440
+    closed = (
+        (weekday == 5)
+        | ((weekday == 4) & (minute_of_day >= 1320))
+        | ((weekday == 6) & (minute_of_day < 1320))
+    )
+    return ~closed
+
+
+def synthetic_rates(symbol: str, timeframe: int, start: int, end: int, now: Optional[int] = None) -> np.ndarray:
+    # Barre sintetiche con apertura in [start, end] (epoch in secondi). Ogni
+    # minuto è funzione solo del simbolo e dell'istante, quindi richieste
+    # sovrapposte restituiscono le stesse barre e i timeframe superiori
+    # sono esattamente l'aggregazione delle M1. Con now l'ultima barra
+    # comprende solo i minuti già iniziati (barra in formazione)
+    if now is not None:
+        end = min(end, now)
+    minutes_per_bar = timeframe_minutes(timeframe)
+    first_bar = -(-start // (minutes_per_bar * 60))
+    last_bar = end // (minutes_per_bar * 60)
+    if last_bar < first_bar:
+        return np.empty(0, dtype=RATES_DTYPE)
+
+    last_minute = (last_bar + 1) * minutes_per_bar
+    if now is not None:
+        last_minute = min(last_minute, now // 60 + 1)
+    minutes = np.arange(first_bar * minutes_per_bar, last_minute, dtype=np.int64)
+    minutes = minutes[_market_open(minutes)]
+    if len(minutes) == 0:
+        return np.empty(0, dtype=RATES_DTYPE)
+
+    seed = zlib.crc32(symbol.encode())
+    base = BASE_PRICES.get(symbol, 1.0)
+
+    def close_at(m: np.ndarray) -> np.ndarray:
+        log_price = sum(
+            amplitude * np.sin(2 * np.pi * m / period + (seed % 1000 + k * 137) / 100)
+            for k, (period, amplitude) in enumerate(CYCLES)
+        )
+        log_price = log_price + 0.0003 * (2 * _uniform(seed, m, 0) - 1)
+        return base * np.exp(log_price)
+
+    close = close_at(minutes)
+    open_ = close_at(minutes - 1)
+    high = np.maximum(open_, close) * (1 + 0.0002 * _uniform(seed, minutes, 1))
+    low = np.minimum(open_, close) * (1 - 0.0002 * _uniform(seed, minutes, 2))
+    volume = (20 + 200 * _uniform(seed, minutes, 3)).astype(np.uint64)
+
+    # Aggregazione dei minuti nelle barre del timeframe
+    bars = minutes // minutes_per_bar
+    starts = np.flatnonzero(np.concatenate(([True], bars[1:] != bars[:-1])))
+    ends = np.concatenate((starts[1:], [len(minutes)])) - 1
+
+    rates = np.empty(len(starts), dtype=RATES_DTYPE)
+    rates['time'] = bars[starts] * minutes_per_bar * 60
+    rates['open'] = open_[starts]
+    rates['high'] = np.maximum.reduceat(high, starts)
+    rates['low'] = np.minimum.reduceat(low, starts)
+    rates['close'] = close[ends]
+    rates['tick_volume'] = np.add.reduceat(volume, starts)
+    rates['spread'] = 0
+    rates['real_volume'] = 0
+    return rates
+
+
+class _Position:
+    def __init__(self, ticket: int, symbol: str, direction: int, volume: float, price: float, sl: float, tp: float, opened: int, comment: str, magic: int):
+        self.ticket = ticket
+        self.symbol = symbol
+        # 1 buy, -1 sell
+        self.direction = direction
+        self.volume = volume
+        self.price = price
+        self.sl = sl
+        self.tp = tp
+        self.opened = opened
+        self.comment = comment
+        self.magic = magic
+
+
+class SimulatedTerminal:
+    # Barre dal BarStore locale se presenti, altrimenti sintetiche; solo
+    # quelle già aperte secondo clock. Ogni chiamata attende latency
+    # (order_latency per order_send) più rumore gaussiano jitter, e
+    # order_send rifiuta con probabilità reject_rate; copy_rates_range
+    # fallisce con probabilità error_rate. Le posizioni aperte si chiudono
+    # quando il prezzo corrente tocca SL o TP e il profitto va nel saldo
+    # (in valuta di quotazione, senza conversione).
+    def __init__(
+        self,
+        bar_store: Optional[BarStore] = None,
+        latency: float = 0.0,
+        order_latency: Optional[float] = None,
+        jitter: float = 0.0,
+        reject_rate: float = 0.0,
+        error_rate: float = 0.0,
+        balance: float = 10000.0,
+        leverage: int = 100,
+        spread_points: int = 10,
+        seed: int = 0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.bar_store = bar_store
+        self.latency = latency
+        self.order_latency = latency if order_latency is None else order_latency
+        self.jitter = jitter
+        self.reject_rate = reject_rate
+        self.error_rate = error_rate
+        self.balance = balance
+        self.leverage = leverage
+        self.spread_points = spread_points
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = np.random.default_rng(seed)
+        # Le chiamate arrivano dai worker del TradingLoop
+        self.lock = threading.Lock()
+        self.initialized = False
+        self.account: Tuple[int, str] = (0, '')
+        self.error: Tuple[int, str] = (RES_S_OK, 'Success')
+        self.positions: Dict[int, _Position] = {}
+        self.next_ticket = 1
+        self.calls: Dict[str, int] = {}
+        self.rejected = 0
+
+    def _call(self, name: str, order: bool = False) -> bool:
+        # Latenza simulata; False se il terminale non è inizializzato
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            delay = self.order_latency if order else self.latency
+            if self.jitter:
+                delay = max(0.0, delay + self.rng.normal(0.0, self.jitter))
+        if delay > 0:
+            self.sleep(delay)
+        if not self.initialized:
+            self.error = (RES_E_NO_IPC, 'No IPC connection')
+            return False
+        self.error = (RES_S_OK, 'Success')
+        return True
+
+    def initialize(self, *args, **kwargs) -> bool:
+        self._call('initialize')
+        self.initialized = True
+        self.error = (RES_S_OK, 'Success')
+        return True
+
+    def login(self, login: int, password: str = '', server: str = '', **kwargs) -> bool:
+        if not self._call('login'):
+            return False
+        self.account = (login, server)
+        return True
+
+    def shutdown(self):
+        self.initialized = False
+
+    def last_error(self) -> Tuple[int, str]:
+        return self.error
+
+    def _stored_rates(self, symbol: str, timeframe: int, start: int, end: int) -> Optional[np.ndarray]:
+        if self.bar_store is None:
+            return None
+        df = self.bar_store.load(
+            symbol,
+            timeframe_minutes(timeframe),
+            pd.Timestamp(start, unit='s'),
+            pd.Timestamp(end, unit='s')
+        )
+        if df is None or df.empty:
+            return None
+        rates = np.zeros(len(df), dtype=RATES_DTYPE)
+        rates['time'] = df.index.asi8 // 10**9
+        for field, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close')):
+            rates[field] = df[column].to_numpy()
+        rates['tick_volume'] = df['Volume'].to_numpy()
+        return rates
+
+    def _rates(self, symbol: str, timeframe: int, start: int, end: int) -> np.ndarray:
+        # Mai oltre l'istante corrente: l'ultima barra è quella in formazione
+        now = int(self.clock())
+        end = min(end, now)
+        rates = self._stored_rates(symbol, timeframe, start, end)
+        if rates is None:
+            rates = synthetic_rates(symbol, timeframe, start, end, now)
+        return rates
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from, date_to) -> Optional[np.ndarray]:
+        if not self._call('copy_rates_range'):
+            return None
+        with self.lock:
+            failed = self.error_rate and self.rng.random() < self.error_rate
+        if failed:
+            self.error = (RES_E_FAIL, 'Terminal: Call failed')
+            return None
+        return self._rates(symbol, timeframe, _epoch(date_from), _epoch(date_to))
+
+    def _symbol_info(self, symbol: str) -> SymbolInfo:
+        digits = 3 if 'JPY' in symbol else 2 if symbol.startswith('XAU') else 5
+        point = 10.0 ** -digits
+        bid, ask = self._quote(symbol, point)
+        return SymbolInfo(
+            name=symbol, visible=True, digits=digits, point=point,
+            spread=self.spread_points, trade_contract_size=100.0 if symbol.startswith('XAU') else 100000.0,
+            volume_min=0.01, volume_max=100.0, volume_step=0.01, bid=bid, ask=ask
+        )
+
+    def _quote(self, symbol: str, point: float) -> Tuple[float, float]:
+        # Bid: chiusura dell'ultima barra in archivio degli ultimi tre giorni
+        # (il mercato chiude al massimo due), altrimenti del minuto sintetico
+        now = int(self.clock())
+        for timeframe in (TIMEFRAME_M1, TIMEFRAME_M5, TIMEFRAME_M15, TIMEFRAME_M30, TIMEFRAME_H1):
+            rates = self._stored_rates(symbol, timeframe, now - 3 * 86400, now)
+            if rates is not None:
+                break
+        else:
+            rates = synthetic_rates(symbol, TIMEFRAME_M1, now - 3 * 86400, now, now)
+        bid = float(rates['close'][-1]) if len(rates) else BASE_PRICES.get(symbol, 1.0)
+        return bid, bid + self.spread_points * point
+
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        if not self._call('symbol_info'):
+            return None
+        return self._symbol_info(symbol)
+
+    def symbols_get(self, group: str = '*') -> Optional[Tuple[SymbolInfo, ...]]:
+        if not self._call('symbols_get'):
+            return None
+        return tuple(self._symbol_info(symbol) for symbol in BASE_PRICES)
+
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        if not self._call('symbol_info_tick'):
+            return None
+        info = self._symbol_info(symbol)
+        now = self.clock()
+        return Tick(
+            time=int(now), bid=info.bid, ask=info.ask, last=0.0, volume=0,
+            time_msc=int(now * 1000), flags=6, volume_real=0.0
+        )
+
+    def _settle(self):
+        # Chiude le posizioni il cui SL o TP è stato toccato dal prezzo corrente
+        with self.lock:
+            positions = list(self.positions.values())
+        for position in positions:
+            info = self._symbol_info(position.symbol)
+            price = info.bid if position.direction == 1 else info.ask
+            hit_sl = position.sl and (position.sl - price) * position.direction >= 0
+            hit_tp = position.tp and (price - position.tp) * position.direction >= 0
+            if hit_sl or hit_tp:
+                exit_price = position.sl if hit_sl else position.tp
+                self._close(position, exit_price, info.trade_contract_size)
+
+    def _close(self, position: _Position, price: float, contract_size: float):
+        with self.lock:
+            if self.positions.pop(position.ticket, None) is None:
+                return
+            self.balance += (price - position.price) * position.direction * position.volume * contract_size
+
+    def _floating(self) -> Tuple[float, float, list]:
+        # Profitto non realizzato, margine e posizioni con prezzo corrente
+        profit = 0.0
+        margin = 0.0
+        current = []
+        with self.lock:
+            positions = list(self.positions.values())
+        for position in positions:
+            info = self._symbol_info(position.symbol)
+            price = info.bid if position.direction == 1 else info.ask
+            position_profit = (price - position.price) * position.direction * position.volume * info.trade_contract_size
+            profit += position_profit
+            margin += position.volume * info.trade_contract_size * position.price / self.leverage
+            current.append((position, price, position_profit))
+        return profit, margin, current
+
+    def positions_get(self, symbol: Optional[str] = None, **kwargs) -> Optional[Tuple[TradePosition, ...]]:
+        if not self._call('positions_get'):
+            return None
+        self._settle()
+        _, _, current = self._floating()
+        return tuple(
+            TradePosition(
+                ticket=position.ticket, time=position.opened,
+                type=POSITION_TYPE_BUY if position.direction == 1 else POSITION_TYPE_SELL,
+                volume=position.volume, price_open=position.price, sl=position.sl, tp=position.tp,
+                price_current=price, profit=profit, symbol=position.symbol,
+                comment=position.comment, magic=position.magic
+            )
+            for position, price, profit in current
+            if symbol is None or position.symbol == symbol
+        )
+
+    def account_info(self) -> Optional[AccountInfo]:
+        if not self._call('account_info'):
+            return None
+        self._settle()
+        profit, margin, _ = self._floating()
+        equity = self.balance + profit
+        login, server = self.account
+        return AccountInfo(
+            login=login, server=server, name='Simulated', currency='USD',
+            leverage=self.leverage, balance=self.balance, equity=equity, profit=profit,
+            margin=margin, margin_free=equity - margin,
+            margin_level=equity / margin * 100 if margin else 0.0
+        )
+
+    def order_send(self, request: Dict) -> Optional[OrderSendResult]:
+        if not self._call('order_send', order=True):
+            return None
+
+        symbol = request.get('symbol', '')
+        info = self._symbol_info(symbol)
+        direction = 1 if request.get('type') == ORDER_TYPE_BUY else -1
+        price = info.ask if direction == 1 else info.bid
+        volume = float(request.get('volume', 0.0))
+        sl = float(request.get('sl', 0.0) or 0.0)
+        tp = float(request.get('tp', 0.0) or 0.0)
+
+        def result(retcode: int, comment: str, ticket: int = 0) -> OrderSendResult:
+            return OrderSendResult(
+                retcode=retcode, deal=ticket, order=ticket, volume=volume if ticket else 0.0,
+                price=price if ticket else 0.0, bid=info.bid, ask=info.ask, comment=comment,
+                request_id=0, retcode_external=0, request=request
+            )
+
+        with self.lock:
+            rejected = self.reject_rate and self.rng.random() < self.reject_rate
+        if rejected:
+            self.rejected += 1
+            return result(TRADE_RETCODE_REJECT, 'Request rejected')
+
+        # Chiusura di una posizione esistente (deal opposto con 'position')
+        closing = self.positions.get(request.get('position', 0))
+        if closing is not None:
+            self._close(closing, price, info.trade_contract_size)
+            return result(TRADE_RETCODE_DONE, 'Request executed', closing.ticket)
+
+        if request.get('action') != TRADE_ACTION_DEAL:
+            return result(TRADE_RETCODE_REJECT, 'Unsupported action')
+        if volume < info.volume_min or volume > info.volume_max:
+            return result(TRADE_RETCODE_INVALID_VOLUME, 'Invalid volume')
+        if (sl and (price - sl) * direction <= 0) or (tp and (tp - price) * direction <= 0):
+            return result(TRADE_RETCODE_INVALID_STOPS, 'Invalid stops')
+
+        with self.lock:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.positions[ticket] = _Position(
+                ticket, symbol, direction, volume, price, sl, tp, int(self.clock()),
+                request.get('comment', ''), request.get('magic', 0)
+            )
+        return result(TRADE_RETCODE_DONE, 'Request executed', ticket)
+
+    def get_statistics(self) -> Dict:
+        return {
+            'calls': dict(self.calls),
+            'rejected': self.rejected,
+            'open_positions': len(self.positions),
+            'balance': self.balance,
+        }
+
+
+# Interfaccia a livello di modulo, come MetaTrader5
+_terminal = SimulatedTerminal()
+
+
+def configure(**kwargs) -> SimulatedTerminal:
+    # Sostituisce il terminale usato dalle funzioni del modulo
+    global _terminal
+    _terminal = SimulatedTerminal(**kwargs)
+    return _terminal
+
+
+def get_terminal() -> SimulatedTerminal:
+    return _terminal
+
+
+def initialize(*args, **kwargs) -> bool:
+    return _terminal.initialize(*args, **kwargs)
+
+
+def login(login: int, password: str = '', server: str = '', **kwargs) -> bool:
+    return _terminal.login(login, password, server, **kwargs)
+
+
+def shutdown():
+    _terminal.shutdown()
+
+
+def last_error() -> Tuple[int, str]:
+    return _terminal.last_error()
+
+
+def copy_rates_range(symbol: str, timeframe: int, date_from, date_to) -> Optional[np.ndarray]:
+    return _terminal.copy_rates_range(symbol, timeframe, date_from, date_to)
+
+
+def symbol_info(symbol: str) -> Optional[SymbolInfo]:
+    return _terminal.symbol_info(symbol)
+
+
+def symbols_get(group: str = '*') -> Optional[Tuple[SymbolInfo, ...]]:
+    return _terminal.symbols_get(group)
+
+
+def symbol_info_tick(symbol: str) -> Optional[Tick]:
+    return _terminal.symbol_info_tick(symbol)
+
+
+def positions_get(symbol: Optional[str] = None, **kwargs) -> Optional[Tuple[TradePosition, ...]]:
+    return _terminal.positions_get(symbol, **kwargs)
+
+
+def account_info() -> Optional[AccountInfo]:
+    return _terminal.account_info()
+
+
+def order_send(request: Dict) -> Optional[OrderSendResult]:
+    return _terminal.order_send(request)
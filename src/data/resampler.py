@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Union
+from src.data.mmap_bars import MmapBars, PRICE_COLUMNS
+
+
+# Timeframe di base da cui vengono derivati gli altri (M1)
+BASE_TIMEFRAME = 1
+
+
+def floor_time(time, timeframe: int) -> pd.Timestamp:
+    # Apertura della barra di timeframe (in minuti) che contiene time
+    return pd.Timestamp(time).floor(f"{timeframe}min")
+
+
+def resample_columns(
+    bars: Union[pd.DataFrame, MmapBars],
+    timeframe: int
+) -> Dict[str, np.ndarray]:
+    # Aggregazione OHLCV vettorizzata: ogni barra viene assegnata al
+    # bucket floor(time / periodo), allineato all'epoch come le barre MT5
+    # fino a D1. Le barre di base sono ordinate, quindi ogni bucket è un
+    # intervallo contiguo e basta reduceat sugli indici di inizio.
+    # Un bucket senza barre di base (es. weekend) non genera barre.
+    time = bars.index.to_numpy(dtype='datetime64[ns]')
+    if len(time) == 0:
+        columns = {name: np.empty(0) for name in PRICE_COLUMNS}
+        columns['time'] = time
+        return columns
+
+    period = np.int64(timeframe * 60 * 1_000_000_000)
+    bucket = time.view(np.int64) // period
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(time)] - 1
+
+    open_ = bars['Open'].to_numpy(dtype=float)
+    high = bars['High'].to_numpy(dtype=float)
+    low = bars['Low'].to_numpy(dtype=float)
+    close = bars['Close'].to_numpy(dtype=float)
+    volume = bars['Volume'].to_numpy(dtype=float)
+
+    return {
+        'time': (bucket[starts] * period).view('datetime64[ns]'),
+        'Open': open_[starts],
+        'High': np.maximum.reduceat(high, starts),
+        'Low': np.minimum.reduceat(low, starts),
+        'Close': close[ends],
+        'Volume': np.add.reduceat(volume, starts),
+    }
+
+
+def resample_bars(
+    bars: Union[pd.DataFrame, MmapBars],
+    timeframe: int,
+    base_timeframe: int = BASE_TIMEFRAME
+) -> pd.DataFrame:
+    if timeframe % base_timeframe != 0:
+        raise ValueError(
+            f"Cannot build M{timeframe} bars from M{base_timeframe}: "
+            f"timeframe must be a multiple of the base timeframe"
+        )
+
+    if timeframe == base_timeframe:
+        return bars.copy() if isinstance(bars, pd.DataFrame) else bars.to_frame()
+
+    columns = resample_columns(bars, timeframe)
+    index = pd.DatetimeIndex(columns.pop('time'), name='time')
+    return pd.DataFrame(columns, index=index)
@@ -0,0 +1,222 @@
+import time
+import threading
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from typing import Any, Callable, List, Optional, Tuple
+
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Limite di barre per singola chiamata time_series
+MAX_OUTPUTSIZE = 5000
+
+INTERVAL_MINUTES = {
+    '1min': 1,
+    '5min': 5,
+    '15min': 15,
+    '30min': 30,
+    '45min': 45,
+    '1h': 60,
+    '2h': 120,
+    '4h': 240,
+    '1day': 1440,
+}
+
+# Messaggio restituito dall'API per un periodo senza barre (es. weekend)
+NO_DATA_MESSAGE = 'No data is available'
+
+
+def normalize_bars(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    # Converte l'output di TDClient nel formato OHLCV del bot
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name='time'), dtype=float)
+
+    df = df.copy()
+    df.index = pd.to_datetime(df.index)
+    df.index.name = 'time'
+    df.rename(columns={
+        'open': 'Open',
+        'high': 'High',
+        'low': 'Low',
+        'close': 'Close',
+        'volume': 'Volume'
+    }, inplace=True)
+
+    # Forex non ha volume, aggiungiamo una colonna vuota se manca
+    if 'Volume' not in df.columns:
+        df['Volume'] = 0
+
+    # TwelveData restituisce le barre dalla più recente
+    return df[BAR_COLUMNS].astype(float).sort_index()
+
+
+class TokenBucket:
+    # Rate limiter thread-safe sui crediti API: si ricarica in modo
+    # continuo a rate crediti al minuto, fino a capacity. acquire blocca
+    # finché i crediti richiesti non sono disponibili.
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate / 60.0
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+                self.waited += wait
+            self.sleep(wait)
+
+
+class TwelveDataDownloader:
+    # Download di storici lunghi: l'intervallo viene diviso in chunk da
+    # al massimo MAX_OUTPUTSIZE barre, scaricati in parallelo sotto il
+    # token bucket e poi uniti. I chunk sono allineati a una griglia fissa
+    # (multipli della loro durata dall'epoch), così esecuzioni successive
+    # con date diverse riusano gli stessi file in cache. Solo i chunk
+    # completamente nel passato vengono salvati su disco.
+    def __init__(
+        self,
+        client: Any,
+        cache_dir: Optional[str] = "data/twelvedata",
+        credits_per_minute: float = 8,
+        max_workers: int = 4,
+        chunk_size: int = MAX_OUTPUTSIZE,
+        bucket: Optional[TokenBucket] = None
+    ):
+        if not 0 < chunk_size <= MAX_OUTPUTSIZE:
+            raise ValueError(f"chunk_size must be between 1 and {MAX_OUTPUTSIZE}")
+
+        self.client = client
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.bucket = bucket or TokenBucket(credits_per_minute)
+        self.stats_lock = threading.Lock()
+        self.api_calls = 0
+        self.cache_hits = 0
+
+    def chunks(
+        self,
+        interval: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        if interval not in INTERVAL_MINUTES:
+            raise ValueError(f"Unsupported interval: {interval}")
+
+        span = pd.Timedelta(minutes=INTERVAL_MINUTES[interval] * self.chunk_size)
+        epoch = pd.Timestamp(0)
+        first = epoch + ((pd.Timestamp(start) - epoch) // span) * span
+        last = pd.Timestamp(end)
+
+        chunks = []
+        chunk_start = first
+        while chunk_start <= last:
+            chunks.append((chunk_start, chunk_start + span))
+            chunk_start += span
+        return chunks
+
+    def _cache_path(self, symbol: str, interval: str, chunk: Tuple[pd.Timestamp, pd.Timestamp]) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        start, end = (value.strftime('%Y%m%dT%H%M%S') for value in chunk)
+        return self.cache_dir / symbol / interval / f"{start}-{end}.parquet"
+
+    def _fetch_chunk(
+        self,
+        symbol: str,
+        interval: str,
+        chunk: Tuple[pd.Timestamp, pd.Timestamp]
+    ) -> Optional[pd.DataFrame]:
+        chunk_start, chunk_end = chunk
+        path = self._cache_path(symbol, interval, chunk)
+        if path is not None and path.exists():
+            with self.stats_lock:
+                self.cache_hits += 1
+            return pd.read_parquet(path)
+
+        self.bucket.acquire()
+        with self.stats_lock:
+            self.api_calls += 1
+        try:
+            ts = self.client.time_series(
+                symbol=f"{symbol[:3]}/{symbol[3:]}",
+                interval=interval,
+                start_date=chunk_start.strftime('%Y-%m-%d %H:%M:%S'),
+                end_date=chunk_end.strftime('%Y-%m-%d %H:%M:%S'),
+                outputsize=MAX_OUTPUTSIZE
+            )
+            df = normalize_bars(ts.as_pandas())
+        except Exception as e:
+            if NO_DATA_MESSAGE not in str(e):
+                logger.error(f"Error fetching {symbol} {chunk_start} - {chunk_end} from TwelveData: {e}")
+                return None
+            df = normalize_bars(None)
+
+        # La fine del chunk è l'inizio del successivo
+        df = df[(df.index >= chunk_start) & (df.index < chunk_end)]
+
+        if path is not None and chunk_end <= pd.Timestamp.now():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix('.tmp')
+            df.to_parquet(tmp)
+            tmp.replace(path)
+
+        return df
+
+    def download(
+        self,
+        symbol: str,
+        interval: str,
+        start: datetime,
+        end: datetime
+    ) -> Optional[pd.DataFrame]:
+        chunks = self.chunks(interval, start, end)
+        api_calls, cache_hits = self.api_calls, self.cache_hits
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            frames = list(executor.map(lambda chunk: self._fetch_chunk(symbol, interval, chunk), chunks))
+
+        failed = sum(frame is None for frame in frames)
+        if failed:
+            # Niente risultati parziali: i chunk riusciti restano in cache
+            # e un nuovo tentativo scarica solo quelli mancanti
+            logger.error(f"{failed}/{len(chunks)} chunks failed for {symbol}, download incomplete")
+            return None
+
+        df = pd.concat(frames)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        df = df.loc[pd.Timestamp(start):pd.Timestamp(end)]
+
+        logger.info(
+            f"Downloaded {len(df)} bars for {symbol} from TwelveData "
+            f"({len(chunks)} chunks, {self.api_calls - api_calls} API calls, "
+            f"{self.cache_hits - cache_hits} cached)"
+        )
+
+        if df.empty:
+            return None
+        return df
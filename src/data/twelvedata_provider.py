@@ -3,11 +3,24 @@ import pandas as pd
 from datetime import datetime
 from loguru import logger
 from typing import Optional
+from src.data.twelvedata_downloader import TwelveDataDownloader, normalize_bars
 
 
 class TwelveDataProvider:
-    def __init__(self, api_key: str):
+    def __init__(
+        self, 
+        api_key: str,
+        cache_dir: Optional[str] = "data/twelvedata",
+        credits_per_minute: float = 8,
+        max_workers: int = 4
+    ):
         self.client = TDClient(apikey=api_key)
+        self.downloader = TwelveDataDownloader(
+            self.client,
+            cache_dir=cache_dir,
+            credits_per_minute=credits_per_minute,
+            max_workers=max_workers
+        )
         logger.info("TwelveData provider initialized")
     
     def get_historical_data(
@@ -35,23 +48,22 @@ class TwelveDataProvider:
                 logger.warning(f"No data retrieved for {symbol}")
                 return None
             
-            df.index = pd.to_datetime(df.index)
-            df.rename(columns={
-                'open': 'Open',
-                'high': 'High',
-                'low': 'Low',
-                'close': 'Close',
-                'volume': 'Volume'
-            }, inplace=True)
-            
-            # Forex non ha volume, aggiungiamo una colonna vuota se manca
-            if 'Volume' not in df.columns:
-                df['Volume'] = 0
-                logger.debug(f"Added empty Volume column for Forex pair {symbol}")
+            df = normalize_bars(df)
             
             logger.info(f"Retrieved {len(df)} bars for {symbol} from TwelveData")
-            return df[['Open', 'High', 'Low', 'Close', 'Volume']]
+            return df
             
         except Exception as e:
             logger.error(f"Error fetching data from TwelveData: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def get_bulk_history(
+        self, 
+        symbol: str, 
+        interval: str, 
+        start: datetime, 
+        end: datetime
+    ) -> Optional[pd.DataFrame]:
+        # Storico completo oltre il limite di 5000 barre per chiamata:
+        # download a chunk in parallelo, con rate limit e cache su disco
+        return self.downloader.download(symbol, interval, start, end)
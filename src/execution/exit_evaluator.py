@@ -0,0 +1,174 @@
+import numpy as np
+from typing import Callable, Dict, Optional
+
+
+# Unità per lotto, come in Position.close
+CONTRACT_SIZE = 100000
+
+DIRECTIONS = {'long': 1, 'short': -1}
+
+# resolve(bar, direction, sl, tp) -> True se lo stop è arrivato per primo,
+# per le posizioni la cui barra tocca sia SL che TP
+ResolveFn = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+class ExitEvaluator:
+    # SL/TP di tutte le posizioni aperte di un simbolo in array paralleli,
+    # così una barra (o un blocco di barre) viene valutata con poche
+    # operazioni vettoriali invece che con un check_exit per posizione.
+    # Stessa regola di Position.check_exit: se nella stessa barra vengono
+    # toccati sia SL che TP vince lo stop, a meno che resolve non decida
+    # diversamente (vedi IntrabarResolver).
+    def __init__(self, capacity: int = 64):
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.direction = np.empty(capacity, dtype=np.float64)
+        self.entry_price = np.empty(capacity, dtype=np.float64)
+        self.size = np.empty(capacity, dtype=np.float64)
+        self.sl = np.empty(capacity, dtype=np.float64)
+        self.tp = np.empty(capacity, dtype=np.float64)
+        self.count = 0
+        self.slots: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _arrays(self):
+        return ['ids', 'direction', 'entry_price', 'size', 'sl', 'tp']
+
+    def _grow(self):
+        capacity = max(1, len(self.ids)) * 2
+        for name in self._arrays():
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def add(
+        self,
+        position_id: int,
+        direction: str,
+        entry_price: float,
+        size: float,
+        sl: float,
+        tp: float
+    ):
+        if self.count == len(self.ids):
+            self._grow()
+
+        i = self.count
+        self.ids[i] = position_id
+        self.direction[i] = DIRECTIONS[direction]
+        self.entry_price[i] = entry_price
+        self.size[i] = size
+        self.sl[i] = sl
+        self.tp[i] = tp
+        self.slots[position_id] = i
+        self.count += 1
+
+    def remove(self, position_id: int):
+        # Rimozione O(1): l'ultima posizione prende il posto di quella tolta
+        i = self.slots.pop(position_id)
+        last = self.count - 1
+        if i != last:
+            for name in self._arrays():
+                column = getattr(self, name)
+                column[i] = column[last]
+            self.slots[int(self.ids[i])] = i
+        self.count = last
+
+    def _hits(self, high, low, n: int):
+        # high/low scalari (una barra) o colonne (m, 1) per un blocco
+        long = self.direction[:n] > 0
+        sl = self.sl[:n]
+        tp = self.tp[:n]
+        stop = np.where(long, low <= sl, high >= sl)
+        take = np.where(long, high >= tp, low <= tp)
+        return stop, take
+
+    def _close(
+        self,
+        slots: np.ndarray,
+        stop: np.ndarray,
+        bars: np.ndarray,
+        both: np.ndarray,
+        resolve: Optional[ResolveFn] = None
+    ) -> Dict[str, np.ndarray]:
+        if resolve is not None and both.any():
+            ambiguous = slots[both]
+            stop = stop.copy()
+            stop[both] = resolve(
+                bars[both],
+                self.direction[ambiguous],
+                self.sl[ambiguous],
+                self.tp[ambiguous]
+            )
+
+        exit_price = np.where(stop, self.sl[slots], self.tp[slots])
+        # Stesso calcolo di Position.close (direction è ±1, quindi esatto)
+        profit = self.direction[slots] * (exit_price - self.entry_price[slots]) * self.size[slots] * CONTRACT_SIZE
+        result = {
+            'ids': self.ids[slots].copy(),
+            'bar': bars,
+            'exit_price': exit_price,
+            'stop': stop,
+            'profit': profit,
+        }
+        for position_id in result['ids']:
+            self.remove(int(position_id))
+        return result
+
+    def evaluate(
+        self,
+        high: float,
+        low: float,
+        resolve: Optional[ResolveFn] = None
+    ) -> Dict[str, np.ndarray]:
+        # Posizioni chiuse dalla barra corrente (e rimosse dall'evaluator)
+        n = self.count
+        stop, take = self._hits(high, low, n)
+        slots = np.flatnonzero(stop | take)
+        return self._close(
+            slots,
+            stop[slots],
+            np.zeros(len(slots), dtype=np.int64),
+            stop[slots] & take[slots],
+            resolve
+        )
+
+    def evaluate_bars(
+        self,
+        high: np.ndarray,
+        low: np.ndarray,
+        chunk: int = 256,
+        resolve: Optional[ResolveFn] = None
+    ) -> Dict[str, np.ndarray]:
+        # Come evaluate su un blocco di barre: per ogni posizione la prima
+        # barra che tocca SL o TP. Le barre sono elaborate a blocchi di
+        # chunk righe per limitare la matrice barre x posizioni.
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        results = []
+
+        for start in range(0, len(high), chunk):
+            n = self.count
+            if n == 0:
+                break
+
+            stop, take = self._hits(high[start:start + chunk, None], low[start:start + chunk, None], n)
+            hit = stop | take
+            closed = hit.any(axis=0)
+            slots = np.flatnonzero(closed)
+            first = hit[:, slots].argmax(axis=0)
+            results.append(self._close(
+                slots,
+                stop[first, slots],
+                first + start,
+                stop[first, slots] & take[first, slots],
+                resolve
+            ))
+
+        if not results:
+            empty = np.empty(0, dtype=np.int64)
+            return self._close(empty, np.empty(0, dtype=bool), empty, np.empty(0, dtype=bool))
+
+        return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+from typing import Dict, Optional
+from src.data.bar_store import BarStore
+from src.data.mmap_bars import MmapBars, PRICE_COLUMNS
+
+
+class IntrabarResolver:
+    # Quando una barra tocca sia SL che TP, check_exit assume che lo stop
+    # arrivi per primo. Il resolver guarda invece il percorso delle barre
+    # di timeframe inferiore (M1 dall'archivio locale) dentro quella barra
+    # e restituisce quale livello è stato toccato prima. Se mancano i dati,
+    # o entrambi i livelli cadono nella stessa barra M1, resta lo stop.
+    def __init__(
+        self,
+        bar_store: BarStore,
+        timeframe: int,
+        base_timeframe: int = 1
+    ):
+        self.bar_store = bar_store
+        self.timeframe = timeframe
+        self.base_timeframe = base_timeframe
+        self.period = np.timedelta64(timeframe * 60, 's').astype('timedelta64[ns]')
+        self.base_period = np.timedelta64(base_timeframe * 60, 's').astype('timedelta64[ns]')
+        self.bars: Dict[str, Optional[MmapBars]] = {}
+
+        self.ambiguous = 0
+        self.resolved = 0
+        self.tp_first = 0
+        self.unresolved = 0
+
+    def _load(self, symbol: str, first: np.datetime64, until: np.datetime64) -> Optional[MmapBars]:
+        # Lo storico di base viene mappato una volta sola. Le barre più
+        # recenti (ogni sync dal vivo aggiunge un part) si leggono solo per
+        # l'intervallo che serve, senza rigenerare la copia mappata di
+        # tutto lo storico
+        if symbol not in self.bars:
+            self.bars[symbol] = self.bar_store.load_mmap(symbol, self.base_timeframe)
+        bars = self.bars[symbol]
+        if bars is not None and bars.columns['time'][-1] >= until:
+            return bars
+
+        df = self.bar_store.load(symbol, self.base_timeframe, pd.Timestamp(first), pd.Timestamp(until))
+        if df is None:
+            return None
+        columns = {'time': df.index.to_numpy(dtype='datetime64[ns]')}
+        columns.update({name: df[name].to_numpy(dtype=float) for name in PRICE_COLUMNS})
+        return MmapBars(columns)
+
+    def resolve_many(
+        self,
+        symbol: str,
+        bar_times: np.ndarray,
+        direction: np.ndarray,
+        sl: np.ndarray,
+        tp: np.ndarray
+    ) -> np.ndarray:
+        # Per ogni posizione ambigua (apertura della barra, direzione ±1,
+        # SL, TP) restituisce True se lo stop è stato toccato per primo
+        n = len(bar_times)
+        stop_first = np.ones(n, dtype=bool)
+        if n == 0:
+            return stop_first
+
+        self.ambiguous += n
+        start = np.asarray(bar_times, dtype='datetime64[ns]')
+        # Serve fino all'ultima barra M1 della barra più recente
+        bars = self._load(symbol, start.min(), start.max() + self.period - self.base_period)
+        if bars is None:
+            self.unresolved += n
+            return stop_first
+
+        # Righe M1 di ogni barra, appiattite: owner indica la posizione,
+        # offset la barra M1 all'interno della barra
+        time = bars.columns['time']
+        first = np.searchsorted(time, start, side='left')
+        counts = np.searchsorted(time, start + self.period, side='left') - first
+        owner = np.repeat(np.arange(n), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = first[owner] + offset
+
+        high = bars.columns['High'][rows]
+        low = bars.columns['Low'][rows]
+        long = direction[owner] > 0
+        stop_hit = np.where(long, low <= sl[owner], high >= sl[owner])
+        tp_hit = np.where(long, high >= tp[owner], low <= tp[owner])
+
+        never = np.iinfo(np.int64).max
+        first_stop = np.full(n, never)
+        first_tp = np.full(n, never)
+        np.minimum.at(first_stop, owner[stop_hit], offset[stop_hit])
+        np.minimum.at(first_tp, owner[tp_hit], offset[tp_hit])
+
+        resolved = first_stop != first_tp
+        tp_first = first_tp < first_stop
+        stop_first[tp_first] = False
+
+        self.resolved += int(resolved.sum())
+        self.tp_first += int(tp_first.sum())
+        self.unresolved += int(n - resolved.sum())
+        if tp_first.any():
+            logger.debug(f"{symbol}: {int(tp_first.sum())} ambiguous bar(s) resolved as take profit")
+
+        return stop_first
+
+    def resolve(
+        self,
+        symbol: str,
+        bar_time,
+        direction: str,
+        sl: float,
+        tp: float
+    ) -> bool:
+        return bool(self.resolve_many(
+            symbol,
+            np.array([pd.Timestamp(bar_time).to_datetime64()]),
+            np.array([1.0 if direction == 'long' else -1.0]),
+            np.array([sl]),
+            np.array([tp])
+        )[0])
+
+    def get_statistics(self) -> Dict:
+        # tp_first: casi in cui l'ipotesi "stop per primo" sarebbe stata
+        # sbagliata; resolution_rate: quota di barre ambigue decise da M1
+        return {
+            'ambiguous': self.ambiguous,
+            'resolved': self.resolved,
+            'unresolved': self.unresolved,
+            'tp_first': self.tp_first,
+            'resolution_rate': self.resolved / self.ambiguous * 100 if self.ambiguous else 0.0,
+            'stop_first_error_rate': self.tp_first / self.ambiguous * 100 if self.ambiguous else 0.0
+        }
@@ -0,0 +1,89 @@
+import pandas as pd
+from typing import Dict, Optional, Union
+from src.data.mmap_bars import MmapBars, column_values, time_values
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.risk.manager import RiskManager
+from src.execution.paper_trader import PaperTrader
+from src.monitoring.metrics import MetricsRegistry, timed
+
+
+class PaperSession:
+    # Logica di un ciclo di paper trading, condivisa da --mode paper e
+    # --mode replay: analyze calcola il segnale sull'ultima barra (può
+    # girare in parallelo), execute aggiorna le posizioni e apre i nuovi
+    # trade (un simbolo alla volta). I dati possono essere un DataFrame
+    # (dal provider) o MmapBars (replay): si leggono solo array NumPy.
+    def __init__(
+        self,
+        strategy: EMAVWAPStrategy,
+        risk_manager: RiskManager,
+        paper_trader: PaperTrader,
+        min_bars: int = 50,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        self.strategy = strategy
+        self.risk_manager = risk_manager
+        self.paper_trader = paper_trader
+        self.min_bars = min_bars
+        self.metrics = metrics
+        self.last_bar: Dict[str, int] = {}
+
+    def analyze(
+        self,
+        symbol: str,
+        data: Optional[Union[pd.DataFrame, MmapBars]]
+    ) -> Optional[Dict]:
+        if data is None or len(data) < self.min_bars:
+            return None
+
+        # Nessuna barra nuova (es. mercato chiuso): niente da fare, e lo
+        # stesso segnale non viene riaperto due volte
+        last_time = int(time_values(data)[-1])
+        if self.last_bar.get(symbol) == last_time:
+            return None
+        self.last_bar[symbol] = last_time
+
+        with timed(self.metrics, 'stage_seconds', stage='signal', symbol=symbol):
+            signal = self.strategy.get_current_signal(data, symbol)
+
+        return {
+            'time': pd.Timestamp(last_time),
+            'high': float(column_values(data, 'High')[-1]),
+            'low': float(column_values(data, 'Low')[-1]),
+            'signal': signal
+        }
+
+    def execute(self, symbol: str, result: Dict):
+        # Aggiorna posizioni esistenti e libera il RiskManager per quelle chiuse
+        closed_trades = self.paper_trader.closed_trades
+        closed_before = len(closed_trades)
+        self.paper_trader.update_bar(symbol, result['high'], result['low'], result['time'])
+        for profit in closed_trades.column('profit')[closed_before:]:
+            self.risk_manager.close_position(float(profit))
+
+        # Una posizione alla volta per simbolo
+        if self.paper_trader.get_open_positions(symbol):
+            return
+
+        signal = result['signal']
+        if signal and self.risk_manager.can_open_position():
+            # Calcola position size
+            with timed(self.metrics, 'stage_seconds', stage='position_size', symbol=symbol):
+                size = self.risk_manager.calculate_position_size(
+                    signal['entry_price'],
+                    signal['sl'],
+                    symbol
+                )
+
+            # Apri posizione paper
+            with timed(self.metrics, 'stage_seconds', stage='order', symbol=symbol):
+                self.paper_trader.open_position(
+                    symbol=symbol,
+                    direction=signal['direction'],
+                    entry_price=signal['entry_price'],
+                    size=size,
+                    sl=signal['sl'],
+                    tp=signal['tp']
+                )
+
+            self.risk_manager.open_position()
@@ -1,7 +1,11 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from loguru import logger
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
+from src.execution.exit_evaluator import ExitEvaluator
+from src.execution.fill_resolver import IntrabarResolver
+from src.analytics.performance import PerformanceTracker
 
 
 class Position:
@@ -12,7 +16,8 @@ class Position:
         entry_price: float, 
         size: float, 
         sl: float, 
-        tp: float
+        tp: float,
+        entry_time: Optional[datetime] = None
     ):
         self.symbol = symbol
         self.direction = direction
@@ -20,7 +25,7 @@ class Position:
         self.size = size
         self.sl = sl
         self.tp = tp
-        self.entry_time = datetime.now()
+        self.entry_time = entry_time or datetime.now()
         self.exit_price = None
         self.exit_time = None
         self.profit = 0.0
@@ -43,9 +48,9 @@ class Position:
                 return True
         return False
     
-    def close(self, exit_price: float, reason: str):
+    def close(self, exit_price: float, reason: str, exit_time: Optional[datetime] = None):
         self.exit_price = exit_price
-        self.exit_time = datetime.now()
+        self.exit_time = exit_time or datetime.now()
         self.status = reason
         
         if self.direction == 'long':
@@ -56,13 +61,132 @@ class Position:
         logger.info(f"Position closed: {reason} | Profit: ${self.profit:.2f}")
 
 
+class TradeStore:
+    # Storico dei trade chiusi in formato colonnare: un array NumPy per
+    # campo, con capacità che raddoppia quando è piena (append O(1)
+    # ammortizzato). Simbolo, direzione e motivo di uscita sono salvati
+    # come codici interi. Le statistiche aggregate sono aggiornate a ogni
+    # chiusura, quindi non dipendono dalla lunghezza dello storico.
+    FIELDS = {
+        'symbol': np.int32,
+        'direction': np.int8,
+        'entry_time': 'datetime64[ns]',
+        'exit_time': 'datetime64[ns]',
+        'entry_price': np.float64,
+        'exit_price': np.float64,
+        'size': np.float64,
+        'profit': np.float64,
+        'status': np.int8,
+    }
+    DIRECTIONS = ['long', 'short']
+
+    def __init__(self, capacity: int = 1024):
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.FIELDS.items()}
+        self.count = 0
+        self.symbols: List[str] = []
+        self.symbol_codes: Dict[str, int] = {}
+        self.statuses: List[str] = []
+        self.status_codes: Dict[str, int] = {}
+
+        self.winning = 0
+        self.total_profit = 0.0
+        self.max_profit = -np.inf
+        self.max_loss = np.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    @staticmethod
+    def _code(value: str, values: List[str], codes: Dict[str, int]) -> int:
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        return codes[value]
+
+    def _grow(self):
+        capacity = max(1, len(self.columns['profit'])) * 2
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            self.columns[name] = grown
+
+    def append(self, position: 'Position'):
+        if self.count == len(self.columns['profit']):
+            self._grow()
+
+        i = self.count
+        columns = self.columns
+        columns['symbol'][i] = self._code(position.symbol, self.symbols, self.symbol_codes)
+        columns['direction'][i] = self.DIRECTIONS.index(position.direction)
+        columns['entry_time'][i] = np.datetime64(position.entry_time, 'ns')
+        columns['exit_time'][i] = np.datetime64(position.exit_time, 'ns')
+        columns['entry_price'][i] = position.entry_price
+        columns['exit_price'][i] = position.exit_price
+        columns['size'][i] = position.size
+        columns['profit'][i] = position.profit
+        columns['status'][i] = self._code(position.status, self.statuses, self.status_codes)
+        self.count += 1
+
+        profit = position.profit
+        if profit > 0:
+            self.winning += 1
+        self.total_profit += profit
+        self.max_profit = max(self.max_profit, profit)
+        self.max_loss = min(self.max_loss, profit)
+
+    def column(self, name: str) -> np.ndarray:
+        # Vista sulle righe valide, senza copia
+        return self.columns[name][:self.count]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'symbol': np.array(self.symbols, dtype=object)[self.column('symbol')],
+            'direction': np.array(self.DIRECTIONS, dtype=object)[self.column('direction')],
+            'entry_time': self.column('entry_time'),
+            'exit_time': self.column('exit_time'),
+            'entry_price': self.column('entry_price'),
+            'exit_price': self.column('exit_price'),
+            'size': self.column('size'),
+            'profit': self.column('profit'),
+            'status': np.array(self.statuses, dtype=object)[self.column('status')],
+        })
+
+
 class PaperTrader:
-    def __init__(self, initial_capital: float = 10000.0):
+    def __init__(
+        self, 
+        initial_capital: float = 10000.0,
+        fill_resolver: Optional[IntrabarResolver] = None,
+        clock: Callable[[], datetime] = datetime.now
+    ):
         self.initial_capital = initial_capital
+        # Orario di apertura/chiusura delle posizioni (simulato nel replay)
+        self.clock = clock
+        # Risolve le barre che toccano sia SL che TP con i dati M1
+        self.fill_resolver = fill_resolver
         self.capital = initial_capital
-        self.positions: List[Position] = []
-        self.closed_positions: List[Position] = []
-        self.trades_log: List[Dict] = []
+        # Posizioni aperte indicizzate per simbolo: update legge solo
+        # quelle del simbolo e la chiusura è una delete O(1)
+        self.book: Dict[str, Dict[int, Position]] = {}
+        # SL/TP delle stesse posizioni in array, per la valutazione in blocco
+        self.evaluators: Dict[str, ExitEvaluator] = {}
+        self.open_count = 0
+        self.next_id = 0
+        self.closed_trades = TradeStore()
+        # Metriche incrementali sul capitale realizzato (un punto per trade chiuso)
+        self.performance = PerformanceTracker(initial_capital)
+    
+    @property
+    def positions(self) -> List[Position]:
+        return [position for book in self.book.values() for position in book.values()]
+    
+    @property
+    def closed_positions(self) -> TradeStore:
+        return self.closed_trades
+    
+    @property
+    def trades_log(self) -> List[Dict]:
+        return self.closed_trades.to_frame().to_dict('records')
     
     def open_position(
         self, 
@@ -73,8 +197,13 @@ class PaperTrader:
         sl: float, 
         tp: float
     ) -> bool:
-        position = Position(symbol, direction, entry_price, size, sl, tp)
-        self.positions.append(position)
+        position = Position(symbol, direction, entry_price, size, sl, tp, self.clock())
+        self.book.setdefault(symbol, {})[self.next_id] = position
+        self.evaluators.setdefault(symbol, ExitEvaluator()).add(
+            self.next_id, direction, entry_price, size, sl, tp
+        )
+        self.next_id += 1
+        self.open_count += 1
         
         logger.info(
             f"Paper trade opened: {direction.upper()} {size} lots {symbol} "
@@ -83,51 +212,101 @@ class PaperTrader:
         return True
     
     def update(self, symbol: str, current_bar: pd.Series):
-        for position in self.positions[:]:
-            if position.symbol == symbol:
-                if position.check_exit(
-                    current_bar['Close'], 
-                    current_bar['High'], 
-                    current_bar['Low']
-                ):
-                    self.capital += position.profit
-                    self.positions.remove(position)
-                    self.closed_positions.append(position)
-                    
-                    self.trades_log.append({
-                        'symbol': position.symbol,
-                        'direction': position.direction,
-                        'entry_time': position.entry_time,
-                        'exit_time': position.exit_time,
-                        'entry_price': position.entry_price,
-                        'exit_price': position.exit_price,
-                        'size': position.size,
-                        'profit': position.profit,
-                        'status': position.status
-                    })
+        self.update_bar(symbol, current_bar['High'], current_bar['Low'], current_bar.name)
+    
+    def update_bar(self, symbol: str, high: float, low: float, bar_time=None):
+        evaluator = self.evaluators.get(symbol)
+        if not evaluator:
+            return
+        
+        hits = evaluator.evaluate(
+            high,
+            low,
+            resolve=self._resolver(symbol, None if bar_time is None else [bar_time])
+        )
+        self._close_hits(symbol, hits)
+    
+    def update_bars(self, symbol: str, bars: pd.DataFrame):
+        # Replay di un blocco di barre in una sola passata: ogni posizione
+        # si chiude alla prima barra che tocca SL o TP
+        evaluator = self.evaluators.get(symbol)
+        if not evaluator or bars.empty:
+            return
+        
+        hits = evaluator.evaluate_bars(
+            bars['High'].to_numpy(),
+            bars['Low'].to_numpy(),
+            resolve=self._resolver(symbol, bars.index)
+        )
+        order = np.argsort(hits['bar'], kind='stable')
+        hits = {name: values[order] for name, values in hits.items()}
+        self._close_hits(symbol, hits, bars.index[hits['bar']])
+    
+    def _resolver(self, symbol: str, times):
+        if self.fill_resolver is None or times is None:
+            return None
+        
+        def resolve(bars, direction, sl, tp):
+            # Conversione solo se ci sono barre ambigue
+            bar_times = pd.DatetimeIndex(times).to_numpy(dtype='datetime64[ns]')
+            return self.fill_resolver.resolve_many(symbol, bar_times[bars], direction, sl, tp)
+        
+        return resolve
+    
+    def _close_hits(self, symbol: str, hits: Dict[str, np.ndarray], exit_times=None):
+        book = self.book[symbol]
+        for i, position_id in enumerate(hits['ids']):
+            position = book.pop(int(position_id))
+            position.close(
+                float(hits['exit_price'][i]),
+                'stop_loss' if hits['stop'][i] else 'take_profit',
+                self.clock() if exit_times is None else exit_times[i].to_pydatetime()
+            )
+            self.capital += position.profit
+            self.closed_trades.append(position)
+        self.open_count -= len(hits['ids'])
+        self._track(len(hits['ids']))
+    
+    def _track(self, closed: int):
+        # Aggiorna le metriche con gli ultimi trade chiusi, in blocco
+        if not closed:
+            return
+        trades = self.closed_trades
+        start = trades.count - closed
+        profit = trades.column('profit')[start:]
+        exit_time = trades.column('exit_time')[start:]
+        self.performance.update(self.capital - profit.sum() + np.cumsum(profit), exit_time)
+        self.performance.add_trades(profit, trades.column('entry_time')[start:], exit_time)
     
     def get_open_positions(self, symbol: str = None) -> List[Position]:
         if symbol:
-            return [p for p in self.positions if p.symbol == symbol]
+            return list(self.book.get(symbol, {}).values())
         return self.positions
     
     def get_statistics(self) -> Dict:
-        if not self.closed_positions:
+        trades = self.closed_trades
+        if not trades.count:
             return {}
         
-        profits = [p.profit for p in self.closed_positions]
-        winning_trades = [p for p in self.closed_positions if p.profit > 0]
-        losing_trades = [p for p in self.closed_positions if p.profit <= 0]
-        
+        # Sharpe come nei backtest: rendimenti per anno solare della curva
+        # di equity (qui realizzata, un punto per trade), tenuti dal tracker
+        performance = self.performance.summary()
         return {
             'initial_capital': self.initial_capital,
             'final_capital': self.capital,
             'total_return': ((self.capital - self.initial_capital) / self.initial_capital) * 100,
-            'total_trades': len(self.closed_positions),
-            'winning_trades': len(winning_trades),
-            'losing_trades': len(losing_trades),
-            'win_rate': (len(winning_trades) / len(self.closed_positions)) * 100 if self.closed_positions else 0,
-            'average_profit': sum(profits) / len(profits) if profits else 0,
-            'max_profit': max(profits) if profits else 0,
-            'max_loss': min(profits) if profits else 0
-        }
\ No newline at end of file
+            'total_trades': trades.count,
+            'winning_trades': trades.winning,
+            'losing_trades': trades.count - trades.winning,
+            'win_rate': (trades.winning / trades.count) * 100,
+            'average_profit': trades.total_profit / trades.count,
+            'max_profit': trades.max_profit,
+            'max_loss': trades.max_loss,
+            'max_drawdown': performance['max_drawdown'],
+            'max_drawdown_duration': performance['max_drawdown_duration'],
+            'sharpe_ratio': performance['annual_sharpe_ratio'],
+            'sortino_ratio': performance['sortino_ratio'],
+            'profit_factor': performance['profit_factor'],
+            'expectancy': performance['expectancy'],
+            'average_trade_duration': performance['average_trade_duration']
+        }
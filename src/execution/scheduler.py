@@ -0,0 +1,155 @@
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from loguru import logger
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from src.data.mmap_bars import MmapBars, time_values
+
+
+class BarCloseScheduler:
+    # Sveglia il loop di trading alla chiusura delle barre invece che a
+    # intervalli fissi. Ogni simbolo ha il suo timeframe (in minuti); i
+    # confini sono allineati all'epoch, come le barre MT5 fino a H1.
+    # offset lascia al broker qualche secondo per finalizzare la barra.
+    def __init__(
+        self,
+        timeframes: Dict[str, int],
+        offset: float = 2.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.periods = {symbol: int(tf * 60) for symbol, tf in timeframes.items()}
+        self.offset = offset
+        self.clock = clock
+        self.sleep = sleep
+        self.last_close: Dict[str, int] = {}
+        self.wakeups = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def _latest_close(self, symbol: str, now: float) -> int:
+        # Ultima chiusura il cui orario di sveglia è già passato
+        period = self.periods[symbol]
+        return int((now - self.offset) // period) * period
+
+    def _due_close(self, symbol: str, now: float) -> int:
+        latest = self._latest_close(symbol, now)
+        last = self.last_close.setdefault(symbol, latest)
+        if latest > last:
+            # In ritardo: si salta direttamente all'ultima barra chiusa
+            return latest
+        return last + self.periods[symbol]
+
+    def next_wakeup(self, now: Optional[float] = None) -> float:
+        now = self.clock() if now is None else now
+        return min(self._due_close(symbol, now) for symbol in self.periods) + self.offset
+
+    def _plan(self, now: float):
+        due = {symbol: self._due_close(symbol, now) for symbol in self.periods}
+        close = min(due.values())
+        return due, close, close + self.offset
+
+    def wait(self) -> Dict:
+        now = self.clock()
+        due, close, wakeup = self._plan(now)
+
+        if wakeup > now:
+            self.sleep(wakeup - now)
+
+        return self._complete(due, close, wakeup)
+
+    async def wait_async(self) -> Dict:
+        # Come wait, ma senza bloccare l'event loop
+        now = self.clock()
+        due, close, wakeup = self._plan(now)
+
+        if wakeup > now:
+            await asyncio.sleep(wakeup - now)
+
+        return self._complete(due, close, wakeup)
+
+    def _complete(self, due: Dict[str, int], close: int, wakeup: float) -> Dict:
+        now = self.clock()
+        symbols: List[str] = []
+        skipped = 0
+        for symbol, symbol_close in due.items():
+            if symbol_close != close:
+                continue
+            symbols.append(symbol)
+            skipped = max(
+                skipped,
+                (close - self.last_close[symbol]) // self.periods[symbol] - 1
+            )
+            self.last_close[symbol] = close
+
+        lag = max(0.0, now - wakeup)
+        self.wakeups += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+
+        close_time = datetime.fromtimestamp(close, tz=timezone.utc).replace(tzinfo=None)
+        if skipped > 0:
+            logger.warning(
+                f"Scheduler behind by {lag:.2f}s: skipped {skipped} bar(s), "
+                f"processing close {close_time}"
+            )
+        else:
+            logger.debug(f"Bar close {close_time} for {symbols} | wake-up lag {lag * 1000:.1f}ms")
+
+        return {
+            'close_time': close_time,
+            'symbols': symbols,
+            'lag': lag,
+            'skipped': skipped
+        }
+
+    def get_statistics(self) -> Dict:
+        return {
+            'wakeups': self.wakeups,
+            'last_lag': self.last_lag,
+            'max_lag': self.max_lag,
+            'average_lag': self.total_lag / self.wakeups if self.wakeups else 0.0
+        }
+
+
+def closed_window(
+    times: np.ndarray,
+    close_time: int,
+    period: int,
+    lookback: int
+) -> Optional[Tuple[int, int]]:
+    # Posizioni [first, last) delle barre chiuse a close_time (tutto in ns,
+    # nello stesso orario delle barre): aperte tra close_time - lookback e
+    # close_time - period, esclusa quella appena aperta. None se manca la
+    # barra appena chiusa (nessun tick, dati in ritardo)
+    last_open = close_time - period
+    last = int(np.searchsorted(times, last_open, side='right'))
+    if last == 0 or times[last - 1] != last_open:
+        return None
+    return int(np.searchsorted(times, close_time - lookback, side='left')), last
+
+
+def closed_bars(
+    data: Optional[Union[pd.DataFrame, MmapBars]],
+    close_time: datetime,
+    timeframe: int,
+    lookback: timedelta = timedelta(days=7)
+) -> Optional[Union[pd.DataFrame, MmapBars]]:
+    # Finestra di closed_window sui dati del provider (DataFrame) o su
+    # MmapBars: la stessa nel paper/live trading e nel replay
+    if data is None:
+        return None
+    window = closed_window(
+        time_values(data),
+        pd.Timestamp(close_time).value,
+        timeframe * 60 * 1_000_000_000,
+        pd.Timedelta(lookback).value
+    )
+    if window is None:
+        return None
+    first, last = window
+    return data.iloc[first:last] if isinstance(data, pd.DataFrame) else data[first:last]
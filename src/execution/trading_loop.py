@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from loguru import logger
+from typing import Any, Callable, Dict, List, Optional
+from src.execution.scheduler import BarCloseScheduler
+from src.monitoring.metrics import MetricsRegistry
+
+
+# analyze(symbol) -> risultato (o None): download dati e calcolo segnale,
+# eseguito in parallelo nel thread pool
+AnalyzeFn = Callable[[str], Optional[Any]]
+# execute(symbol, risultato): ordini e aggiornamento del RiskManager,
+# eseguito un simbolo alla volta
+ExecuteFn = Callable[[str, Any], None]
+
+
+class TradingLoop:
+    # Loop asincrono: a ogni chiusura di barra i simboli vengono analizzati
+    # in parallelo in un thread pool limitato (le chiamate MT5 e pandas sono
+    # bloccanti), mentre la parte che modifica lo stato condiviso passa da
+    # una sezione serializzata, così can_open_position resta coerente.
+    # Ogni simbolo entra nella sezione appena il suo segnale è pronto.
+    # Con un MetricsRegistry registra durata del ciclo, delle due fasi per
+    # simbolo e ritardo tra chiusura della barra e segnale pronto.
+    def __init__(self, max_workers: int = 8, metrics: Optional[MetricsRegistry] = None):
+        self.max_workers = max_workers
+        self.metrics = metrics
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='symbol'
+        )
+        self.last_cycle_time = 0.0
+        # Chiusura di barra del ciclo in corso (UTC senza timezone), per
+        # analyze: i dati vanno presi fino a qui, solo barre chiuse
+        self.bar_close: Optional[datetime] = None
+
+    async def run_cycle(
+        self,
+        symbols: List[str],
+        analyze: AnalyzeFn,
+        execute: ExecuteFn,
+        bar_close: Optional[datetime] = None
+    ) -> Dict[str, Optional[Any]]:
+        loop = asyncio.get_running_loop()
+        order_lock = asyncio.Lock()
+        metrics = self.metrics
+        self.bar_close = bar_close
+        # bar_close è in UTC senza timezone, come nello scheduler
+        close_timestamp = bar_close.replace(tzinfo=timezone.utc).timestamp() if bar_close else None
+
+        async def handle(symbol: str) -> Optional[Any]:
+            started = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(self.executor, analyze, symbol)
+            except Exception as e:
+                logger.error(f"Error analyzing {symbol}: {e}")
+                if metrics:
+                    metrics.increment('errors_total', stage='analyze', symbol=symbol)
+                return None
+            finally:
+                if metrics:
+                    metrics.observe('stage_seconds', time.perf_counter() - started, stage='analyze', symbol=symbol)
+
+            if metrics and close_timestamp is not None:
+                metrics.observe('bar_to_signal_seconds', max(0.0, time.time() - close_timestamp), symbol=symbol)
+
+            if result is None:
+                return None
+
+            async with order_lock:
+                started = time.perf_counter()
+                try:
+                    await loop.run_in_executor(self.executor, execute, symbol, result)
+                except Exception as e:
+                    logger.error(f"Error executing {symbol}: {e}")
+                    if metrics:
+                        metrics.increment('errors_total', stage='execute', symbol=symbol)
+                if metrics:
+                    metrics.observe('stage_seconds', time.perf_counter() - started, stage='execute', symbol=symbol)
+            return result
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(handle(symbol) for symbol in symbols))
+        self.last_cycle_time = time.perf_counter() - started
+
+        if metrics:
+            metrics.observe('cycle_seconds', self.last_cycle_time)
+            metrics.set_gauge('cycle_symbols', len(symbols))
+
+        logger.debug(f"Cycle for {len(symbols)} symbols took {self.last_cycle_time * 1000:.1f}ms")
+        return dict(zip(symbols, results))
+
+    async def run(
+        self,
+        scheduler: BarCloseScheduler,
+        analyze: AnalyzeFn,
+        execute: ExecuteFn,
+        select_symbols: Optional[Callable[[List[str]], List[str]]] = None,
+        before_cycle: Optional[Callable[[], None]] = None,
+        after_cycle: Optional[Callable[[], None]] = None
+    ):
+        while True:
+            # Attendi la chiusura della prossima barra
+            bar_close = await scheduler.wait_async()
+
+            if before_cycle:
+                before_cycle()
+
+            symbols = bar_close['symbols']
+            if select_symbols:
+                symbols = select_symbols(symbols)
+
+            await self.run_cycle(symbols, analyze, execute, bar_close['close_time'])
+
+            if after_cycle:
+                after_cycle()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,18 +1,38 @@
 import sys
+import time
+import asyncio
 import argparse
 from datetime import datetime, timedelta
 from loguru import logger
 import pandas as pd
 from pathlib import Path
+from typing import Optional
 
 from config.settings import settings
+from src.data import mt5_sim
 from src.data.mt5_provider import MT5Provider
 from src.data.twelvedata_provider import TwelveDataProvider
+from src.data.bar_store import BarStore
+from src.data.hedged_provider import HedgedProvider, TwelveDataSource
+from src.data.resampler import BASE_TIMEFRAME, resample_bars
 from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.strategy.indicator_cache import IndicatorCache
 from src.risk.manager import RiskManager
 from src.execution.paper_trader import PaperTrader
+from src.execution.paper_session import PaperSession
+from src.execution.replay import ReplayEngine, SimulatedClock
+from src.execution.fill_resolver import IntrabarResolver
 from src.execution.mt5_executor import MT5Executor
+from src.execution.scheduler import BarCloseScheduler, closed_bars
+from src.execution.trading_loop import TradingLoop
 from src.backtest.backtester import Backtester
+from src.backtest.vectorized import VectorizedBacktester
+from src.backtest.portfolio import PortfolioBacktester
+from src.backtest.parallel import run_per_symbol
+from src.backtest.result_cache import ResultCache
+from src.backtest.optimizer import ParameterOptimizer, load_grid
+from src.backtest.walk_forward import WalkForwardOptimizer
+from src.monitoring.metrics import MetricsRegistry, MetricsServer, timed
 
 
 # Setup logging
@@ -26,93 +46,542 @@ logger.add(
 )
 
 
+def create_mt5_provider(metrics: Optional[MetricsRegistry] = None) -> MT5Provider:
+    bar_store = None
+    if settings.use_bar_store:
+        bar_store = BarStore(settings.bar_store_path, utc_offset_hours=settings.broker_utc_offset_hours)
+    # L'aggregazione da M1 richiede l'archivio locale
+    resample_from = BASE_TIMEFRAME if bar_store is not None and settings.resample_from_m1 else None
+    return MT5Provider(
+        settings.mt5_login,
+        settings.mt5_password,
+        settings.mt5_server,
+        bar_store=bar_store,
+        resample_from=resample_from,
+        metrics=metrics,
+        terminal=create_simulated_terminal() if settings.mt5_simulator else None
+    )
+
+
+def create_simulated_terminal():
+    # Barre da un archivio separato da quello del bot, che le scarica dal
+    # terminale simulato come da quello reale
+    mt5_sim.configure(
+        bar_store=BarStore(settings.mt5_sim_bar_store) if settings.mt5_sim_bar_store else None,
+        latency=settings.mt5_sim_latency,
+        order_latency=settings.mt5_sim_order_latency,
+        jitter=settings.mt5_sim_jitter,
+        reject_rate=settings.mt5_sim_reject_rate,
+        error_rate=settings.mt5_sim_error_rate,
+        balance=settings.initial_capital
+    )
+    logger.warning("Using the simulated MT5 terminal: no real orders are sent")
+    return mt5_sim
+
+
+def start_metrics():
+    # Registro delle latenze ed endpoint /metrics; (None, None) se disattivati
+    if not settings.metrics_enabled:
+        return None, None
+    metrics = MetricsRegistry()
+    metrics.describe('stage_seconds', 'Duration of each trading stage per symbol')
+    metrics.describe('mt5_call_seconds', 'Round-trip latency of MT5 terminal calls')
+    metrics.describe('cycle_seconds', 'Duration of a full bar-close cycle')
+    metrics.describe('bar_to_signal_seconds', 'Delay from bar close to signal ready')
+    server = MetricsServer(metrics, settings.metrics_host, settings.metrics_port)
+    try:
+        server.start()
+    except OSError as e:
+        # Porta occupata: le metriche restano nel log di fine sessione
+        logger.warning(f"Metrics endpoint unavailable: {e}")
+        server = None
+    return metrics, server
+
+
+def stop_metrics(metrics, server):
+    if server is not None:
+        server.close()
+    if metrics is None:
+        return
+    for series, stats in metrics.summary().items():
+        logger.info(
+            f"{series}: p50 {stats['p50'] * 1000:.1f}ms | p99 {stats['p99'] * 1000:.1f}ms | "
+            f"max {stats['max'] * 1000:.1f}ms | n={stats['count']}"
+        )
+
+
+def create_data_provider(mt5: MT5Provider):
+    # Dati del loop di trading: MT5, con TwelveData come riserva quando
+    # il terminale è lento o non risponde
+    if not settings.use_data_hedging:
+        return mt5
+    if settings.twelvedata_time_offset_hours is None:
+        logger.error(
+            "USE_DATA_HEDGING requires TWELVEDATA_TIME_OFFSET_HOURS (broker time minus UTC); "
+            "data hedging disabled"
+        )
+        return mt5
+    secondary = TwelveDataSource(
+        TwelveDataProvider(settings.twelvedata_api_key),
+        time_offset=timedelta(hours=settings.twelvedata_time_offset_hours)
+    )
+    return HedgedProvider(
+        mt5,
+        secondary,
+        hedge_after=settings.hedge_after,
+        names=['MT5', 'TwelveData']
+    )
+
+
+def fetch_closed_bars(data_provider, symbol: str, bar_close: datetime, metrics=None):
+    # Ultimi 7 giorni di barre chiuse a bar_close (UTC dello scheduler),
+    # nell'orario del server MT5; esclusa la barra appena aperta, come nel replay
+    close_time = bar_close + timedelta(hours=settings.broker_utc_offset_hours)
+    with timed(metrics, 'stage_seconds', stage='fetch', symbol=symbol):
+        data = data_provider.get_historical_data(
+            symbol=symbol,
+            timeframe=settings.timeframe,
+            start=close_time - timedelta(days=7),
+            end=close_time
+        )
+    return closed_bars(data, close_time, settings.timeframe)
+
+
+def close_data_provider(data_provider):
+    if isinstance(data_provider, HedgedProvider):
+        data_provider.log_statistics()
+        data_provider.close()
+
+
+def create_result_cache(args) -> Optional[ResultCache]:
+    if not settings.use_result_cache or args.no_cache:
+        return None
+    return ResultCache(settings.result_cache_path, settings.result_cache_max_mb)
+
+
+def create_indicator_cache(args) -> IndicatorCache:
+    # Serie di indicatori delle esecuzioni precedenti: stesso storico,
+    # storico cresciuto o finestra spostata vengono riusati
+    indicator_cache = IndicatorCache(settings.indicator_cache_max_mb)
+    if settings.use_result_cache and not args.no_cache:
+        loaded = indicator_cache.load(settings.indicator_cache_path)
+        if loaded:
+            logger.info(f"Loaded {loaded} indicator series from {settings.indicator_cache_path}")
+    return indicator_cache
+
+
+def save_indicator_cache(indicator_cache: IndicatorCache, args):
+    log_indicator_cache(indicator_cache)
+    if settings.use_result_cache and not args.no_cache:
+        indicator_cache.save(settings.indicator_cache_path)
+
+
+def create_scheduler() -> BarCloseScheduler:
+    return BarCloseScheduler(
+        {symbol: settings.timeframe for symbol in settings.symbols},
+        offset=settings.bar_close_offset
+    )
+
+
+def load_backtest_data(mt5, symbol, start_date, end_date, mmap=False, timeframe=None):
+    # Con mmap i dati restano su disco (MmapBars) invece che in un DataFrame
+    loader = mt5.get_historical_bars if mmap else mt5.get_historical_data
+    data = loader(
+        symbol=symbol,
+        timeframe=timeframe or settings.timeframe,
+        start=start_date,
+        end=end_date
+    )
+    
+    if data is None or data.empty:
+        logger.warning(f"No data for {symbol}, skipping")
+        return None
+
+    min_bars = max(settings.ema_slow, settings.atr_period) + 50
+    if len(data) < min_bars:
+        logger.error(
+            f"Insufficient data for {symbol}: got {len(data)} bars, "
+            f"need at least {min_bars}. Try a wider date range."
+        )
+        return None
+
+    logger.info(f"Data loaded: {len(data)} bars from {data.index[0]} to {data.index[-1]}")
+    return data
+
+
+def log_backtest_results(results, title):
+    logger.info(f"\n{'='*50}")
+    logger.info(title)
+    logger.info(f"{'='*50}")
+    logger.info(f"Initial Capital: ${results['initial_value']:.2f}")
+    logger.info(f"Final Capital: ${results['final_value']:.2f}")
+    logger.info(f"Total Return: {results['total_return']:.2f}%")
+    
+    # Handle None values for metrics
+    sharpe = results.get('sharpe_ratio')
+    logger.info(f"Sharpe Ratio: {sharpe:.2f}" if sharpe is not None else "Sharpe Ratio: N/A")
+    
+    max_dd = results.get('max_drawdown')
+    logger.info(f"Max Drawdown: {max_dd:.2f}%" if max_dd is not None else "Max Drawdown: N/A")
+    
+    logger.info(f"Total Trades: {results['total_trades']}")
+    
+    win_rate = results.get('win_rate')
+    logger.info(f"Win Rate: {win_rate:.2f}%" if win_rate is not None else "Win Rate: N/A")
+    
+    logger.info(f"{'='*50}\n")
+
+
+def run_portfolio_backtest(mt5, start_date, end_date, args, strategy_params):
+    # Tutti i simboli in un'unica simulazione con capitale condiviso
+    data = {}
+    for symbol in settings.symbols:
+        bars = load_backtest_data(mt5, symbol, start_date, end_date, args.mmap)
+        if bars is not None:
+            data[symbol] = bars
+    
+    if not data:
+        logger.error("No data available for portfolio backtest")
+        return
+    
+    if args.engine != 'vectorized':
+        logger.info("Portfolio backtest uses the vectorized engine")
+    
+    backtester = PortfolioBacktester(
+        initial_capital=settings.initial_capital,
+        commission=0.0001
+    )
+    # Con --output servono i trade, che non sono in cache
+    cache = None if args.output else create_result_cache(args)
+    if cache is not None:
+        results = cache.run(backtester, data, strategy_params)
+    else:
+        results = backtester.run(data, strategy_params)
+    
+    log_backtest_results(results, f"PORTFOLIO RESULTS - {len(data)} symbols")
+    logger.info(f"Signals blocked by risk limits: {results['blocked_signals']}")
+    
+    symbols = pd.DataFrame(results['symbols']).T
+    logger.info(f"Per-symbol results:\n{symbols.to_string(float_format=lambda x: f'{x:.2f}')}")
+    
+    if args.output:
+        backtester.trades.to_csv(args.output, index=False)
+        logger.info(f"Portfolio trades saved to {args.output}")
+
+
+def backtest_symbol(symbol, mt5, start_date, end_date, args, strategy_params):
+    logger.info(f"Backtesting {symbol}...")
+    
+    data = load_backtest_data(mt5, symbol, start_date, end_date, args.mmap)
+    if data is None:
+        return None
+    
+    # Esegui backtest
+    if args.engine == 'vectorized':
+        backtester = VectorizedBacktester(
+            initial_capital=settings.initial_capital,
+            commission=0.0001
+        )
+    else:
+        backtester = Backtester(
+            initial_capital=settings.initial_capital,
+            commission=0.0001,
+            low_memory=args.low_memory,
+            trace_memory=args.trace_memory
+        )
+    
+    cache = create_result_cache(args)
+    if cache is not None:
+        return cache.run(backtester, data, strategy_params)
+    return backtester.run(data, strategy_params)
+
+
+def backtest_symbol_worker(symbol, start_date, end_date, args, strategy_params):
+    # Eseguito in un processo separato: apre la propria connessione al
+    # terminale (o all'archivio locale) e carica da sé i dati del simbolo
+    mt5 = create_mt5_provider()
+    
+    if not mt5.connect() and mt5.bar_store is None:
+        logger.error(f"Failed to connect to MT5 for {symbol}")
+        return None
+    
+    try:
+        return backtest_symbol(symbol, mt5, start_date, end_date, args, strategy_params)
+    finally:
+        mt5.disconnect()
+
+
+def report_backtests(results, started):
+    # Risultati stampati man mano che i simboli terminano, poi un riepilogo
+    summary = {}
+    for symbol, result in results:
+        if result is None:
+            continue
+        log_backtest_results(result, f"BACKTEST RESULTS - {symbol}")
+        summary[symbol] = result
+    
+    if not summary:
+        return
+    
+    columns = ['total_return', 'sharpe_ratio', 'max_drawdown', 'total_trades', 'win_rate']
+    table = pd.DataFrame(summary).T[columns].apply(pd.to_numeric)
+    table = table.reindex([symbol for symbol in settings.symbols if symbol in summary])
+    logger.info(f"\n{'='*50}")
+    logger.info(f"BACKTEST SUMMARY - {len(table)} symbols in {time.perf_counter() - started:.1f}s")
+    logger.info(f"{'='*50}")
+    logger.info(f"\n{table.to_string(float_format=lambda x: f'{x:.2f}')}")
+    logger.info(f"Average Return: {table['total_return'].mean():.2f}%")
+    logger.info(f"Total Trades: {int(table['total_trades'].sum())}")
+    logger.info(f"{'='*50}\n")
+
+
 def run_backtest(args):
     logger.info("=== BACKTEST MODE ===")
+    started = time.perf_counter()
+    
+    # Recupera dati storici
+    start_date = datetime.strptime(args.start, '%Y-%m-%d')
+    end_date = datetime.strptime(args.end, '%Y-%m-%d')
+    
+    strategy_params = {
+        'ema_fast': settings.ema_fast,
+        'ema_slow': settings.ema_slow,
+        'atr_period': settings.atr_period,
+        'atr_sl_multiplier': settings.atr_sl_multiplier,
+        'atr_tp_multiplier': settings.atr_tp_multiplier,
+        'risk_percent': settings.risk_percent
+    }
+    
+    if args.output and not args.portfolio:
+        logger.warning("--output saves trades only for --portfolio backtests, ignoring it")
+    
+    # Un processo per simbolo: caricamento dati e backtest in parallelo
+    workers = args.workers or 1
+    if workers > 1 and not args.portfolio:
+        logger.info(f"Backtesting {len(settings.symbols)} symbols on {workers} worker processes")
+        results = run_per_symbol(
+            backtest_symbol_worker,
+            settings.symbols,
+            start_date,
+            end_date,
+            args,
+            strategy_params,
+            workers=workers
+        )
+        report_backtests(results, started)
+        return
     
     # Inizializza data provider
-    mt5 = MT5Provider(settings.mt5_login, settings.mt5_password, settings.mt5_server)
+    mt5 = create_mt5_provider()
     
     if not mt5.connect():
-        logger.error("Failed to connect to MT5")
-        return
+        if mt5.bar_store is None:
+            logger.error("Failed to connect to MT5")
+            return
+        logger.warning("Failed to connect to MT5, using local bar store only")
+    
+    try:
+        if args.portfolio:
+            run_portfolio_backtest(mt5, start_date, end_date, args, strategy_params)
+            return
+        
+        results = run_per_symbol(
+            backtest_symbol,
+            settings.symbols,
+            mt5,
+            start_date,
+            end_date,
+            args,
+            strategy_params
+        )
+        report_backtests(results, started)
+    
+    finally:
+        mt5.disconnect()
+
+
+def load_symbols_data(args, timeframe):
+    # Storico di tutti i simboli configurati per --start/--end, da MT5 o
+    # dall'archivio locale; None senza connessione né archivio
+    mt5 = create_mt5_provider()
+    
+    if not mt5.connect():
+        if mt5.bar_store is None:
+            logger.error("Failed to connect to MT5")
+            return None
+        logger.warning("Failed to connect to MT5, using local bar store only")
     
     try:
-        # Recupera dati storici
         start_date = datetime.strptime(args.start, '%Y-%m-%d')
         end_date = datetime.strptime(args.end, '%Y-%m-%d')
         
+        data = {}
         for symbol in settings.symbols:
-            logger.info(f"Backtesting {symbol}...")
-            
-            data = mt5.get_historical_data(
-                symbol=symbol,
-                timeframe=settings.timeframe,
-                start=start_date,
-                end=end_date
+            df = load_backtest_data(
+                mt5, symbol, start_date, end_date, args.mmap,
+                timeframe=timeframe
             )
-            
-            if data is None or data.empty:
-                logger.warning(f"No data for {symbol}, skipping")
-                continue
-
-            min_bars = max(settings.ema_slow, settings.atr_period) + 50
-            if len(data) < min_bars:
-                logger.error(
-                    f"Insufficient data for {symbol}: got {len(data)} bars, "
-                    f"need at least {min_bars}. Try a wider date range."
-                )
-                continue
-
-            logger.info(f"Data loaded: {len(data)} bars from {data.index[0]} to {data.index[-1]}")
-            
-            # Esegui backtest
-            backtester = Backtester(
-                initial_capital=settings.initial_capital,
-                commission=0.0001
-            )
-            
-            strategy_params = {
-                'ema_fast': settings.ema_fast,
-                'ema_slow': settings.ema_slow,
-                'atr_period': settings.atr_period,
-                'atr_sl_multiplier': settings.atr_sl_multiplier,
-                'atr_tp_multiplier': settings.atr_tp_multiplier,
-                'risk_percent': settings.risk_percent
-            }
-            
-            results = backtester.run(data, strategy_params)
-            
-            # Stampa risultati
-            logger.info(f"\n{'='*50}")
-            logger.info(f"BACKTEST RESULTS - {symbol}")
-            logger.info(f"{'='*50}")
-            logger.info(f"Initial Capital: ${results['initial_value']:.2f}")
-            logger.info(f"Final Capital: ${results['final_value']:.2f}")
-            logger.info(f"Total Return: {results['total_return']:.2f}%")
-            
-            # Handle None values for metrics
-            sharpe = results.get('sharpe_ratio')
-            logger.info(f"Sharpe Ratio: {sharpe:.2f}" if sharpe is not None else "Sharpe Ratio: N/A")
-            
-            max_dd = results.get('max_drawdown')
-            logger.info(f"Max Drawdown: {max_dd:.2f}%" if max_dd is not None else "Max Drawdown: N/A")
-            
-            logger.info(f"Total Trades: {results['total_trades']}")
-            
-            win_rate = results.get('win_rate')
-            logger.info(f"Win Rate: {win_rate:.2f}%" if win_rate is not None else "Win Rate: N/A")
-            
-            logger.info(f"{'='*50}\n")
+            if df is not None:
+                data[symbol] = df
+        return data
     
     finally:
         mt5.disconnect()
 
 
+def run_optimize(args):
+    logger.info("=== OPTIMIZE MODE ===")
+    
+    try:
+        grid = load_grid(args.grid)
+    except ValueError as e:
+        logger.error(f"Invalid parameter grid: {e}")
+        return
+    
+    # Con più timeframe le barre M1 vengono caricate una volta sola e
+    # ogni timeframe costa solo un'aggregazione locale
+    timeframes = args.timeframes or [settings.timeframe]
+    source_timeframe = BASE_TIMEFRAME if len(timeframes) > 1 else timeframes[0]
+    
+    data = load_symbols_data(args, source_timeframe)
+    if data is None:
+        return
+    if not data:
+        logger.error("No data available for optimization")
+        return
+    
+    optimizer = ParameterOptimizer(
+        grid=grid,
+        initial_capital=settings.initial_capital,
+        commission=0.0001,
+        risk_percent=settings.risk_percent,
+        workers=args.workers,
+        cache=create_result_cache(args),
+        indicator_cache=create_indicator_cache(args)
+    )
+    
+    try:
+        if len(timeframes) == 1:
+            table = optimizer.run(data, rank_by=args.rank_by, timeframe=timeframes[0])
+        else:
+            results = []
+            for timeframe in timeframes:
+                logger.info(f"Optimizing M{timeframe}...")
+                optimizer.run(
+                    {symbol: resample_bars(df, timeframe) for symbol, df in data.items()},
+                    timeframe=timeframe
+                )
+                results.append(optimizer.results.assign(timeframe=timeframe))
+            optimizer.results = pd.concat(results, ignore_index=True)
+            table = optimizer.rank(optimizer.results, args.rank_by)
+    except ValueError as e:
+        logger.error(f"Optimization failed: {e}")
+        return
+    
+    logger.info(f"\n{'='*50}")
+    logger.info(f"OPTIMIZATION RESULTS (ranked by {args.rank_by})")
+    logger.info(f"{'='*50}")
+    logger.info(f"\n{table.head(args.top).to_string(index=False)}")
+    logger.info(f"{'='*50}\n")
+    save_indicator_cache(optimizer.indicator_cache, args)
+    
+    if args.output:
+        table.to_csv(args.output, index=False)
+        logger.info(f"Full results saved to {args.output}")
+
+
+def log_indicator_cache(indicator_cache):
+    stats = indicator_cache.get_statistics()
+    logger.info(
+        f"Indicator cache: {stats['hits']} hits, {stats['extensions']} extended, "
+        f"{stats['misses']} misses ({stats['hit_rate']:.1f}%), {stats['size_mb']:.1f} MB"
+    )
+
+
+def run_walk_forward(args):
+    logger.info("=== WALK-FORWARD MODE ===")
+    
+    try:
+        grid = load_grid(args.grid)
+    except ValueError as e:
+        logger.error(f"Invalid parameter grid: {e}")
+        return
+    
+    data = load_symbols_data(args, settings.timeframe)
+    if data is None:
+        return
+    if not data:
+        logger.error("No data available for walk-forward optimization")
+        return
+    
+    optimizer = WalkForwardOptimizer(
+        train=pd.Timedelta(days=args.train_days),
+        test=pd.Timedelta(days=args.test_days),
+        grid=grid,
+        anchored=args.anchored,
+        initial_capital=settings.initial_capital,
+        commission=0.0001,
+        risk_percent=settings.risk_percent,
+        workers=args.workers,
+        indicator_cache=create_indicator_cache(args)
+    )
+    
+    try:
+        folds = optimizer.run(data, rank_by=args.rank_by, timeframe=settings.timeframe)
+    except ValueError as e:
+        logger.error(f"Walk-forward failed: {e}")
+        return
+    
+    logger.info(f"\n{'='*50}")
+    logger.info(f"WALK-FORWARD FOLDS (ranked by {args.rank_by})")
+    logger.info(f"{'='*50}")
+    logger.info(f"\n{folds.to_string(index=False)}")
+    logger.info(f"{'='*50}")
+    logger.info("OUT-OF-SAMPLE (stitched)")
+    logger.info(f"{'='*50}")
+    logger.info(f"\n{optimizer.summary.to_string(index=False)}")
+    logger.info(f"{'='*50}\n")
+    save_indicator_cache(optimizer.indicator_cache, args)
+    
+    if args.output:
+        folds.to_csv(args.output, index=False)
+        logger.info(f"Fold results saved to {args.output}")
+
+
+def log_paper_statistics(paper_trader, fill_resolver, title):
+    stats = paper_trader.get_statistics()
+    if not stats:
+        logger.info("No closed trades")
+        return
+    
+    logger.info(f"\n{'='*50}")
+    logger.info(title)
+    logger.info(f"{'='*50}")
+    logger.info(f"Initial Capital: ${stats['initial_capital']:.2f}")
+    logger.info(f"Final Capital: ${stats['final_capital']:.2f}")
+    logger.info(f"Total Return: {stats['total_return']:.2f}%")
+    logger.info(f"Total Trades: {stats['total_trades']}")
+    logger.info(f"Win Rate: {stats['win_rate']:.2f}%")
+    logger.info(f"Average Profit: ${stats['average_profit']:.2f}")
+    if stats['profit_factor'] is not None:
+        logger.info(f"Profit Factor: {stats['profit_factor']:.2f}")
+    logger.info(f"Max Drawdown: {stats['max_drawdown']:.2f}%")
+    if fill_resolver is not None:
+        fills = fill_resolver.get_statistics()
+        logger.info(
+            f"Ambiguous SL/TP bars: {fills['ambiguous']} "
+            f"(resolved from M1: {fills['resolution_rate']:.1f}%, "
+            f"take profit first: {fills['tp_first']})"
+        )
+    logger.info(f"{'='*50}\n")
+
+
 def run_paper_trading():
     logger.info("=== PAPER TRADING MODE ===")
     
     # Inizializza componenti
-    mt5 = MT5Provider(settings.mt5_login, settings.mt5_password, settings.mt5_server)
+    metrics, metrics_server = start_metrics()
+    mt5 = create_mt5_provider(metrics)
     strategy = EMAVWAPStrategy(
         ema_fast=settings.ema_fast,
         ema_slow=settings.ema_slow,
@@ -124,104 +593,156 @@ def run_paper_trading():
         risk_percent=settings.risk_percent,
         initial_capital=settings.initial_capital
     )
-    paper_trader = PaperTrader(initial_capital=settings.initial_capital)
+    fill_resolver = None
+    if mt5.bar_store is not None and settings.intrabar_fills:
+        fill_resolver = IntrabarResolver(mt5.bar_store, settings.timeframe)
+    paper_trader = PaperTrader(
+        initial_capital=settings.initial_capital,
+        fill_resolver=fill_resolver
+    )
     
     if not mt5.connect():
         logger.error("Failed to connect to MT5")
+        stop_metrics(None, metrics_server)
         return
     
+    data_provider = create_data_provider(mt5)
+    
+    def fetch_recent_data(symbol):
+        # Solo barre chiuse: la barra appena aperta ha un solo tick
+        return fetch_closed_bars(data_provider, symbol, trading_loop.bar_close, metrics)
+    
+    session = PaperSession(strategy, risk_manager, paper_trader, metrics=metrics)
+    
+    def analyze(symbol):
+        # Eseguito in parallelo per ogni simbolo
+        return session.analyze(symbol, fetch_recent_data(symbol))
+    
+    def print_statistics():
+        stats = paper_trader.get_statistics()
+        if stats:
+            logger.info(f"Current Capital: ${paper_trader.capital:.2f} | "
+                      f"Trades: {stats.get('total_trades', 0)} | "
+                      f"Win Rate: {stats.get('win_rate', 0):.1f}%")
+    
+    trading_loop = TradingLoop(max_workers=settings.loop_workers, metrics=metrics)
+    
     try:
-        import time
-        
-        while True:
-            for symbol in settings.symbols:
-                # Verifica se c'è già una posizione aperta
-                open_positions = paper_trader.get_open_positions(symbol)
-                if open_positions:
-                    continue
-                
-                # Recupera dati recenti
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=7)
-                
-                data = mt5.get_historical_data(
-                    symbol=symbol,
-                    timeframe=settings.timeframe,
-                    start=start_date,
-                    end=end_date
-                )
-                
-                if data is None or len(data) < 50:
-                    continue
-                
-                # Aggiorna posizioni esistenti
-                paper_trader.update(symbol, data.iloc[-1])
-                
-                # Genera segnale
-                signal = strategy.get_current_signal(data)
-                
-                if signal and risk_manager.can_open_position():
-                    # Calcola position size
-                    size = risk_manager.calculate_position_size(
-                        signal['entry_price'],
-                        signal['sl'],
-                        symbol
-                    )
-                    
-                    # Apri posizione paper
-                    paper_trader.open_position(
-                        symbol=symbol,
-                        direction=signal['direction'],
-                        entry_price=signal['entry_price'],
-                        size=size,
-                        sl=signal['sl'],
-                        tp=signal['tp']
-                    )
-                    
-                    risk_manager.open_position()
-            
-            # Stampa statistiche ogni 10 iterazioni
-            stats = paper_trader.get_statistics()
-            if stats:
-                logger.info(f"Current Capital: ${paper_trader.capital:.2f} | "
-                          f"Trades: {stats.get('total_trades', 0)} | "
-                          f"Win Rate: {stats.get('win_rate', 0):.1f}%")
-            
-            # Attendi prossimo ciclo (es: ogni 1 minuto)
-            time.sleep(60)
+        asyncio.run(trading_loop.run(
+            create_scheduler(),
+            analyze,
+            session.execute,
+            after_cycle=print_statistics
+        ))
     
     except KeyboardInterrupt:
         logger.info("Paper trading stopped by user")
         
         # Stampa statistiche finali
-        stats = paper_trader.get_statistics()
-        if stats:
-            logger.info(f"\n{'='*50}")
-            logger.info("PAPER TRADING FINAL STATISTICS")
-            logger.info(f"{'='*50}")
-            logger.info(f"Initial Capital: ${stats['initial_capital']:.2f}")
-            logger.info(f"Final Capital: ${stats['final_capital']:.2f}")
-            logger.info(f"Total Return: {stats['total_return']:.2f}%")
-            logger.info(f"Total Trades: {stats['total_trades']}")
-            logger.info(f"Win Rate: {stats['win_rate']:.2f}%")
-            logger.info(f"Average Profit: ${stats['average_profit']:.2f}")
-            logger.info(f"{'='*50}\n")
+        log_paper_statistics(paper_trader, fill_resolver, "PAPER TRADING FINAL STATISTICS")
     
     finally:
+        trading_loop.close()
+        close_data_provider(data_provider)
         mt5.disconnect()
+        stop_metrics(metrics, metrics_server)
+
+
+def run_replay(args):
+    logger.info("=== REPLAY MODE ===")
+    
+    mt5 = create_mt5_provider()
+    
+    if not mt5.connect():
+        if mt5.bar_store is None:
+            logger.error("Failed to connect to MT5")
+            return
+        logger.warning("Failed to connect to MT5, using local bar store only")
+    
+    # Stessa finestra di dati che il paper trading scarica a ogni ciclo
+    lookback = timedelta(days=7)
+    start_date = datetime.strptime(args.start, '%Y-%m-%d')
+    end_date = datetime.strptime(args.end, '%Y-%m-%d')
+    
+    try:
+        data = {}
+        for symbol in settings.symbols:
+            df = load_backtest_data(mt5, symbol, start_date - lookback, end_date)
+            if df is not None:
+                data[symbol] = df
+    
+    finally:
+        mt5.disconnect()
+    
+    if not data:
+        logger.error("No data available for replay")
+        return
+    
+    # Stesso stack del paper trading, con orologio simulato
+    clock = SimulatedClock(pd.Timestamp(start_date).timestamp())
+    strategy = EMAVWAPStrategy(
+        ema_fast=settings.ema_fast,
+        ema_slow=settings.ema_slow,
+        atr_period=settings.atr_period,
+        atr_sl_multiplier=settings.atr_sl_multiplier,
+        atr_tp_multiplier=settings.atr_tp_multiplier
+    )
+    risk_manager = RiskManager(
+        risk_percent=settings.risk_percent,
+        initial_capital=settings.initial_capital
+    )
+    fill_resolver = None
+    if mt5.bar_store is not None and settings.intrabar_fills:
+        fill_resolver = IntrabarResolver(mt5.bar_store, settings.timeframe)
+    paper_trader = PaperTrader(
+        initial_capital=settings.initial_capital,
+        fill_resolver=fill_resolver,
+        clock=clock.datetime
+    )
+    session = PaperSession(strategy, risk_manager, paper_trader)
+    
+    ReplayEngine(
+        session,
+        data,
+        settings.timeframe,
+        clock,
+        lookback=lookback,
+        offset=settings.bar_close_offset
+    ).run()
+    
+    log_paper_statistics(paper_trader, fill_resolver, "REPLAY RESULTS")
+    
+    if args.output:
+        paper_trader.closed_trades.to_frame().to_csv(args.output, index=False)
+        logger.info(f"Replayed trades saved to {args.output}")
+
+
+def clear_result_cache():
+    cache = ResultCache(settings.result_cache_path, settings.result_cache_max_mb)
+    removed = cache.invalidate()
+    logger.info(f"Removed {removed} cached backtest results from {settings.result_cache_path}")
+    
+    indicators = Path(settings.indicator_cache_path)
+    if indicators.exists():
+        indicators.unlink()
+        logger.info(f"Removed cached indicator series {indicators}")
 
 
 def run_live_trading():
     logger.info("=== LIVE TRADING MODE ===")
-    logger.warning("ATTENZIONE: Stai per eseguire trading reale!")
     
-    response = input("Sei sicuro di voler continuare? (yes/no): ")
-    if response.lower() != 'yes':
-        logger.info("Live trading cancelled")
-        return
+    # Con il terminale simulato nessun ordine è reale: niente conferma
+    if not settings.mt5_simulator:
+        logger.warning("ATTENZIONE: Stai per eseguire trading reale!")
+        
+        response = input("Sei sicuro di voler continuare? (yes/no): ")
+        if response.lower() != 'yes':
+            logger.info("Live trading cancelled")
+            return
     
     # Inizializza componenti
-    mt5 = MT5Provider(settings.mt5_login, settings.mt5_password, settings.mt5_server)
+    metrics, metrics_server = start_metrics()
+    mt5 = create_mt5_provider(metrics)
     strategy = EMAVWAPStrategy(
         ema_fast=settings.ema_fast,
         ema_slow=settings.ema_slow,
@@ -237,67 +758,78 @@ def run_live_trading():
     
     if not mt5.connect():
         logger.error("Failed to connect to MT5")
+        stop_metrics(None, metrics_server)
         return
     
-    try:
-        import time
+    data_provider = create_data_provider(mt5)
+    
+    def analyze(symbol):
+        # Eseguito in parallelo per ogni simbolo
+        data = fetch_closed_bars(data_provider, symbol, trading_loop.bar_close, metrics)
         
-        while True:
-            # Aggiorna capitale dal conto reale
-            account_info = mt5.get_account_info()
-            if account_info:
-                risk_manager.update_capital(account_info['balance'])
-            
-            for symbol in settings.symbols:
-                # Verifica se c'è già una posizione aperta
-                if symbol in executor.get_active_positions():
-                    continue
-                
-                # Recupera dati recenti
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=7)
-                
-                data = mt5.get_historical_data(
-                    symbol=symbol,
-                    timeframe=settings.timeframe,
-                    start=start_date,
-                    end=end_date
-                )
-                
-                if data is None or len(data) < 50:
-                    continue
-                
-                # Genera segnale
-                signal = strategy.get_current_signal(data)
-                
-                if signal and risk_manager.can_open_position():
-                    # Calcola position size
-                    size = risk_manager.calculate_position_size(
-                        signal['entry_price'],
-                        signal['sl'],
-                        symbol
-                    )
-                    
-                    # Esegui trade reale
-                    order_id = executor.execute_trade(
-                        symbol=symbol,
-                        direction=signal['direction'],
-                        size=size,
-                        sl=signal['sl'],
-                        tp=signal['tp']
-                    )
-                    
-                    if order_id:
-                        risk_manager.open_position()
-            
-            # Attendi prossimo ciclo
-            time.sleep(60)
+        if data is None or len(data) < 50:
+            return None
+        
+        # Genera segnale
+        with timed(metrics, 'stage_seconds', stage='signal', symbol=symbol):
+            return strategy.get_current_signal(data, symbol)
+    
+    def execute(symbol, signal):
+        # Sezione serializzata: un ordine alla volta
+        if not risk_manager.can_open_position():
+            return
+        
+        # Calcola position size
+        with timed(metrics, 'stage_seconds', stage='position_size', symbol=symbol):
+            size = risk_manager.calculate_position_size(
+                signal['entry_price'],
+                signal['sl'],
+                symbol
+            )
+        
+        # Esegui trade reale
+        with timed(metrics, 'stage_seconds', stage='order', symbol=symbol):
+            order_id = executor.execute_trade(
+                symbol=symbol,
+                direction=signal['direction'],
+                size=size,
+                sl=signal['sl'],
+                tp=signal['tp']
+            )
+        
+        if order_id:
+            risk_manager.open_position()
+    
+    def update_capital():
+        # Aggiorna capitale dal conto reale
+        account_info = mt5.get_account_info()
+        if account_info:
+            risk_manager.update_capital(account_info['balance'])
+    
+    def select_symbols(symbols):
+        # Salta i simboli con una posizione già aperta
+        active = executor.get_active_positions()
+        return [s for s in symbols if s not in active]
+    
+    trading_loop = TradingLoop(max_workers=settings.loop_workers, metrics=metrics)
+    
+    try:
+        asyncio.run(trading_loop.run(
+            create_scheduler(),
+            analyze,
+            execute,
+            select_symbols=select_symbols,
+            before_cycle=update_capital
+        ))
     
     except KeyboardInterrupt:
         logger.info("Live trading stopped by user")
     
     finally:
+        trading_loop.close()
+        close_data_provider(data_provider)
         mt5.disconnect()
+        stop_metrics(metrics, metrics_server)
 
 
 def main():
@@ -306,11 +838,76 @@ def main():
         '--mode', 
         type=str, 
         default=settings.mode,
-        choices=['backtest', 'paper', 'live'],
+        choices=['backtest', 'optimize', 'walk-forward', 'replay', 'paper', 'live', 'clear-cache'],
         help='Trading mode'
     )
-    parser.add_argument('--start', type=str, help='Backtest start date (YYYY-MM-DD)')
-    parser.add_argument('--end', type=str, help='Backtest end date (YYYY-MM-DD)')
+    parser.add_argument('--start', type=str, help='Backtest/replay start date (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, help='Backtest/replay end date (YYYY-MM-DD)')
+    parser.add_argument(
+        '--engine',
+        type=str,
+        default='backtrader',
+        choices=['backtrader', 'vectorized'],
+        help='Backtest engine'
+    )
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Read backtest history as memory-mapped arrays from the bar store'
+    )
+    parser.add_argument(
+        '--portfolio',
+        action='store_true',
+        help='Backtest all symbols together with shared capital and risk limits'
+    )
+    parser.add_argument(
+        '--low-memory',
+        action='store_true',
+        help='Backtrader engine: keep only the bars indicators need (exactbars=1)'
+    )
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Backtrader engine: report the peak memory of each run (tracemalloc, much slower)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always rerun backtests instead of reading cached results'
+    )
+    parser.add_argument('--grid', type=str, help='Optimization grid (JSON string or file)')
+    parser.add_argument(
+        '--timeframes',
+        type=lambda value: [int(tf) for tf in value.split(',')],
+        help='Comma-separated timeframes in minutes to optimize over (e.g. 5,15,30,60)'
+    )
+    parser.add_argument(
+        '--train-days',
+        type=int,
+        default=180,
+        help='Walk-forward in-sample window in days'
+    )
+    parser.add_argument(
+        '--test-days',
+        type=int,
+        default=30,
+        help='Walk-forward out-of-sample window (and step) in days'
+    )
+    parser.add_argument(
+        '--anchored',
+        action='store_true',
+        help='Walk-forward: grow the in-sample window from the start of history'
+    )
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (optimization, walk-forward, per-symbol backtest)')
+    parser.add_argument(
+        '--rank-by',
+        type=str,
+        default='total_return',
+        choices=['total_return', 'sharpe_ratio', 'max_drawdown', 'win_rate'],
+        help='Metric used to rank optimization results'
+    )
+    parser.add_argument('--top', type=int, default=20, help='Optimization rows to print')
+    parser.add_argument('--output', type=str, help='CSV file for optimization/walk-forward results or portfolio backtest/replay trades')
     
     args = parser.parse_args()
     
@@ -321,6 +918,23 @@ def main():
             logger.error("Backtest mode requires --start and --end dates")
             sys.exit(1)
         run_backtest(args)
+    elif args.mode == 'optimize':
+        if not args.start or not args.end:
+            logger.error("Optimize mode requires --start and --end dates")
+            sys.exit(1)
+        run_optimize(args)
+    elif args.mode == 'walk-forward':
+        if not args.start or not args.end:
+            logger.error("Walk-forward mode requires --start and --end dates")
+            sys.exit(1)
+        run_walk_forward(args)
+    elif args.mode == 'replay':
+        if not args.start or not args.end:
+            logger.error("Replay mode requires --start and --end dates")
+            sys.exit(1)
+        run_replay(args)
+    elif args.mode == 'clear-cache':
+        clear_result_cache()
     elif args.mode == 'paper':
         run_paper_trading()
     elif args.mode == 'live':
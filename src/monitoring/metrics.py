@@ -0,0 +1,232 @@
+import time
+import threading
+import numpy as np
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+from typing import ContextManager, Dict, Iterator, Optional, Tuple
+
+
+# Quantili esposti per ogni istogramma
+QUANTILES = (0.5, 0.9, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class LatencyHistogram:
+    # Istogramma a bucket log-lineari in stile HDR: valori in microsecondi,
+    # 2^SUB_BITS bucket lineari per ogni potenza di due, quindi errore
+    # relativo sotto 1/2^(SUB_BITS-1) (~1.6%) su tutto l'intervallo fino a
+    # 2^MAX_BITS µs (~12 giorni). Registrare un valore è O(1) e la memoria
+    # è fissa, indipendentemente dal numero di campioni.
+    SUB_BITS = 7
+    MAX_BITS = 40
+
+    def __init__(self):
+        self.sub_count = 1 << self.SUB_BITS
+        self.half = self.sub_count // 2
+        self.counts = np.zeros(self._index((1 << self.MAX_BITS) - 1) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def _index(self, micros: int) -> int:
+        if micros < self.sub_count:
+            return micros
+        shift = micros.bit_length() - self.SUB_BITS
+        return (shift + 1) * self.half + (micros >> shift) - self.half
+
+    def _upper(self, index: int) -> int:
+        # Valore più alto rappresentato dal bucket
+        if index < self.sub_count:
+            return index
+        shift = (index - self.sub_count) // self.half + 1
+        sub = (index - self.sub_count) % self.half + self.half
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        micros = min(max(int(seconds * 1e6), 0), (1 << self.MAX_BITS) - 1)
+        with self.lock:
+            self.counts[self._index(micros)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        # In secondi; 0 senza campioni
+        with self.lock:
+            if self.count == 0:
+                return 0.0
+            rank = max(1, int(np.ceil(q * self.count)))
+            index = int(np.searchsorted(np.cumsum(self.counts), rank))
+            return min(self._upper(index) / 1e6, self.max)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            **{f'p{round(q * 100)}': self.quantile(q) for q in QUANTILES},
+        }
+
+
+class MetricsRegistry:
+    # Istogrammi di latenza, contatori e gauge etichettati, esportati nel
+    # formato testuale di Prometheus (gli istogrammi come summary, più
+    # <nome>_max). Thread-safe: il loop di trading registra dai worker.
+    def __init__(self, prefix: str = 'forex_bot'):
+        self.prefix = prefix
+        self.histograms: Dict[str, Dict[Labels, LatencyHistogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.help: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def histogram(self, name: str, **labels) -> LatencyHistogram:
+        key = self._labels(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = LatencyHistogram()
+            return series[key]
+
+    def observe(self, name: str, seconds: float, **labels):
+        self.histogram(name, **labels).record(seconds)
+
+    @contextmanager
+    def time(self, name: str, **labels) -> Iterator[None]:
+        # Registra la durata del blocco, anche se solleva un'eccezione
+        histogram = self.histogram(name, **labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.record(time.perf_counter() - started)
+
+    def increment(self, name: str, value: float = 1.0, **labels):
+        key = self._labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._labels(labels)] = value
+
+    @staticmethod
+    def _format_labels(labels: Labels, **extra) -> str:
+        pairs = list(labels) + [(name, str(value)) for name, value in extra.items()]
+        if not pairs:
+            return ''
+        escaped = (
+            name + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for name, value in pairs
+        )
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self) -> str:
+        with self.lock:
+            histograms = {name: dict(series) for name, series in self.histograms.items()}
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            gauges = {name: dict(series) for name, series in self.gauges.items()}
+
+        lines = []
+
+        def header(name: str, kind: str):
+            full = f'{self.prefix}_{name}'
+            if name in self.help:
+                lines.append(f'# HELP {full} {self.help[name]}')
+            lines.append(f'# TYPE {full} {kind}')
+            return full
+
+        for name, series in sorted(histograms.items()):
+            full = header(name, 'summary')
+            for labels, histogram in sorted(series.items()):
+                snapshot = histogram.snapshot()
+                for q in QUANTILES:
+                    value = snapshot[f'p{round(q * 100)}']
+                    lines.append(f'{full}{self._format_labels(labels, quantile=q)} {value:.6f}')
+                lines.append(f'{full}_sum{self._format_labels(labels)} {snapshot["sum"]:.6f}')
+                lines.append(f'{full}_count{self._format_labels(labels)} {snapshot["count"]}')
+            lines.append(f'# TYPE {full}_max gauge')
+            for labels, histogram in sorted(series.items()):
+                lines.append(f'{full}_max{self._format_labels(labels)} {histogram.max:.6f}')
+
+        for name, series in sorted(counters.items()):
+            full = header(name, 'counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f'{full}{self._format_labels(labels)} {value:g}')
+
+        for name, series in sorted(gauges.items()):
+            full = header(name, 'gauge')
+            for labels, value in sorted(series.items()):
+                lines.append(f'{full}{self._format_labels(labels)} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        # p50/p99/max per serie, per il log di fine sessione
+        with self.lock:
+            histograms = {name: dict(series) for name, series in self.histograms.items()}
+        return {
+            f'{name}{self._format_labels(labels)}': histogram.snapshot()
+            for name, series in sorted(histograms.items())
+            for labels, histogram in sorted(series.items())
+        }
+
+
+def timed(metrics: Optional[MetricsRegistry], name: str, **labels) -> ContextManager:
+    # metrics.time(...) quando le metriche sono attive, altrimenti nulla
+    return metrics.time(name, **labels) if metrics is not None else nullcontext()
+
+
+class MetricsServer:
+    # Endpoint HTTP locale per Prometheus (GET /metrics) in un thread daemon
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> int:
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Niente log di accesso per ogni scrape
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        # Con port=0 il sistema assegna una porta libera
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+        self.thread.start()
+        logger.info(f"Metrics endpoint on http://{self.host}:{self.port}/metrics")
+        return self.port
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -1,7 +1,14 @@
+import numpy as np
 import pandas as pd
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from loguru import logger
-from src.strategy.indicators import add_all_indicators
+from src.strategy.indicators import (
+    add_all_indicators,
+    calculate_panel_indicators,
+    previous_valid,
+    IndicatorEngine,
+)
+from src.strategy.indicator_cache import IndicatorCache
 
 
 class EMAVWAPStrategy:
@@ -11,20 +18,32 @@ class EMAVWAPStrategy:
         ema_slow: int = 21,
         atr_period: int = 14,
         atr_sl_multiplier: float = 2.0,
-        atr_tp_multiplier: float = 3.0
+        atr_tp_multiplier: float = 3.0,
+        indicator_cache: Optional[IndicatorCache] = None
     ):
         self.ema_fast = ema_fast
         self.ema_slow = ema_slow
         self.atr_period = atr_period
         self.atr_sl_multiplier = atr_sl_multiplier
         self.atr_tp_multiplier = atr_tp_multiplier
+        self.indicator_engine = IndicatorEngine(ema_fast, ema_slow, atr_period)
+        # Serie di indicatori già calcolate, condivisa tra strategie
+        self.indicator_cache = indicator_cache
     
-    def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
+    def generate_signals(
+        self,
+        df: pd.DataFrame,
+        symbol: Optional[str] = None,
+        timeframe: Optional[int] = None
+    ) -> pd.DataFrame:
         df = add_all_indicators(
             df, 
             self.ema_fast, 
             self.ema_slow, 
-            self.atr_period
+            self.atr_period,
+            self.indicator_cache,
+            symbol,
+            timeframe
         )
         
         # Segnali di entrata
@@ -51,6 +70,32 @@ class EMAVWAPStrategy:
         
         return df
     
+    def generate_panel_signals(self, panel: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        # Come generate_signals per tutti i simboli insieme: panel ha le
+        # matrici OHLCV (barre x simboli) di align_panel, il risultato gli
+        # indicatori e i segnali con la stessa forma
+        signals = dict(panel)
+        signals.update(calculate_panel_indicators(
+            panel['High'],
+            panel['Low'],
+            panel['Close'],
+            panel['Volume'],
+            self.ema_fast,
+            self.ema_slow,
+            self.atr_period
+        ))
+        
+        close = signals['Close']
+        signals['Long_Signal'] = (signals['EMA_Fast'] > signals['EMA_Slow']) & (close > signals['VWAP'])
+        signals['Short_Signal'] = (signals['EMA_Fast'] < signals['EMA_Slow']) & (close < signals['VWAP'])
+        
+        # Crossover rispetto alla barra precedente dello stesso simbolo
+        valid = ~np.isnan(close)
+        signals['Long_Entry'] = signals['Long_Signal'] & ~previous_valid(signals['Long_Signal'], valid)
+        signals['Short_Entry'] = signals['Short_Signal'] & ~previous_valid(signals['Short_Signal'], valid)
+        
+        return signals
+    
     def calculate_stops(
         self, 
         entry_price: float, 
@@ -66,14 +111,40 @@ class EMAVWAPStrategy:
         
         return round(sl, 5), round(tp, 5)
     
-    def get_current_signal(self, df: pd.DataFrame) -> Optional[dict]:
+    @staticmethod
+    def _is_long(row) -> bool:
+        return bool(row['EMA_Fast'] > row['EMA_Slow'] and row['Close'] > row['VWAP'])
+    
+    @staticmethod
+    def _is_short(row) -> bool:
+        return bool(row['EMA_Fast'] < row['EMA_Slow'] and row['Close'] < row['VWAP'])
+    
+    def get_current_signal(
+        self, 
+        df: pd.DataFrame, 
+        symbol: Optional[str] = None
+    ) -> Optional[dict]:
         if len(df) < max(self.ema_slow, self.atr_period) + 1:
             return None
         
-        df = self.generate_signals(df)
-        last_row = df.iloc[-1]
+        if symbol is None:
+            df = self.generate_signals(df)
+            last_row = df.iloc[-1]
+            long_entry = last_row['Long_Entry']
+            short_entry = last_row['Short_Entry']
+        else:
+            # Aggiornamento incrementale: calcola solo le barre nuove
+            state = self.indicator_engine.update(symbol, df)
+            last_row = state.current()
+            prev_row = state.previous()
+            long_entry = self._is_long(last_row) and not (
+                prev_row is not None and self._is_long(prev_row)
+            )
+            short_entry = self._is_short(last_row) and not (
+                prev_row is not None and self._is_short(prev_row)
+            )
         
-        if last_row['Long_Entry']:
+        if long_entry:
             sl, tp = self.calculate_stops(
                 last_row['Close'], 
                 last_row['ATR'], 
@@ -87,7 +158,7 @@ class EMAVWAPStrategy:
                 'atr': last_row['ATR']
             }
         
-        if last_row['Short_Entry']:
+        if short_entry:
             sl, tp = self.calculate_stops(
                 last_row['Close'], 
                 last_row['ATR'], 
@@ -0,0 +1,281 @@
+import os
+import sys
+import pickle
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from loguru import logger
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from src.data.mmap_bars import column_values, time_values
+from src.strategy import indicators
+from src.strategy.indicators import calculate_atr, calculate_ema, calculate_true_range
+
+
+def _source_hash() -> str:
+    # Le serie salvate valgono solo per lo stesso codice degli indicatori
+    digest = hashlib.sha256()
+    for module in (indicators, sys.modules[__name__]):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+class _Entry:
+    # Serie calcolata per un simbolo/timeframe sulle barre times, con lo
+    # stato necessario a estenderla con barre nuove
+    def __init__(self, times: np.ndarray, values: np.ndarray, tail: tuple, state: tuple):
+        self.times = times
+        self.values = values
+        # Input dell'ultima barra: se cambia (barra ancora in formazione
+        # aggiornata) la serie non è estendibile
+        self.tail = tail
+        self.state = state
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes + sum(np.asarray(value).nbytes for value in self.state)
+
+
+class IndicatorCache:
+    # Memoization di calculate_ema, calculate_vwap e calculate_atr, una
+    # serie per simbolo, timeframe, indicatore e periodo. Le barre richieste
+    # vengono allineate ai timestamp in cache: se la finestra è iniziata più
+    # tardi (storico scorrevole) la testa viene ribasata sul nuovo inizio
+    # (EMA e VWAP partono dalla prima barra della finestra, l'ATR ricalcola
+    # solo le prime period barre), se ha barre nuove in coda la serie viene
+    # estesa invece di ricalcolata. La voce viene poi sostituita dalla
+    # finestra appena servita. LRU limitata a max_size_mb; save/load la
+    # conservano tra un'esecuzione e l'altra. Senza simbolo l'identità della
+    # serie non è nota e il calcolo avviene sempre da capo.
+    def __init__(self, max_size_mb: float = 64.0):
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.entries: 'OrderedDict[tuple, _Entry]' = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.evictions = 0
+
+    def ema(
+        self,
+        data: pd.Series,
+        period: int,
+        symbol: Optional[str] = None,
+        timeframe: Optional[Hashable] = None
+    ) -> pd.Series:
+        if symbol is None:
+            return calculate_ema(data, period)
+
+        values = data.to_numpy(dtype=np.float64)
+        times = data.index.asi8
+
+        def rebase(entry: _Entry, offset: int):
+            # ewm(adjust=False) è lineare nel valore iniziale: partendo da
+            # values[0] invece che dall'EMA in cache la differenza decade
+            # di (1 - alpha) a ogni barra
+            cached = entry.values[offset:]
+            decay = (1 - 2 / (period + 1)) ** np.arange(len(cached))
+            return cached + decay * (values[0] - cached[0]), ()
+
+        def compute(start: int, base: Optional[tuple]):
+            if base is None:
+                result = calculate_ema(data, period).to_numpy()
+            else:
+                # Stessa ricorsione di ewm(adjust=False) ripartendo
+                # dall'ultimo valore: il primo punto è il valore già noto
+                seeded = pd.Series(np.concatenate((base[0][-1:], values[start:])))
+                result = seeded.ewm(span=period, adjust=False).mean().to_numpy()[1:]
+            return result, ()
+
+        result = self._lookup(('ema', period), symbol, timeframe, times, lambda i: (values[i],), rebase, compute)
+        return pd.Series(result, index=data.index, name=data.name)
+
+    def vwap(
+        self,
+        df,
+        symbol: Optional[str] = None,
+        timeframe: Optional[Hashable] = None
+    ) -> pd.Series:
+        times = time_values(df)
+        high, low, close, volume = (
+            np.asarray(column_values(df, name), dtype=np.float64)
+            for name in ('High', 'Low', 'Close', 'Volume')
+        )
+
+        def ratio(cum_pv: np.ndarray, cum_volume: np.ndarray) -> np.ndarray:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return cum_pv / cum_volume
+
+        def rebase(entry: _Entry, offset: int):
+            # Somme cumulate dalla nuova prima barra: si tolgono i totali
+            # delle barre uscite dalla finestra
+            cum_pv, cum_volume = (cum[offset:] - cum[offset - 1] for cum in entry.state)
+            return ratio(cum_pv, cum_volume), (cum_pv, cum_volume)
+
+        def compute(start: int, base: Optional[tuple]):
+            # Somme cumulate di prezzo tipico x volume e volume, proseguite
+            # dai totali in cache
+            pv = (high[start:] + low[start:] + close[start:]) / 3 * volume[start:]
+            if base is None:
+                cum_pv = np.cumsum(pv)
+                cum_volume = np.cumsum(volume)
+                return ratio(cum_pv, cum_volume), (cum_pv, cum_volume)
+            # Totali in testa: stesse somme, nello stesso ordine, del
+            # cumsum sull'intera serie
+            base_pv, base_volume = base[1]
+            cum_pv = np.cumsum(np.concatenate((base_pv[-1:], pv)))[1:]
+            cum_volume = np.cumsum(np.concatenate((base_volume[-1:], volume[start:])))[1:]
+            state = (np.concatenate((base_pv, cum_pv)), np.concatenate((base_volume, cum_volume)))
+            return ratio(cum_pv, cum_volume), state
+
+        if symbol is None:
+            result, _ = compute(0, None)
+        else:
+            row = lambda i: (high[i], low[i], close[i], volume[i])
+            result = self._lookup(('vwap',), symbol, timeframe, times, row, rebase, compute)
+        return pd.Series(result, index=df.index)
+
+    def atr(
+        self,
+        df,
+        period: int = 14,
+        symbol: Optional[str] = None,
+        timeframe: Optional[Hashable] = None
+    ) -> pd.Series:
+        if symbol is None:
+            return calculate_atr(df, period)
+
+        times = time_values(df)
+
+        def window(first: int, last: Optional[int] = None):
+            return df.iloc[first:last] if isinstance(df, pd.DataFrame) else df[first:last]
+
+        def rebase(entry: _Entry, offset: int):
+            # Dalla barra period in poi la media non include la prima barra
+            # della finestra (senza chiusura precedente): resta quella in cache
+            result = entry.values[offset:].copy()
+            head = min(period, len(result))
+            result[:head] = calculate_atr(window(0, head), period).to_numpy()
+            return result, ()
+
+        def compute(start: int, base: Optional[tuple]):
+            if base is None:
+                return calculate_atr(df, period).to_numpy(), ()
+            # Media mobile sulle sole barre nuove più le period precedenti
+            # (una in più per la chiusura precedente del true range)
+            first = max(0, start - period)
+            tr = calculate_true_range(window(first))
+            return tr.rolling(window=period).mean().to_numpy()[start - first:], ()
+
+        high, low, close = (column_values(df, name) for name in ('High', 'Low', 'Close'))
+        row = lambda i: (high[i], low[i], close[i])
+        result = self._lookup(('atr', period), symbol, timeframe, times, row, rebase, compute)
+        return pd.Series(result, index=df.index)
+
+    def _lookup(
+        self,
+        indicator: tuple,
+        symbol: str,
+        timeframe: Optional[Hashable],
+        times: np.ndarray,
+        row: Callable[[int], tuple],
+        rebase: Callable[[_Entry, int], Tuple[np.ndarray, tuple]],
+        compute: Callable[[int, Optional[tuple]], Tuple[np.ndarray, tuple]]
+    ) -> np.ndarray:
+        # rebase(entry, offset): valori e stato della serie in cache dalla
+        # barra offset, come se la serie iniziasse lì. compute(start, base):
+        # valori dalla barra start in poi, proseguendo base (valori, stato)
+        # se presente, e stato della serie completa
+        n = len(times)
+        if n == 0:
+            return compute(0, None)[0]
+
+        key = (symbol, timeframe, *indicator)
+        entry = self.entries.get(key)
+        if entry is not None:
+            offset = int(np.searchsorted(entry.times, times[0]))
+            cached = len(entry.times) - offset
+            # Stesse barre nella parte comune e ultima barra in cache invariata
+            if (
+                0 < cached <= n
+                and np.array_equal(entry.times[offset:], times[:cached])
+                and row(cached - 1) == entry.tail
+            ):
+                if offset == 0:
+                    base = (entry.values, entry.state)
+                else:
+                    base = rebase(entry, offset)
+                if cached == n:
+                    self.hits += 1
+                    return self._store(key, times, base[0], entry.tail, base[1])
+                # Solo barre nuove in coda: estende la serie
+                extension, state = compute(cached, base)
+                self.extensions += 1
+                return self._store(key, times, np.concatenate((base[0], extension)), row(n - 1), state)
+
+        self.misses += 1
+        values, state = compute(0, None)
+        return self._store(key, times, values, row(n - 1), state)
+
+    def _store(self, key: tuple, times: np.ndarray, values: np.ndarray, tail: tuple, state: tuple) -> np.ndarray:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+
+        if entry is None or entry.values is not values:
+            entry = _Entry(np.array(times, dtype=np.int64), values, tail, state)
+        self.entries[key] = entry
+        self.bytes += entry.nbytes
+
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+        return values.copy()
+
+    def save(self, path: str):
+        # Scrittura atomica, come ResultCache.put
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            pickle.dump(
+                {'source': _source_hash(), 'entries': list(self.entries.items())},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> int:
+        # Serie salvate da save(); ignorate se il codice degli indicatori è
+        # cambiato. Restituisce le serie caricate
+        try:
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return 0
+        if saved.get('source') != _source_hash():
+            logger.info(f"Indicator cache {path} was built by other indicator code, ignoring it")
+            return 0
+
+        for key, entry in saved['entries']:
+            self._store(key, entry.times, entry.values, entry.tail, entry.state)
+        return len(saved['entries'])
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def get_statistics(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.extensions
+        return {
+            'entries': len(self.entries),
+            'size_mb': self.bytes / 1024 / 1024,
+            'hits': self.hits,
+            'misses': self.misses,
+            'extensions': self.extensions,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.extensions) / lookups * 100 if lookups else 0.0,
+        }
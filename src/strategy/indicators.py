@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from typing import Tuple
+from collections import deque
+from typing import Tuple, Dict, List, Optional, Sequence
+from src.data.mmap_bars import column_values, time_values
 
 
 def calculate_ema(data: pd.Series, period: int) -> pd.Series:
@@ -12,30 +14,395 @@ def calculate_vwap(df: pd.DataFrame) -> pd.Series:
     return (typical_price * df['Volume']).cumsum() / df['Volume'].cumsum()
 
 
-def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+def calculate_true_range(df: pd.DataFrame) -> pd.Series:
     high = df['High']
     low = df['Low']
     close = df['Close']
-    
+
     tr1 = high - low
     tr2 = abs(high - close.shift())
     tr3 = abs(low - close.shift())
-    
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+
+    # fmax ignora i NaN come max(axis=1), senza il costo di pd.concat
+    return np.fmax(tr1, np.fmax(tr2, tr3))
+
+
+def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    tr = calculate_true_range(df)
     atr = tr.rolling(window=period).mean()
-    
+
     return atr
 
 
 def add_all_indicators(
-    df: pd.DataFrame, 
-    ema_fast: int = 9, 
-    ema_slow: int = 21, 
-    atr_period: int = 14
+    df: pd.DataFrame,
+    ema_fast: int = 9,
+    ema_slow: int = 21,
+    atr_period: int = 14,
+    cache=None,
+    symbol: Optional[str] = None,
+    timeframe=None
 ) -> pd.DataFrame:
-    df = df.copy()
-    df['EMA_Fast'] = calculate_ema(df['Close'], ema_fast)
-    df['EMA_Slow'] = calculate_ema(df['Close'], ema_slow)
-    df['VWAP'] = calculate_vwap(df)
-    df['ATR'] = calculate_atr(df, atr_period)
-    return df
\ No newline at end of file
+    # Accetta anche MmapBars: to_frame() non copia i prezzi.
+    # cache: IndicatorCache opzionale (src.strategy.indicator_cache), usata
+    # quando symbol identifica la serie
+    df = df.copy() if isinstance(df, pd.DataFrame) else df.to_frame()
+    if cache is None or symbol is None:
+        df['EMA_Fast'] = calculate_ema(df['Close'], ema_fast)
+        df['EMA_Slow'] = calculate_ema(df['Close'], ema_slow)
+        df['VWAP'] = calculate_vwap(df)
+        df['ATR'] = calculate_atr(df, atr_period)
+    else:
+        df['EMA_Fast'] = cache.ema(df['Close'], ema_fast, symbol, timeframe)
+        df['EMA_Slow'] = cache.ema(df['Close'], ema_slow, symbol, timeframe)
+        df['VWAP'] = cache.vwap(df, symbol, timeframe)
+        df['ATR'] = cache.atr(df, atr_period, symbol, timeframe)
+    return df
+
+
+# Pannello multi-simbolo: array 2-D (barre x simboli) allineati sugli stessi
+# timestamp, NaN dove un simbolo non ha la barra. Ogni indicatore è una sola
+# operazione vettoriale su tutte le colonne invece di un passaggio pandas
+# per simbolo.
+
+def align_panel(
+    data: Dict[str, pd.DataFrame],
+    columns: Sequence[str] = ('Open', 'High', 'Low', 'Close', 'Volume')
+) -> Tuple[pd.DatetimeIndex, List[str], Dict[str, np.ndarray]]:
+    # Unione dei timestamp dei simboli e una matrice per colonna OHLCV.
+    # Accetta anche MmapBars
+    symbols = list(data)
+    times = [time_values(data[symbol]) for symbol in symbols]
+    union = np.unique(np.concatenate(times)) if times else np.empty(0, dtype=np.int64)
+
+    panel = {name: np.full((len(union), len(symbols)), np.nan) for name in columns}
+    for j, (symbol, symbol_times) in enumerate(zip(symbols, times)):
+        rows = np.searchsorted(union, symbol_times)
+        for name in columns:
+            panel[name][rows, j] = column_values(data[symbol], name)
+
+    tz = getattr(data[symbols[0]].index, 'tz', None) if symbols else None
+    index = pd.to_datetime(union, utc=tz is not None)
+    if tz is not None:
+        index = index.tz_convert(tz)
+    return index, symbols, panel
+
+
+def _compact_order(valid: np.ndarray) -> Optional[np.ndarray]:
+    # Permutazione per colonna che porta in testa le barre presenti (in
+    # ordine): sulle colonne compattate gli indicatori vedono solo le barre
+    # del simbolo, come add_all_indicators. None se non mancano barre
+    if valid.all():
+        return None
+    return np.argsort(~valid, axis=0, kind='stable')
+
+
+def _compact(values: np.ndarray, order: Optional[np.ndarray]) -> np.ndarray:
+    return values if order is None else np.take_along_axis(values, order, axis=0)
+
+
+def _expand(values: np.ndarray, order: Optional[np.ndarray], valid: np.ndarray) -> np.ndarray:
+    if order is None:
+        return values
+    out = np.empty_like(values)
+    np.put_along_axis(out, order, values, axis=0)
+    out[~valid] = np.nan
+    return out
+
+
+def previous_valid(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    # Valore della barra precedente dello stesso simbolo (shift(1) sulla
+    # serie del simbolo); per le barre mancanti l'ultimo valore noto
+    rows = np.where(valid, np.arange(len(values))[:, None], -1)
+    last = np.maximum.accumulate(rows, axis=0)
+    previous = np.vstack([np.full((1, values.shape[1]), -1), last[:-1]])
+    columns = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    shifted = values[np.maximum(previous, 0), columns]
+    if shifted.dtype.kind == 'f':
+        return np.where(previous >= 0, shifted, np.nan)
+    return np.where(previous >= 0, shifted, 0).astype(values.dtype)
+
+
+def calculate_panel_indicators(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    ema_fast: int = 9,
+    ema_slow: int = 21,
+    atr_period: int = 14
+) -> Dict[str, np.ndarray]:
+    # EMA veloce/lenta, VWAP e ATR di tutti i simboli del pannello, con gli
+    # stessi valori di add_all_indicators sul singolo simbolo
+    valid = ~np.isnan(close)
+    order = _compact_order(valid)
+    high, low, close, volume = (_compact(values, order) for values in (high, low, close, volume))
+
+    closes = pd.DataFrame(close)
+    ema = {
+        period: closes.ewm(span=period, adjust=False).mean().to_numpy()
+        for period in {ema_fast, ema_slow}
+    }
+
+    # VWAP cumulativo: le barre mancanti (in coda dopo la compattazione)
+    # non entrano nelle somme
+    typical = (high + low + close) / 3
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.cumsum(typical * volume, axis=0) / np.cumsum(volume, axis=0)
+
+    previous_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    tr = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    atr = pd.DataFrame(tr).rolling(window=atr_period).mean().to_numpy()
+
+    return {
+        'EMA_Fast': _expand(ema[ema_fast], order, valid),
+        'EMA_Slow': _expand(ema[ema_slow], order, valid),
+        'VWAP': _expand(vwap, order, valid),
+        'ATR': _expand(atr, order, valid),
+    }
+
+
+class StreamingIndicators:
+    # Stato incrementale di EMA, VWAP e ATR per un singolo simbolo:
+    # ogni nuova barra costa O(1), indipendentemente dalla finestra storica.
+    # I tempi sono int64 in ns (vedi time_values), così sync lavora su
+    # array NumPy sia con un DataFrame che con MmapBars.
+    def __init__(
+        self,
+        ema_fast: int = 9,
+        ema_slow: int = 21,
+        atr_period: int = 14
+    ):
+        self.ema_fast = ema_fast
+        self.ema_slow = ema_slow
+        self.atr_period = atr_period
+        self.alpha_fast = 2.0 / (ema_fast + 1)
+        self.alpha_slow = 2.0 / (ema_slow + 1)
+        self.reset()
+
+    def reset(self):
+        self.last_time = None
+        self.last_close = np.nan
+        self.prev_close = np.nan
+        self.ema_fast_value = np.nan
+        self.ema_slow_value = np.nan
+        self.prev_ema_fast = np.nan
+        self.prev_ema_slow = np.nan
+        self.tr_window: deque = deque(maxlen=self.atr_period)
+        self.prev_atr = np.nan
+        # VWAP cumulativo sulla finestra corrente: (time, price*volume, volume)
+        self.vwap_window: deque = deque()
+        self.pv_sum = 0.0
+        self.volume_sum = 0.0
+        # Stato prima dell'ultima barra, per riapplicarla se cambia
+        self.undo: Optional[tuple] = None
+
+    def _atr(self) -> float:
+        if len(self.tr_window) < self.atr_period:
+            return np.nan
+        return sum(self.tr_window) / self.atr_period
+
+    def update(
+        self,
+        time,
+        high: float,
+        low: float,
+        close: float,
+        volume: float
+    ):
+        if np.isnan(self.last_close):
+            tr = high - low
+        else:
+            tr = max(
+                high - low,
+                abs(high - self.last_close),
+                abs(low - self.last_close)
+            )
+
+        self.undo = (
+            self.last_time, self.last_close, self.prev_close,
+            self.ema_fast_value, self.ema_slow_value,
+            self.prev_ema_fast, self.prev_ema_slow, self.prev_atr,
+            self.tr_window[0] if len(self.tr_window) == self.atr_period else None,
+            self.pv_sum, self.volume_sum
+        )
+
+        self.prev_atr = self._atr()
+        self.tr_window.append(tr)
+
+        self.prev_ema_fast = self.ema_fast_value
+        self.prev_ema_slow = self.ema_slow_value
+        if np.isnan(self.ema_fast_value):
+            self.ema_fast_value = close
+            self.ema_slow_value = close
+        else:
+            self.ema_fast_value += self.alpha_fast * (close - self.ema_fast_value)
+            self.ema_slow_value += self.alpha_slow * (close - self.ema_slow_value)
+
+        pv = (high + low + close) / 3 * volume
+        self.vwap_window.append((time, pv, volume))
+        self.pv_sum += pv
+        self.volume_sum += volume
+
+        self.prev_close = self.last_close
+        self.last_close = close
+        self.last_time = time
+
+    def rollback(self):
+        # Annulla l'ultimo update (una sola barra): le somme del VWAP tornano
+        # esattamente ai valori precedenti, senza errori di arrotondamento
+        (
+            self.last_time, self.last_close, self.prev_close,
+            self.ema_fast_value, self.ema_slow_value,
+            self.prev_ema_fast, self.prev_ema_slow, self.prev_atr,
+            evicted, self.pv_sum, self.volume_sum
+        ) = self.undo
+        self.undo = None
+        self.tr_window.pop()
+        if evicted is not None:
+            self.tr_window.appendleft(evicted)
+        self.vwap_window.pop()
+
+    def drop_before(self, time):
+        # Rimuove dal VWAP le barre uscite dalla finestra dei dati
+        while self.vwap_window and self.vwap_window[0][0] < time:
+            _, pv, volume = self.vwap_window.popleft()
+            self.pv_sum -= pv
+            self.volume_sum -= volume
+
+    def seed(self, df: pd.DataFrame):
+        # Calcolo batch fino alla penultima barra, poi l'ultima con update:
+        # così anche dopo un seed l'ultima barra si può riapplicare
+        self.reset()
+        if len(df) > 1:
+            self._seed(df.iloc[:-1] if isinstance(df, pd.DataFrame) else df[:-1])
+        self.update(
+            int(time_values(df)[-1]),
+            float(column_values(df, 'High')[-1]),
+            float(column_values(df, 'Low')[-1]),
+            float(column_values(df, 'Close')[-1]),
+            float(column_values(df, 'Volume')[-1])
+        )
+
+    def _seed(self, df: pd.DataFrame):
+        time = time_values(df)
+
+        close = df['Close']
+        ema_fast = calculate_ema(close, self.ema_fast).to_numpy()
+        ema_slow = calculate_ema(close, self.ema_slow).to_numpy()
+        tr = calculate_true_range(df).to_numpy()
+        pv = ((df['High'] + df['Low'] + close) / 3 * df['Volume']).to_numpy()
+        volume = df['Volume'].to_numpy(dtype=float)
+
+        self.ema_fast_value = ema_fast[-1]
+        self.ema_slow_value = ema_slow[-1]
+        if len(df) > 1:
+            self.prev_ema_fast = ema_fast[-2]
+            self.prev_ema_slow = ema_slow[-2]
+            self.prev_close = close.iloc[-2]
+            self.tr_window.extend(tr[-self.atr_period - 1:-1])
+            self.prev_atr = self._atr()
+        self.tr_window.extend(tr[-self.atr_period:])
+        self.last_close = close.iloc[-1]
+        self.last_time = int(time[-1])
+
+        self.vwap_window.extend(zip(time.tolist(), pv, volume))
+        self.pv_sum = float(pv.sum())
+        self.volume_sum = float(volume.sum())
+
+    def sync(self, df: pd.DataFrame):
+        # Allinea lo stato al DataFrame: aggiunge solo le barre nuove e
+        # scarta quelle uscite dalla finestra. L'ultima barra già vista
+        # viene annullata e riapplicata, perché poteva essere in formazione
+        # o essere stata rivista dal broker. Se i dati non si sovrappongono
+        # allo stato corrente si riparte da zero.
+        time = time_values(df)
+        if (
+            self.last_time is None
+            or time[-1] < self.last_time
+            or time[0] > self.last_time
+        ):
+            self.seed(df)
+            return
+
+        start = int(np.searchsorted(time, self.last_time, side='left'))
+        if start < len(time) and time[start] == self.last_time and self.undo is not None:
+            self.rollback()
+        else:
+            start = int(np.searchsorted(time, self.last_time, side='right'))
+
+        self.drop_before(time[0])
+        if start >= len(time):
+            return
+
+        for bar_time, high, low, close, volume in zip(
+            time[start:].tolist(),
+            column_values(df, 'High')[start:].tolist(),
+            column_values(df, 'Low')[start:].tolist(),
+            column_values(df, 'Close')[start:].tolist(),
+            column_values(df, 'Volume')[start:].astype(float).tolist()
+        ):
+            self.update(bar_time, high, low, close, volume)
+
+    def _vwap(self, pv_sum: float, volume_sum: float) -> float:
+        if volume_sum == 0:
+            return np.nan
+        return pv_sum / volume_sum
+
+    def current(self) -> Dict:
+        return {
+            'Close': self.last_close,
+            'EMA_Fast': self.ema_fast_value,
+            'EMA_Slow': self.ema_slow_value,
+            'VWAP': self._vwap(self.pv_sum, self.volume_sum),
+            'ATR': self._atr()
+        }
+
+    def previous(self) -> Optional[Dict]:
+        if len(self.vwap_window) < 2:
+            return None
+
+        # Il VWAP della barra precedente va ricalcolato sulla finestra
+        # corrente, come farebbe il calcolo batch
+        _, last_pv, last_volume = self.vwap_window[-1]
+        return {
+            'Close': self.prev_close,
+            'EMA_Fast': self.prev_ema_fast,
+            'EMA_Slow': self.prev_ema_slow,
+            'VWAP': self._vwap(self.pv_sum - last_pv, self.volume_sum - last_volume),
+            'ATR': self.prev_atr
+        }
+
+
+class IndicatorEngine:
+    # Mantiene uno StreamingIndicators per simbolo
+    def __init__(
+        self,
+        ema_fast: int = 9,
+        ema_slow: int = 21,
+        atr_period: int = 14
+    ):
+        self.ema_fast = ema_fast
+        self.ema_slow = ema_slow
+        self.atr_period = atr_period
+        self.states: Dict[str, StreamingIndicators] = {}
+
+    def get_state(self, symbol: str) -> StreamingIndicators:
+        if symbol not in self.states:
+            self.states[symbol] = StreamingIndicators(
+                self.ema_fast,
+                self.ema_slow,
+                self.atr_period
+            )
+        return self.states[symbol]
+
+    def update(self, symbol: str, df: pd.DataFrame) -> StreamingIndicators:
+        state = self.get_state(symbol)
+        state.sync(df)
+        return state
+
+    def reset(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self.states.clear()
+        else:
+            self.states.pop(symbol, None)
@@ -0,0 +1,135 @@
+import time
+import numpy as np
+import pandas as pd
+from src.analytics.performance import (
+    PerformanceTracker,
+    annual_sharpe_ratio,
+    max_drawdown,
+    max_drawdown_duration,
+    rolling_max_drawdown,
+    rolling_max_drawdown_duration,
+    rolling_profit_factor,
+    rolling_sharpe,
+    sharpe_ratio,
+    simple_returns,
+    sortino_ratio,
+    summarize,
+    trade_metrics,
+)
+
+
+def make_equity(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 10000.0 * np.cumprod(1 + rng.normal(0.0001, 0.002, n))
+
+
+def naive_drawdown(equity, initial):
+    peak = initial
+    worst = 0.0
+    since_peak = 0
+    longest = 0
+    for value in equity:
+        if value >= peak:
+            peak = value
+            since_peak = 0
+        else:
+            since_peak += 1
+        worst = max(worst, (peak - value) / peak * 100)
+        longest = max(longest, since_peak)
+    return worst, longest
+
+
+def test_metrics_match_naive_implementation():
+    equity = make_equity(5000)
+    worst, longest = naive_drawdown(equity, 10000.0)
+    assert np.isclose(max_drawdown(equity, 10000.0), worst)
+    assert max_drawdown_duration(equity, 10000.0) == longest
+
+    returns = simple_returns(equity, 10000.0)
+    assert np.isclose(sharpe_ratio(returns, 252), returns.mean() / returns.std() * np.sqrt(252))
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+    assert np.isclose(sortino_ratio(returns, 252), returns.mean() / downside * np.sqrt(252))
+
+    profit = np.array([10.0, -5.0, 20.0, -10.0])
+    entry = pd.date_range('2024-01-01', periods=4, freq='h')
+    metrics = trade_metrics(profit, entry, entry + pd.Timedelta(minutes=30))
+    assert metrics['profit_factor'] == 2.0
+    assert metrics['expectancy'] == 3.75
+    assert metrics['average_trade_duration'] == 30.0
+
+
+def test_rolling_metrics_match_loop():
+    equity = make_equity(600, seed=1)
+    returns = simple_returns(equity)
+    window = 50
+
+    sharpe = rolling_sharpe(returns, window, 252)
+    dd = rolling_max_drawdown(equity, window)
+    duration = rolling_max_drawdown_duration(equity, window)
+    assert np.isnan(sharpe[:window - 1]).all()
+    assert np.isnan(dd[:window - 1]).all()
+    for end in range(window, len(equity) + 1, 37):
+        block = equity[end - window:end]
+        worst, longest = naive_drawdown(block, block[0])
+        assert np.isclose(dd[end - 1], worst)
+        assert duration[end - 1] == longest
+        if end <= len(returns):
+            assert np.isclose(sharpe[end - 1], sharpe_ratio(returns[end - window:end], 252))
+
+    profit = np.random.default_rng(2).normal(0, 10, 200)
+    factor = rolling_profit_factor(profit, 20)
+    block = profit[80:100]
+    assert np.isclose(factor[99], block[block > 0].sum() / -block[block < 0].sum())
+
+
+def test_tracker_matches_full_arrays():
+    equity = make_equity(3000, seed=3)
+    times = pd.date_range('2024-01-01', periods=len(equity), freq='5min')
+    profit = np.diff(np.concatenate(([10000.0], equity)))
+
+    tracker = PerformanceTracker(10000.0, periods_per_year=252)
+    # Aggiornamenti misti: punti singoli e blocchi
+    tracker.update(equity[0], times[0])
+    tracker.update(equity[1:1000], times[1:1000])
+    for i in range(1000, 1100):
+        tracker.update(equity[i], times[i])
+    tracker.update(equity[1100:], times[1100:])
+    tracker.add_trades(profit[:10])
+    tracker.add_trades(profit[10:])
+    summary = tracker.summary()
+
+    expected = summarize(equity, None, 10000.0, profit, periods=252)
+    returns = simple_returns(equity, 10000.0)
+    assert np.isclose(summary['max_drawdown'], max_drawdown(equity, 10000.0))
+    assert summary['max_drawdown_duration'] == expected['max_drawdown_duration']
+    assert np.isclose(summary['sharpe_ratio'], sharpe_ratio(returns, 252))
+    assert np.isclose(summary['sortino_ratio'], expected['sortino_ratio'])
+    assert np.isclose(summary['profit_factor'], expected['profit_factor'])
+    assert np.isclose(summary['expectancy'], expected['expectancy'])
+
+
+def test_tracker_annual_sharpe_matches_full_equity():
+    equity = make_equity(1500, seed=5)
+    times = pd.date_range('2021-03-01', periods=len(equity), freq='D')
+
+    tracker = PerformanceTracker(10000.0)
+    tracker.update(equity[:400], times[:400])
+    for i in range(400, 800):
+        tracker.update(equity[i], times[i])
+    tracker.update(equity[800:], times[800:])
+
+    expected = annual_sharpe_ratio(pd.Series(equity, index=times), 10000.0)
+    assert expected is not None
+    assert tracker.summary()['annual_sharpe_ratio'] == expected
+    assert PerformanceTracker(10000.0).summary()['annual_sharpe_ratio'] is None
+
+
+def test_metrics_on_a_million_points_are_fast():
+    equity = make_equity(1_000_000, seed=4)
+    times = pd.date_range('2020-01-01', periods=len(equity), freq='min')
+    started = time.perf_counter()
+    summary = summarize(equity, times, 10000.0)
+    rolling_max_drawdown(equity, 1000)
+    rolling_sharpe(simple_returns(equity), 1000)
+    assert time.perf_counter() - started < 10.0
+    assert summary['max_drawdown_duration'] > 0
@@ -0,0 +1,203 @@
+import tracemalloc
+import pytest
+import pandas as pd
+import numpy as np
+import backtrader as bt
+from backtrader.utils import date2num
+from src.backtest.backtester import Backtester, EMAVWAPBTStrategy
+from src.backtest.numpy_feed import NumpyData, to_bt_datetimes
+from src.data.mmap_bars import MmapBars
+from src.backtest.vectorized import VectorizedBacktester
+from src.strategy.indicators import add_all_indicators
+
+
+STRATEGY_PARAMS = {
+    'ema_fast': 9,
+    'ema_slow': 21,
+    'atr_period': 14,
+    'atr_sl_multiplier': 2.0,
+    'atr_tp_multiplier': 3.0,
+    'risk_percent': 1.0
+}
+
+
+@pytest.fixture
+def trend_data():
+    # Fase piatta seguita da un trend rialzista con true range costante
+    periods = 300
+    dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+    close = np.full(periods, 1.09)
+    close[60:] = 1.09 + 0.0002 * np.arange(1, periods - 59)
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    
+    return pd.DataFrame({
+        'Open': open_,
+        'High': close + 0.0002,
+        'Low': close - 0.0002,
+        'Close': close,
+        'Volume': np.full(periods, 500)
+    }, index=dates)
+
+
+@pytest.fixture
+def random_data():
+    periods = 2000
+    dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+    rng = np.random.default_rng(1)
+    close = 1.09 + np.cumsum(rng.normal(0, 0.0004, periods))
+    open_ = np.concatenate(([1.09], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0002, periods))
+    
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, periods)
+    }, index=dates)
+
+
+@pytest.mark.parametrize('fixture', ['trend_data', 'random_data'])
+def test_vectorized_matches_backtrader(fixture, request):
+    # Stessi indicatori e SL/TP in OCO: stessi trade anche su dati casuali
+    data = request.getfixturevalue(fixture)
+    expected = Backtester().run(data, STRATEGY_PARAMS)
+    results = VectorizedBacktester().run(data, STRATEGY_PARAMS)
+    
+    assert results['total_trades'] > 0
+    assert results['total_trades'] == expected['total_trades']
+    assert results['won_trades'] == expected['won_trades']
+    assert results['lost_trades'] == expected['lost_trades']
+    assert results['final_value'] == pytest.approx(expected['final_value'], abs=1e-6)
+    assert results['max_drawdown'] == pytest.approx(expected['max_drawdown'], abs=1e-6)
+    assert results['sharpe_ratio'] == expected['sharpe_ratio']
+    assert results['profit_factor'] == pytest.approx(expected['profit_factor'])
+    # Stessi istanti di ingresso e uscita
+    assert results['average_trade_duration'] == pytest.approx(expected['average_trade_duration'])
+
+
+class RecordingStrategy(EMAVWAPBTStrategy):
+    # Indicatori a ogni barra e ordini eseguiti
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.completed = 0
+    
+    def next(self):
+        self.rows.append((self.ema_fast[0], self.ema_slow[0], self.vwap[0], self.atr[0]))
+        super().next()
+    
+    def notify_order(self, order):
+        super().notify_order(order)
+        if order.status == order.Completed:
+            self.completed += 1
+
+
+def test_backtrader_follows_strategy_definitions(random_data):
+    # Riferimento indipendente dai motori: gli indicatori della strategia
+    # live (src.strategy.indicators) e un solo livello eseguito per trade
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=random_data))
+    cerebro.addstrategy(RecordingStrategy, **STRATEGY_PARAMS)
+    cerebro.broker.setcash(10000.0)
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+    strat = cerebro.run()[0]
+    
+    expected = add_all_indicators(random_data)[['EMA_Fast', 'EMA_Slow', 'VWAP', 'ATR']].to_numpy()
+    recorded = np.array(strat.rows)
+    # next() parte dalla prima barra con tutti gli indicatori pronti
+    np.testing.assert_allclose(recorded, expected[-len(recorded):], rtol=1e-9)
+    
+    # Ingresso più SL o TP: l'altro livello non viene mai eseguito
+    closed = strat.analyzers.trades.get_analysis().total.closed
+    assert closed > 0
+    assert strat.completed == 2 * closed + (1 if strat.position else 0)
+
+
+def test_vectorized_results(random_data):
+    backtester = VectorizedBacktester(initial_capital=10000.0)
+    results = backtester.run(random_data, STRATEGY_PARAMS)
+    
+    for key in ['initial_value', 'final_value', 'total_return', 'sharpe_ratio',
+                'max_drawdown', 'total_trades', 'won_trades', 'lost_trades', 'win_rate']:
+        assert key in results
+    
+    assert results['total_trades'] > 0
+    assert results['total_trades'] == len(backtester.trades)
+    assert results['won_trades'] + results['lost_trades'] == results['total_trades']
+    assert len(backtester.equity_curve) == len(random_data)
+    
+    # Il capitale finale è la somma dei trade chiusi
+    assert results['final_value'] == pytest.approx(
+        10000.0 + backtester.trades['pnlcomm'].sum()
+    )
+    
+    # Nessun trade si sovrappone al successivo
+    entries = backtester.trades['entry_time'].to_numpy()
+    exits = backtester.trades['exit_time'].to_numpy()
+    assert (entries[1:] > exits[:-1]).all()
+
+
+def test_vectorized_stop_first():
+    dates = pd.date_range(start='2024-01-01', periods=40, freq='5min')
+    close = 1.09 + 0.0001 * np.arange(40)
+    data = pd.DataFrame({
+        'Open': close,
+        'High': close + 0.0001,
+        'Low': close - 0.0001,
+        'Close': close,
+        'Volume': np.full(40, 500)
+    }, index=dates)
+    
+    # Barra che tocca sia SL che TP: vince lo stop
+    data.iloc[30:, data.columns.get_loc('High')] = 2.0
+    data.iloc[30:, data.columns.get_loc('Low')] = 0.5
+    
+    backtester = VectorizedBacktester()
+    backtester.run(data, STRATEGY_PARAMS)
+    
+    last_trade = backtester.trades.iloc[-1]
+    assert last_trade['exit_time'] == dates[30]
+    assert last_trade['status'] == 'stop_loss'
+
+
+def run_pandas_feed(data):
+    # Percorso precedente con PandasData, come riferimento
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=data, openinterest=-1))
+    cerebro.addstrategy(EMAVWAPBTStrategy, **STRATEGY_PARAMS)
+    cerebro.broker.setcash(10000.0)
+    cerebro.broker.setcommission(commission=0.0001)
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+    strat = cerebro.run()[0]
+    return cerebro.broker.getvalue(), strat.analyzers.trades.get_analysis().total.closed
+
+
+def test_numpy_feed_matches_pandas_feed(random_data):
+    final_value, closed = run_pandas_feed(random_data)
+    backtester = Backtester()
+    results = backtester.run(random_data, STRATEGY_PARAMS)
+    
+    assert results['final_value'] == pytest.approx(final_value, abs=1e-9)
+    assert results['total_trades'] == closed
+    assert backtester.stats['bars'] == len(random_data)
+    assert backtester.stats['bars_per_sec'] > 0
+
+
+def test_numpy_feed_datetimes(random_data):
+    expected = [date2num(dt) for dt in random_data.index.to_pydatetime()]
+    
+    assert to_bt_datetimes(random_data.index).tolist() == expected
+
+
+def test_low_memory_and_mmap_match(random_data, tmp_path):
+    expected = Backtester().run(random_data, STRATEGY_PARAMS)
+    traced = Backtester(low_memory=True, trace_memory=True)
+    low_memory = traced.run(random_data, STRATEGY_PARAMS)
+    mmap = Backtester().run(MmapBars.write(tmp_path / "bars", random_data), STRATEGY_PARAMS)
+    
+    assert low_memory == expected
+    assert mmap == expected
+    # Picco del singolo run, misurato solo se richiesto
+    assert traced.stats['peak_memory_mb'] > 0
+    assert not tracemalloc.is_tracing()
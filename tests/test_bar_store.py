@@ -0,0 +1,125 @@
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from src.data.bar_store import BarStore
+
+
+class FakeTerminal:
+    def __init__(self, periods=2000):
+        dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+        close = 1.09 + np.cumsum(np.random.default_rng(3).normal(0, 0.0004, periods))
+        self.bars = pd.DataFrame({
+            'Open': close,
+            'High': close + 0.0002,
+            'Low': close - 0.0002,
+            'Close': close,
+            'Volume': np.arange(periods)
+        }, index=dates)
+        self.calls = []
+    
+    def fetch(self, start, end):
+        self.calls.append((start, end))
+        return self.bars.loc[start:end]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(str(tmp_path / "bars"))
+
+
+def test_sync_and_load(store):
+    terminal = FakeTerminal()
+    start, end = datetime(2024, 1, 2), datetime(2024, 1, 4)
+    
+    downloaded = store.sync("EURUSD", 5, start, end, terminal.fetch)
+    df = store.load("EURUSD", 5, start, end)
+    
+    assert downloaded == len(terminal.bars.loc[start:end])
+    pd.testing.assert_frame_equal(df, terminal.bars.loc[start:end], check_names=False, check_freq=False)
+
+
+def test_repeated_sync_does_not_fetch(store):
+    terminal = FakeTerminal()
+    start, end = datetime(2024, 1, 2), datetime(2024, 1, 4)
+    
+    store.sync("EURUSD", 5, start, end, terminal.fetch)
+    store.sync("EURUSD", 5, start, end, terminal.fetch)
+    store.sync("EURUSD", 5, datetime(2024, 1, 3), end, terminal.fetch)
+    
+    assert len(terminal.calls) == 1
+    
+    # Una nuova istanza rilegge la copertura da disco
+    other = BarStore(str(store.root))
+    other.sync("EURUSD", 5, start, end, terminal.fetch)
+    assert len(terminal.calls) == 1
+
+
+def test_sync_fetches_only_missing_ranges(store):
+    terminal = FakeTerminal()
+    
+    store.sync("EURUSD", 5, datetime(2024, 1, 3), datetime(2024, 1, 4), terminal.fetch)
+    store.sync("EURUSD", 5, datetime(2024, 1, 2), datetime(2024, 1, 5), terminal.fetch)
+    
+    # Testa mancante, poi coda dall'ultima barra salvata
+    assert terminal.calls[1] == (datetime(2024, 1, 2), datetime(2024, 1, 3))
+    assert terminal.calls[2] == (datetime(2024, 1, 4), datetime(2024, 1, 5))
+    
+    df = store.load("EURUSD", 5, datetime(2024, 1, 2), datetime(2024, 1, 5))
+    expected = terminal.bars.loc[datetime(2024, 1, 2):datetime(2024, 1, 5)]
+    pd.testing.assert_frame_equal(df, expected, check_names=False, check_freq=False)
+
+
+def test_append_overwrites_last_bar(store):
+    terminal = FakeTerminal(periods=10)
+    store.append("EURUSD", 5, terminal.bars.iloc[:5])
+    
+    # L'ultima barra era ancora in formazione: la nuova versione vince
+    update = terminal.bars.iloc[4:].copy()
+    update.iloc[0, update.columns.get_loc('Close')] = 2.0
+    store.append("EURUSD", 5, update)
+    
+    df = store.load("EURUSD", 5)
+    assert len(df) == 10
+    assert df['Close'].iloc[4] == 2.0
+    assert store.last_timestamp("EURUSD", 5) == terminal.bars.index[-1]
+
+
+def test_compaction_keeps_data(tmp_path):
+    store = BarStore(str(tmp_path / "bars"), max_parts=4)
+    terminal = FakeTerminal(periods=50)
+    
+    for i in range(0, 50, 5):
+        store.append("EURUSD", 5, terminal.bars.iloc[i:i + 6])
+    
+    assert len(list(store._series_path("EURUSD", 5).glob("part-*.parquet"))) <= 4
+    
+    store.compact("EURUSD", 5)
+    assert len(list(store._series_path("EURUSD", 5).glob("part-*.parquet"))) == 1
+    pd.testing.assert_frame_equal(
+        store.load("EURUSD", 5), terminal.bars, check_names=False, check_freq=False
+    )
+
+
+def test_failed_fetch_does_not_mark_coverage(store):
+    store.sync("EURUSD", 5, datetime(2024, 1, 2), datetime(2024, 1, 4), lambda s, e: None)
+    
+    assert store.coverage("EURUSD", 5) is None
+    assert store.load("EURUSD", 5) is None
+
+
+def test_live_sync_refetches_only_the_last_bar(tmp_path):
+    # Server del broker a UTC+2, host in UTC
+    terminal = FakeTerminal()
+    now = {'broker': pd.Timestamp('2024-01-05 12:00')}
+    clock = lambda: (now['broker'] - pd.Timedelta(hours=2)).timestamp()
+    store = BarStore(str(tmp_path / "bars"), utc_offset_hours=2, clock=clock)
+    
+    start = datetime(2024, 1, 5)
+    store.sync("EURUSD", 5, start, now['broker'].to_pydatetime(), terminal.fetch)
+    now['broker'] += pd.Timedelta(minutes=5)
+    fetched = store.sync("EURUSD", 5, start, now['broker'].to_pydatetime(), terminal.fetch)
+    
+    # Dall'ultima barra chiusa: la 11:55, quella che era in formazione e la nuova
+    assert terminal.calls[-1][0] == datetime(2024, 1, 5, 11, 55)
+    assert fetched == 3
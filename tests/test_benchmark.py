@@ -0,0 +1,52 @@
+import json
+import pandas as pd
+from benchmarks.run import CASES, compare, main, result_key, run_case, synthetic_bars, synthetic_symbols
+
+
+def test_synthetic_bars_deterministic():
+    bars = synthetic_bars(5000, 3)
+    pd.testing.assert_frame_equal(bars, synthetic_bars(5000, 3))
+    assert (bars['High'] >= bars[['Open', 'Close']].max(axis=1)).all()
+    assert (bars['Low'] <= bars[['Open', 'Close']].min(axis=1)).all()
+
+    # Le barre sono divise tra i simboli
+    data = synthetic_symbols(3000, 3)
+    assert list(data) == ['SYM00', 'SYM01', 'SYM02']
+    assert all(len(df) == 1000 for df in data.values())
+
+
+def test_cases_report_metrics():
+    data = synthetic_symbols(1000, 2)
+    for name in CASES:
+        result = run_case(name, data, repeat=1)
+        assert result['bars'] == 1000
+        assert result['symbols'] == 2
+        assert result['throughput'] > 0
+        assert 0 < result['p50_us'] <= result['p99_us'] <= result['max_us']
+        assert result['peak_mb'] > 0
+
+
+def test_compare_flags_regressions():
+    reference = {'case': 'signals', 'bars': 10000, 'symbols': 1, 'throughput': 1000.0, 'p50_us': 100.0, 'peak_mb': 50.0}
+    baseline = {result_key(reference): reference}
+
+    assert compare([dict(reference, throughput=800.0, p50_us=120.0, peak_mb=55.0)], baseline) == []
+    regressions = compare([dict(reference, throughput=500.0, p50_us=200.0, peak_mb=80.0)], baseline)
+    assert len(regressions) == 3
+    assert all(regression.startswith('signals/10000x1') for regression in regressions)
+    # Casi senza baseline non sono regressioni
+    assert compare([dict(reference, bars=20000, throughput=1.0)], baseline) == []
+
+
+def test_main_fails_on_regression(tmp_path):
+    path = tmp_path / 'baseline.json'
+    args = ['--case', 'indicators', '--repeat', '1', '--baseline', str(path)]
+    assert main(args + ['--update-baseline']) == 0
+    assert main(args + ['--tolerance', '0.9', '--memory-tolerance', '1.0']) == 0
+
+    # Baseline irraggiungibile: il confronto fallisce
+    baseline = json.loads(path.read_text())
+    for result in baseline['results'].values():
+        result['throughput'] *= 100
+    path.write_text(json.dumps(baseline))
+    assert main(args) == 1
@@ -1,6 +1,7 @@
 import pytest
 import pandas as pd
 from src.execution.paper_trader import PaperTrader, Position
+from src.analytics.performance import annual_sharpe_ratio
 
 
 @pytest.fixture
@@ -129,4 +130,66 @@ def test_get_statistics(paper_trader):
     assert 'total_trades' in stats
     assert 'win_rate' in stats
     assert 'total_return' in stats
-    assert stats['total_trades'] == 5
\ No newline at end of file
+    assert stats['total_trades'] == 5
+
+
+def test_closed_trades_store_grows(paper_trader):
+    symbols = ["EURUSD", "GBPUSD", "USDJPY"]
+    profits = []
+    
+    for i in range(3000):
+        symbol = symbols[i % 3]
+        paper_trader.open_position(
+            symbol=symbol,
+            direction="long" if i % 2 == 0 else "short",
+            entry_price=1.09000,
+            size=0.1,
+            sl=1.08900 if i % 2 == 0 else 1.09100,
+            tp=1.09150 if i % 2 == 0 else 1.08850
+        )
+        bar = pd.Series({'Close': 1.09000, 'High': 1.09200, 'Low': 1.09000})
+        paper_trader.update(symbol, bar)
+        profits.append(paper_trader.closed_positions.column('profit')[-1])
+    
+    stats = paper_trader.get_statistics()
+    trades = paper_trader.closed_positions.to_frame()
+    
+    assert len(paper_trader.closed_positions) == 3000
+    assert paper_trader.get_open_positions() == []
+    assert stats['winning_trades'] == sum(p > 0 for p in profits)
+    assert stats['average_profit'] == pytest.approx(sum(profits) / len(profits))
+    assert stats['max_loss'] == pytest.approx(min(profits))
+    assert paper_trader.capital == pytest.approx(10000.0 + sum(profits))
+    assert list(trades['symbol'][:3]) == symbols
+    assert set(trades['status']) == {'take_profit', 'stop_loss'}
+
+
+def test_update_only_touches_symbol(paper_trader):
+    paper_trader.open_position("EURUSD", "long", 1.09000, 0.1, 1.08900, 1.09150)
+    paper_trader.open_position("GBPUSD", "long", 1.27000, 0.1, 1.26900, 1.27150)
+    
+    bar = pd.Series({'Close': 1.09150, 'High': 1.09200, 'Low': 1.09000})
+    paper_trader.update("EURUSD", bar)
+    
+    assert paper_trader.get_open_positions("EURUSD") == []
+    assert len(paper_trader.get_open_positions("GBPUSD")) == 1
+    assert paper_trader.trades_log[0]['symbol'] == "EURUSD"
+
+
+def test_statistics_sharpe_matches_backtest():
+    # Trade su più anni: Sharpe dalla curva di equity come nei backtest
+    times = iter(pd.date_range('2021-01-04', periods=60, freq='20D'))
+    paper_trader = PaperTrader(initial_capital=10000.0, clock=lambda: next(times).to_pydatetime())
+    for i in range(30):
+        paper_trader.open_position("EURUSD", "long", 1.09000, 0.1, 1.08900, 1.09150)
+        bar = pd.Series({'Close': 1.09000, 'High': 1.09200 if i % 3 else 1.09000, 'Low': 1.08800 if i % 3 == 0 else 1.09000})
+        paper_trader.update("EURUSD", bar)
+
+    trades = paper_trader.closed_positions.to_frame()
+    equity = pd.Series(10000.0 + trades['profit'].cumsum().to_numpy(), index=pd.DatetimeIndex(trades['exit_time']))
+    stats = paper_trader.get_statistics()
+
+    assert equity.index.year.nunique() >= 3
+    # Equity del tracker dal capitale corrente, qui dalla somma cumulata
+    assert stats['sharpe_ratio'] == pytest.approx(annual_sharpe_ratio(equity, 10000.0), rel=1e-9)
+    assert stats['sharpe_ratio'] is not None
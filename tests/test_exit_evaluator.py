@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+import pandas as pd
+from src.execution.exit_evaluator import ExitEvaluator
+from src.execution.paper_trader import PaperTrader, Position
+
+
+def random_positions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = []
+    for i in range(n):
+        direction = 'long' if rng.random() < 0.5 else 'short'
+        entry = 1.09 + rng.normal(0, 0.001)
+        sl_distance, tp_distance = rng.uniform(0.0005, 0.003, 2)
+        sign = 1 if direction == 'long' else -1
+        positions.append(Position(
+            'EURUSD', direction, entry, round(rng.uniform(0.01, 1.0), 2),
+            entry - sign * sl_distance, entry + sign * tp_distance
+        ))
+    return positions
+
+
+def random_bars(m, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 1.09 + np.cumsum(rng.normal(0, 0.0005, m))
+    spread = np.abs(rng.normal(0, 0.0008, m))
+    return close + spread, close - spread
+
+
+def make_evaluator(positions):
+    evaluator = ExitEvaluator(capacity=4)
+    for i, p in enumerate(positions):
+        evaluator.add(i, p.direction, p.entry_price, p.size, p.sl, p.tp)
+    return evaluator
+
+
+def test_matches_check_exit_bar_by_bar():
+    positions = random_positions(500)
+    evaluator = make_evaluator(positions)
+    high, low = random_bars(100)
+    
+    for h, l in zip(high, low):
+        hits = evaluator.evaluate(h, l)
+        expected = {}
+        for i, p in enumerate(positions):
+            if p.status == 'open' and p.check_exit(None, h, l):
+                expected[i] = p
+        
+        assert sorted(hits['ids']) == sorted(expected)
+        for position_id, price, stop, profit in zip(hits['ids'], hits['exit_price'], hits['stop'], hits['profit']):
+            p = expected[position_id]
+            assert p.exit_price == price
+            assert p.status == ('stop_loss' if stop else 'take_profit')
+            assert p.profit == profit
+    
+    assert len(evaluator) == sum(p.status == 'open' for p in positions)
+
+
+def test_block_matches_bar_by_bar():
+    positions = random_positions(300, seed=4)
+    high, low = random_bars(700, seed=5)
+    
+    per_bar = make_evaluator(positions)
+    expected = {}
+    for bar, (h, l) in enumerate(zip(high, low)):
+        hits = per_bar.evaluate(h, l)
+        for position_id, stop, profit in zip(hits['ids'], hits['stop'], hits['profit']):
+            expected[position_id] = (bar, stop, profit)
+    
+    block = make_evaluator(positions)
+    hits = block.evaluate_bars(high, low, chunk=64)
+    result = {
+        position_id: (bar, stop, profit)
+        for position_id, bar, stop, profit in zip(hits['ids'], hits['bar'], hits['stop'], hits['profit'])
+    }
+    
+    assert result == expected
+    assert len(block) == len(per_bar)
+
+
+def test_stop_wins_when_both_hit():
+    evaluator = ExitEvaluator()
+    evaluator.add(7, 'short', 1.09000, 0.1, 1.09100, 1.08850)
+    
+    hits = evaluator.evaluate(1.09200, 1.08800)
+    
+    assert list(hits['ids']) == [7]
+    assert hits['stop'][0]
+    assert hits['profit'][0] == pytest.approx(-10.0)
+
+
+def test_paper_trader_update_bars():
+    trader = PaperTrader(initial_capital=10000.0)
+    for p in random_positions(200, seed=8):
+        trader.open_position(p.symbol, p.direction, p.entry_price, p.size, p.sl, p.tp)
+    
+    high, low = random_bars(300, seed=9)
+    dates = pd.date_range(start='2024-01-01', periods=300, freq='5min')
+    bars = pd.DataFrame({'High': high, 'Low': low, 'Close': (high + low) / 2}, index=dates)
+    
+    trader.update_bars('EURUSD', bars)
+    trades = trader.closed_positions.to_frame()
+    
+    assert len(trader.get_open_positions('EURUSD')) + len(trades) == 200
+    assert trades['exit_time'].is_monotonic_increasing
+    assert trader.capital == pytest.approx(10000.0 + trades['profit'].sum())
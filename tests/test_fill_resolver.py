@@ -0,0 +1,98 @@
+import pytest
+import numpy as np
+import pandas as pd
+from src.data.bar_store import BarStore
+from src.data.resampler import resample_bars
+from src.execution.fill_resolver import IntrabarResolver
+from src.execution.paper_trader import PaperTrader
+
+
+@pytest.fixture
+def m1_store(tmp_path):
+    # Barra M5 delle 10:00: prima sale a 1.0920 (10:01), poi scende a 1.0880 (10:03)
+    # Barra M5 delle 10:05: prima scende a 1.0880 (10:06), poi sale a 1.0920 (10:08)
+    # Barra M5 delle 10:10: entrambi i livelli nella stessa barra M1 (10:12)
+    dates = pd.date_range(start='2024-01-02 10:00', periods=15, freq='1min')
+    high = np.full(15, 1.0905)
+    low = np.full(15, 1.0895)
+    high[1], low[3] = 1.0920, 1.0880
+    low[6], high[8] = 1.0880, 1.0920
+    high[12], low[12] = 1.0920, 1.0880
+    
+    store = BarStore(str(tmp_path / "bars"))
+    store.append('EURUSD', 1, pd.DataFrame({
+        'Open': 1.09,
+        'High': high,
+        'Low': low,
+        'Close': 1.09,
+        'Volume': 1.0
+    }, index=dates))
+    return store
+
+
+def test_resolves_ambiguous_bars(m1_store):
+    resolver = IntrabarResolver(m1_store, timeframe=5)
+    times = pd.DatetimeIndex(['2024-01-02 10:00', '2024-01-02 10:05', '2024-01-02 10:10', '2024-01-03 10:00'])
+    
+    stop_first = resolver.resolve_many(
+        'EURUSD',
+        times.to_numpy(),
+        np.array([1.0, 1.0, 1.0, -1.0]),
+        np.array([1.0885, 1.0885, 1.0885, 1.0915]),
+        np.array([1.0915, 1.0915, 1.0915, 1.0885])
+    )
+    
+    assert list(stop_first) == [False, True, True, True]
+    
+    stats = resolver.get_statistics()
+    assert stats['ambiguous'] == 4
+    assert stats['resolved'] == 2
+    assert stats['unresolved'] == 2
+    assert stats['tp_first'] == 1
+    
+    # Short: TP sotto, SL sopra
+    assert resolver.resolve('EURUSD', '2024-01-02 10:00', 'short', 1.0915, 1.0885) is True
+    assert resolver.resolve('EURUSD', '2024-01-02 10:05', 'short', 1.0915, 1.0885) is False
+
+
+def test_paper_trader_uses_resolver(m1_store):
+    m5 = resample_bars(m1_store.load('EURUSD', 1), 5)
+    
+    trader = PaperTrader(fill_resolver=IntrabarResolver(m1_store, timeframe=5))
+    trader.open_position('EURUSD', 'long', 1.0900, 0.1, 1.0885, 1.0915)
+    trader.update('EURUSD', m5.iloc[0])
+    
+    plain = PaperTrader()
+    plain.open_position('EURUSD', 'long', 1.0900, 0.1, 1.0885, 1.0915)
+    plain.update('EURUSD', m5.iloc[0])
+    
+    assert trader.trades_log[0]['status'] == 'take_profit'
+    assert trader.trades_log[0]['profit'] == pytest.approx(15.0)
+    assert plain.trades_log[0]['status'] == 'stop_loss'
+    
+    replay = PaperTrader(fill_resolver=IntrabarResolver(m1_store, timeframe=5))
+    replay.open_position('EURUSD', 'long', 1.0900, 0.1, 1.0885, 1.0915)
+    replay.open_position('EURUSD', 'short', 1.0900, 0.1, 1.0915, 1.0885)
+    replay.update_bars('EURUSD', m5)
+    
+    assert sorted(t['status'] for t in replay.trades_log) == ['stop_loss', 'take_profit']
+    assert replay.fill_resolver.get_statistics()['resolved'] == 2
+
+
+def test_new_parts_do_not_rebuild_mapped_history(m1_store):
+    resolver = IntrabarResolver(m1_store, timeframe=5)
+    assert resolver.resolve('EURUSD', '2024-01-02 10:00', 'long', 1.0885, 1.0915) is False
+    signature = (m1_store.root / 'EURUSD' / 'M1' / 'mmap' / 'signature').read_text()
+    
+    # Sync dal vivo: un part nuovo con la barra M5 delle 10:15 (TP alle 10:16, SL alle 10:18)
+    dates = pd.date_range(start='2024-01-02 10:15', periods=5, freq='1min')
+    high = np.array([1.0905, 1.0920, 1.0905, 1.0905, 1.0905])
+    low = np.array([1.0895, 1.0895, 1.0895, 1.0880, 1.0895])
+    m1_store.append('EURUSD', 1, pd.DataFrame({
+        'Open': 1.09, 'High': high, 'Low': low, 'Close': 1.09, 'Volume': 1.0
+    }, index=dates))
+    
+    assert resolver.resolve('EURUSD', '2024-01-02 10:15', 'long', 1.0885, 1.0915) is False
+    assert resolver.resolve('EURUSD', '2024-01-02 10:05', 'long', 1.0885, 1.0915) is True
+    assert (m1_store.root / 'EURUSD' / 'M1' / 'mmap' / 'signature').read_text() == signature
+    assert resolver.get_statistics()['resolved'] == 3
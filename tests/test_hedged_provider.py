@@ -0,0 +1,131 @@
+import time
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from src.data.hedged_provider import HedgedProvider, TwelveDataSource
+
+
+def make_bars(periods=100):
+    dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+    close = 1.09 + np.cumsum(np.random.default_rng(2).normal(0, 0.0004, periods))
+    return pd.DataFrame({
+        'Open': close,
+        'High': close + 0.0002,
+        'Low': close - 0.0002,
+        'Close': close,
+        'Volume': np.arange(periods)
+    }, index=dates)
+
+
+class FakeProvider:
+    def __init__(self, delay=0.0, result='bars', error=None):
+        self.delay = delay
+        self.result = make_bars() if isinstance(result, str) else result
+        self.error = error
+        self.calls = 0
+    
+    def get_historical_data(self, symbol, timeframe, start, end):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def make_provider(primary, secondary, **kwargs):
+    return HedgedProvider(primary, secondary, names=['primary', 'secondary'], **kwargs)
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = FakeProvider(), FakeProvider()
+    provider = make_provider(primary, secondary, hedge_after=0.5)
+    
+    df = provider.get_historical_data('EURUSD', 5, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    provider.close()
+    
+    assert len(df) == 100
+    assert secondary.calls == 0
+    assert provider.get_statistics()['primary']['wins'] == 1
+
+
+def test_slow_primary_is_hedged():
+    primary = FakeProvider(delay=1.0)
+    secondary = FakeProvider(result=make_bars().iloc[::-1][['Open', 'High', 'Low', 'Close']])
+    provider = make_provider(primary, secondary, hedge_after=0.05)
+    
+    started = time.perf_counter()
+    df = provider.get_historical_data('EURUSD', 5, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    elapsed = time.perf_counter() - started
+    
+    assert elapsed < 0.5
+    # Colonne e ordinamento uniformi anche dal secondario
+    assert list(df.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert df.index.is_monotonic_increasing
+    # Senza volumi: volume unitario, la VWAP resta calcolabile
+    assert (df['Volume'] == 1.0).all()
+    
+    stats = provider.get_statistics()
+    assert stats['hedged'] == 1
+    assert stats['secondary']['wins'] == 1
+    
+    # La risposta lenta viene comunque misurata
+    time.sleep(1.1)
+    assert provider.get_statistics()['primary']['p50'] >= 1.0
+    provider.close()
+
+
+def test_busy_primary_is_not_called_again():
+    primary = FakeProvider(delay=1.0)
+    secondary = FakeProvider()
+    provider = make_provider(primary, secondary, hedge_after=0.05)
+    
+    for _ in range(3):
+        assert provider.get_historical_data('EURUSD', 5, datetime(2024, 1, 1), datetime(2024, 1, 2)) is not None
+    
+    # Un solo worker occupato dal primario lento, le altre richieste vanno al secondario
+    assert primary.calls == 1
+    assert secondary.calls == 3
+    assert provider.get_statistics()['hedged'] == 3
+    
+    # Terminata la richiesta lenta il primario torna disponibile
+    time.sleep(1.1)
+    provider.get_historical_data('EURUSD', 5, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    assert primary.calls == 2
+    provider.close()
+
+
+def test_failed_primary_hedges_immediately():
+    primary = FakeProvider(error=ConnectionError("terminal down"))
+    secondary = FakeProvider()
+    provider = make_provider(primary, secondary, hedge_after=5.0)
+    
+    started = time.perf_counter()
+    df = provider.get_historical_data('EURUSD', 5, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    provider.close()
+    
+    assert df is not None
+    assert time.perf_counter() - started < 1.0
+    assert provider.get_statistics()['primary']['errors'] == 1
+
+
+def test_no_data_from_any_provider():
+    provider = make_provider(FakeProvider(result=None), FakeProvider(result=None), hedge_after=0.05)
+    
+    assert provider.get_historical_data('EURUSD', 5, datetime(2024, 1, 1), datetime(2024, 1, 2)) is None
+    provider.close()
+
+
+def test_twelvedata_source_adapts_contract():
+    class FakeTwelveData:
+        def get_historical_data(self, symbol, interval, start, end):
+            self.args = (symbol, interval, start, end)
+            return make_bars()
+    
+    td = FakeTwelveData()
+    source = TwelveDataSource(td, time_offset=timedelta(hours=2))
+    
+    df = source.get_historical_data('EURUSD', 60, datetime(2024, 1, 1, 12), datetime(2024, 1, 2, 12))
+    
+    assert td.args == ('EURUSD', '1h', '2024-01-01 10:00:00', '2024-01-02 10:00:00')
+    assert df.index[0] == pd.Timestamp('2024-01-01 02:00')
+    assert source.get_historical_data('EURUSD', 7, datetime(2024, 1, 1), datetime(2024, 1, 2)) is None
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from src.backtest.optimizer import ParameterOptimizer
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.strategy.indicator_cache import IndicatorCache
+from src.strategy.indicators import calculate_atr, calculate_ema, calculate_vwap
+from tests.test_portfolio import make_bars
+
+
+def test_cached_indicators_match_direct_calculation():
+    bars = make_bars(3000, 0)
+    cache = IndicatorCache()
+
+    # Stessa serie, poi la serie cresciuta di barre nuove
+    for end in [2000, 2000, 2300, 3000]:
+        window = bars.iloc[:end]
+        np.testing.assert_array_equal(cache.ema(window['Close'], 9, 'EURUSD', 5), calculate_ema(window['Close'], 9))
+        np.testing.assert_array_equal(cache.vwap(window, 'EURUSD', 5), calculate_vwap(window))
+        np.testing.assert_allclose(cache.atr(window, 14, 'EURUSD', 5), calculate_atr(window, 14), rtol=1e-12)
+
+    stats = cache.get_statistics()
+    assert stats['misses'] == 3
+    assert stats['hits'] == 3
+    assert stats['extensions'] == 6
+    assert stats['entries'] == 3
+
+
+def test_changed_last_bar_is_recomputed():
+    bars = make_bars(1000, 1)
+    cache = IndicatorCache()
+    cache.ema(bars['Close'].iloc[:500], 9, 'EURUSD', 5)
+
+    # L'ultima barra in cache è cambiata (barra in formazione aggiornata)
+    updated = bars['Close'].iloc[:600].copy()
+    updated.iloc[499] += 0.001
+    np.testing.assert_array_equal(cache.ema(updated, 9, 'EURUSD', 5), calculate_ema(updated, 9))
+    assert cache.misses == 2
+    assert cache.extensions == 0
+
+    # Altro timeframe o altro simbolo: chiavi diverse
+    cache.ema(bars['Close'].iloc[:600], 9, 'EURUSD', 15)
+    cache.ema(bars['Close'].iloc[:600], 9, 'GBPUSD', 5)
+    assert cache.misses == 4
+
+
+def test_sliding_window_reuses_cached_series():
+    bars = make_bars(2100, 4)
+    cache = IndicatorCache()
+
+    # Finestra di 2000 barre che avanza di una barra alla volta, come il
+    # refetch dello storico recente
+    for start in range(0, 50, 10):
+        window = bars.iloc[start:start + 2000 + start // 10]
+        np.testing.assert_allclose(cache.ema(window['Close'], 9, 'EURUSD', 5), calculate_ema(window['Close'], 9), rtol=1e-12)
+        np.testing.assert_allclose(cache.vwap(window, 'EURUSD', 5), calculate_vwap(window), rtol=1e-12)
+        np.testing.assert_allclose(cache.atr(window, 14, 'EURUSD', 5), calculate_atr(window, 14), rtol=1e-12)
+
+    stats = cache.get_statistics()
+    assert stats['misses'] == 3
+    assert stats['extensions'] == 12
+    # Una sola serie per indicatore: la finestra precedente viene sostituita
+    assert stats['entries'] == 3
+
+    # Stessa finestra spostata senza barre nuove
+    window = bars.iloc[100:2044]
+    np.testing.assert_allclose(cache.ema(window['Close'], 9, 'EURUSD', 5), calculate_ema(window['Close'], 9), rtol=1e-12)
+    assert cache.hits == 1
+
+
+def test_saved_cache_is_reused(tmp_path):
+    bars = make_bars(1500, 5)
+    path = tmp_path / 'indicators.pkl'
+    cache = IndicatorCache()
+    cache.ema(bars['Close'].iloc[:1000], 21, 'EURUSD', 5)
+    cache.vwap(bars.iloc[:1000], 'EURUSD', 5)
+    cache.save(path)
+
+    # Esecuzione successiva con lo storico cresciuto
+    reloaded = IndicatorCache()
+    assert reloaded.load(path) == 2
+    assert reloaded.bytes == cache.bytes
+    np.testing.assert_array_equal(reloaded.ema(bars['Close'], 21, 'EURUSD', 5), calculate_ema(bars['Close'], 21))
+    np.testing.assert_array_equal(reloaded.vwap(bars, 'EURUSD', 5), calculate_vwap(bars))
+    assert reloaded.extensions == 2
+    assert reloaded.misses == 0
+
+    assert IndicatorCache().load(tmp_path / 'missing.pkl') == 0
+
+
+def test_lru_eviction_respects_size_limit():
+    bars = make_bars(5000, 2)
+    cache = IndicatorCache(max_size_mb=0.1)
+    for period in range(5, 15):
+        cache.ema(bars['Close'], period, 'EURUSD', 5)
+
+    assert cache.bytes <= cache.max_bytes
+    assert cache.evictions > 0
+    # Le più recenti restano in cache
+    cache.ema(bars['Close'], 14, 'EURUSD', 5)
+    assert cache.hits == 1
+    cache.ema(bars['Close'], 5, 'EURUSD', 5)
+    assert cache.misses == 11
+
+
+def test_strategy_and_optimizer_reuse_cache():
+    bars = make_bars(2000, 3)
+    cache = IndicatorCache()
+    strategy = EMAVWAPStrategy(indicator_cache=cache)
+
+    expected = EMAVWAPStrategy().generate_signals(bars)
+    signals = strategy.generate_signals(bars, 'EURUSD', 5)
+    pd.testing.assert_frame_equal(signals, expected)
+    strategy.generate_signals(bars, 'EURUSD', 5)
+    assert cache.hits == 4
+
+    grid = {'ema_fast': [9], 'ema_slow': [21, 30], 'atr_period': [14], 'atr_sl_multiplier': [2.0], 'atr_tp_multiplier': [3.0]}
+    optimizer = ParameterOptimizer(grid=grid, workers=1, indicator_cache=cache)
+    table = optimizer.run({'EURUSD': bars}, timeframe=5)
+    # EMA 9/21, VWAP e ATR 14 già in cache dalla strategia
+    assert cache.hits == 8
+    pd.testing.assert_frame_equal(table, ParameterOptimizer(grid=grid, workers=1).run({'EURUSD': bars}))
@@ -0,0 +1,81 @@
+import asyncio
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from src.execution.trading_loop import TradingLoop
+from src.monitoring.metrics import LatencyHistogram, MetricsRegistry, MetricsServer
+
+
+def test_histogram_quantiles_within_bucket_error():
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(mean=-6, sigma=1.5, size=20000)
+    histogram = LatencyHistogram()
+    for value in samples:
+        histogram.record(value)
+
+    assert histogram.count == len(samples)
+    assert histogram.max == samples.max()
+    assert histogram.total == pytest.approx(samples.sum())
+    for q in (0.5, 0.9, 0.99):
+        # Errore relativo limitato dalla risoluzione dei bucket (e 1µs)
+        expected = np.quantile(samples, q)
+        assert histogram.quantile(q) == pytest.approx(expected, rel=0.02, abs=2e-6)
+    assert histogram.quantile(1.0) == histogram.max
+    assert LatencyHistogram().quantile(0.5) == 0.0
+
+
+def test_registry_renders_prometheus_text():
+    metrics = MetricsRegistry()
+    metrics.describe('stage_seconds', 'Stage duration')
+    for _ in range(10):
+        metrics.observe('stage_seconds', 0.002, stage='signal', symbol='EURUSD')
+    with metrics.time('stage_seconds', stage='fetch', symbol='EURUSD'):
+        pass
+    metrics.increment('errors_total', stage='analyze', symbol='GBPUSD')
+    metrics.set_gauge('cycle_symbols', 3)
+
+    text = metrics.render()
+    assert '# HELP forex_bot_stage_seconds Stage duration' in text
+    assert '# TYPE forex_bot_stage_seconds summary' in text
+    assert 'forex_bot_stage_seconds{stage="signal",symbol="EURUSD",quantile="0.99"} 0.002' in text
+    assert 'forex_bot_stage_seconds_count{stage="signal",symbol="EURUSD"} 10' in text
+    assert 'forex_bot_stage_seconds_count{stage="fetch",symbol="EURUSD"} 1' in text
+    assert 'forex_bot_stage_seconds_max{stage="signal",symbol="EURUSD"} 0.002000' in text
+    assert 'forex_bot_errors_total{stage="analyze",symbol="GBPUSD"} 1' in text
+    assert 'forex_bot_cycle_symbols 3' in text
+
+
+def test_trading_loop_records_stages():
+    metrics = MetricsRegistry()
+    loop = TradingLoop(max_workers=2, metrics=metrics)
+    bar_close = datetime.utcnow() - timedelta(seconds=1)
+
+    asyncio.run(loop.run_cycle(['EURUSD', 'GBPUSD'], lambda s: s if s == 'EURUSD' else None, lambda s, r: None, bar_close))
+    loop.close()
+
+    summary = metrics.summary()
+    assert summary['cycle_seconds']['count'] == 1
+    assert summary['stage_seconds{stage="analyze",symbol="GBPUSD"}']['count'] == 1
+    # Solo i simboli con segnale arrivano all'esecuzione
+    assert summary['stage_seconds{stage="execute",symbol="EURUSD"}']['count'] == 1
+    assert 'stage_seconds{stage="execute",symbol="GBPUSD"}' not in summary
+    assert summary['bar_to_signal_seconds{symbol="EURUSD"}']['max'] >= 1.0
+
+
+def test_metrics_endpoint():
+    metrics = MetricsRegistry()
+    metrics.observe('cycle_seconds', 0.05)
+    server = MetricsServer(metrics, port=0)
+    port = server.start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers['Content-Type'].startswith('text/plain')
+        assert 'forex_bot_cycle_seconds_count 1' in body
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/other', timeout=5)
+    finally:
+        server.close()
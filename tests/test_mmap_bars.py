@@ -0,0 +1,93 @@
+import pickle
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from src.data.mmap_bars import MmapBars
+from src.data.bar_store import BarStore
+from src.strategy.indicators import add_all_indicators, calculate_atr, calculate_vwap
+from src.backtest.vectorized import VectorizedBacktester
+from src.backtest.optimizer import ParameterOptimizer
+
+
+@pytest.fixture
+def sample_data():
+    periods = 1500
+    dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+    rng = np.random.default_rng(5)
+    close = 1.09 + np.cumsum(rng.normal(0, 0.0004, periods))
+    open_ = np.concatenate(([1.09], close[:-1]))
+    
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + 0.0002,
+        'Low': np.minimum(open_, close) - 0.0002,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, periods).astype(float)
+    }, index=dates)
+
+
+@pytest.fixture
+def bars(tmp_path, sample_data):
+    return MmapBars.write(tmp_path / "EURUSD", sample_data)
+
+
+def test_roundtrip(bars, sample_data):
+    assert len(bars) == len(sample_data)
+    pd.testing.assert_frame_equal(bars.to_frame(), sample_data, check_freq=False)
+
+
+def test_slices_are_zero_copy(bars):
+    view = bars.between(datetime(2024, 1, 2), datetime(2024, 1, 3))
+    
+    assert view.index[0] == pd.Timestamp(2024, 1, 2)
+    assert view.index[-1] == pd.Timestamp(2024, 1, 3)
+    assert np.shares_memory(view['Close'].to_numpy(), bars.columns['Close'])
+    assert np.shares_memory(view.to_frame()['High'].to_numpy(), bars.columns['High'])
+
+
+def test_pickle_sends_only_path(bars):
+    view = bars[100:200]
+    payload = pickle.dumps(view)
+    restored = pickle.loads(payload)
+    
+    assert len(payload) < 1000
+    np.testing.assert_array_equal(restored['Close'], view['Close'])
+    assert restored.index[0] == view.index[0]
+
+
+def test_indicators_accept_mmap_bars(bars, sample_data):
+    pd.testing.assert_series_equal(calculate_vwap(bars), calculate_vwap(sample_data), check_freq=False)
+    pd.testing.assert_series_equal(calculate_atr(bars), calculate_atr(sample_data), check_freq=False)
+    pd.testing.assert_frame_equal(add_all_indicators(bars), add_all_indicators(sample_data), check_freq=False)
+
+
+def test_backtester_accepts_mmap_bars(bars, sample_data):
+    expected = VectorizedBacktester().run(sample_data)
+    results = VectorizedBacktester().run(bars)
+    
+    assert results == expected
+
+
+def test_optimizer_workers_share_mmap_bars(bars, sample_data):
+    grid = {'ema_fast': [5, 9], 'ema_slow': [21], 'atr_period': [14],
+            'atr_sl_multiplier': [2.0], 'atr_tp_multiplier': [3.0]}
+    
+    serial = ParameterOptimizer(grid=grid, workers=1).run({'EURUSD': sample_data})
+    parallel = ParameterOptimizer(grid=grid, workers=2).run({'EURUSD': bars})
+    
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_bar_store_load_mmap(tmp_path, sample_data):
+    store = BarStore(str(tmp_path / "bars"))
+    store.append("EURUSD", 5, sample_data.iloc[:1000])
+    
+    bars = store.load_mmap("EURUSD", 5)
+    assert len(bars) == 1000
+    
+    # Nuove barre: la copia binaria viene rigenerata
+    store.append("EURUSD", 5, sample_data.iloc[1000:])
+    bars = store.load_mmap("EURUSD", 5, datetime(2024, 1, 2), None)
+    expected = sample_data.loc[datetime(2024, 1, 2):]
+    pd.testing.assert_frame_equal(bars.to_frame(), expected, check_names=False, check_freq=False)
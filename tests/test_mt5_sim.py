@@ -0,0 +1,175 @@
+import asyncio
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from src.data import mt5_sim
+from src.data.bar_store import BarStore
+from src.data.mt5_provider import MT5Provider
+from src.data.resampler import resample_bars
+from src.execution.mt5_executor import MT5Executor
+from src.execution.scheduler import closed_bars
+from src.execution.trading_loop import TradingLoop
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from tests.test_portfolio import make_bars
+
+
+# Mercoledì 13 marzo 2024 12:00 UTC
+NOW = pd.Timestamp('2024-03-13 12:00').timestamp()
+
+
+@pytest.fixture
+def clock():
+    # Orologio simulato; il terminale di default viene ripristinato alla fine
+    clock = {'now': NOW}
+    yield clock
+    mt5_sim.configure()
+
+
+def make_provider(**kwargs):
+    provider = MT5Provider(1234, 'secret', 'Sim-Server', terminal=mt5_sim, **kwargs)
+    assert provider.connect()
+    return provider
+
+
+def test_synthetic_bars_are_consistent(clock):
+    mt5_sim.configure(clock=lambda: clock['now'])
+    mt5_sim.initialize()
+    start = datetime(2024, 3, 4)
+    rates = mt5_sim.copy_rates_range('EURUSD', mt5_sim.TIMEFRAME_M5, start, datetime(2024, 3, 14))
+    assert rates.dtype == mt5_sim.RATES_DTYPE
+
+    times = pd.to_datetime(rates['time'], unit='s')
+    # Nessuna barra nel fine settimana né oltre l'istante corrente
+    assert not ((times.dayofweek == 5) | (times.dayofweek == 6) & (times.hour < 22)).any()
+    assert times[-1] == pd.Timestamp('2024-03-13 12:00')
+    assert (rates['high'] >= np.maximum(rates['open'], rates['close'])).all()
+    assert (rates['low'] <= np.minimum(rates['open'], rates['close'])).all()
+
+    # Richieste sovrapposte: stesse barre
+    overlap = mt5_sim.copy_rates_range('EURUSD', mt5_sim.TIMEFRAME_M5, datetime(2024, 3, 8), datetime(2024, 3, 12))
+    np.testing.assert_array_equal(overlap, rates[np.isin(rates['time'], overlap['time'])])
+
+    # M15 è l'aggregazione delle M1
+    m1 = pd.DataFrame(mt5_sim.copy_rates_range('EURUSD', mt5_sim.TIMEFRAME_M1, start, datetime(2024, 3, 5, 23, 59)))
+    m1.index = pd.to_datetime(m1['time'], unit='s')
+    m1 = m1.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'tick_volume': 'Volume'})
+    m15 = mt5_sim.copy_rates_range('EURUSD', mt5_sim.TIMEFRAME_M15, start, datetime(2024, 3, 5, 23, 45))
+    expected = resample_bars(m1[['Open', 'High', 'Low', 'Close', 'Volume']], 15, 1)
+    np.testing.assert_allclose(m15['close'], expected['Close'].to_numpy())
+    np.testing.assert_allclose(m15['high'], expected['High'].to_numpy())
+
+
+def test_provider_and_executor(clock):
+    mt5_sim.configure(clock=lambda: clock['now'])
+    provider = make_provider()
+    data = provider.get_historical_data('GBPUSD', 5, datetime(2024, 3, 6), datetime(2024, 3, 13, 12))
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert len(data) > 1000
+
+    signal = EMAVWAPStrategy().get_current_signal(data)
+    bid = mt5_sim.symbol_info_tick('GBPUSD').bid
+    assert bid == data['Close'].iloc[-1]
+
+    executor = MT5Executor(provider)
+    order = executor.execute_trade('GBPUSD', 'long', 0.1, bid - 0.002, bid + 0.004)
+    assert order == 1
+    assert executor.get_active_positions() == ['GBPUSD']
+    assert provider.get_account_info()['balance'] == 10000.0
+
+    # Il prezzo tocca SL o TP: posizione chiusa, profitto nel saldo
+    for minutes in range(5, 7 * 24 * 60, 5):
+        clock['now'] = NOW + minutes * 60
+        if not mt5_sim.positions_get():
+            break
+    assert not mt5_sim.positions_get()
+    assert provider.get_account_info()['balance'] != 10000.0
+    assert signal is None or signal['direction'] in ('long', 'short')
+
+
+def test_latency_rejections_and_errors(clock):
+    sleeps = []
+    terminal = mt5_sim.configure(
+        latency=0.01, order_latency=0.05, jitter=0.002, reject_rate=1.0,
+        clock=lambda: clock['now'], sleep=sleeps.append
+    )
+    provider = make_provider()
+    sleeps.clear()
+
+    provider.get_historical_data('EURUSD', 5, datetime(2024, 3, 12), datetime(2024, 3, 13))
+    assert len(sleeps) == 1 and sleeps[0] == pytest.approx(0.01, abs=0.01)
+    assert sleeps[0] != 0.01
+
+    tick = mt5_sim.symbol_info_tick('EURUSD')
+    sleeps.clear()
+    assert provider.place_order('EURUSD', 'buy', 0.1, tick.bid - 0.002, tick.ask + 0.004) is None
+    assert terminal.rejected == 1
+    # symbol_info e symbol_info_tick con la latenza dei dati, order_send con quella degli ordini
+    assert sleeps[-1] == pytest.approx(0.05, abs=0.01)
+    assert all(delay == pytest.approx(0.01, abs=0.01) for delay in sleeps[:-1])
+
+    mt5_sim.configure(error_rate=1.0, clock=lambda: clock['now'])
+    provider = make_provider()
+    assert provider.get_historical_data('EURUSD', 5, datetime(2024, 3, 12), datetime(2024, 3, 13)) is None
+    assert mt5_sim.last_error()[0] == mt5_sim.RES_E_FAIL
+
+
+def test_serves_bar_store(tmp_path, clock):
+    store = BarStore(tmp_path)
+    bars = make_bars(500, 4, start='2024-03-11')
+    store.append('EURUSD', 5, bars)
+
+    mt5_sim.configure(bar_store=store, clock=lambda: clock['now'])
+    provider = make_provider()
+    data = provider.get_historical_data('EURUSD', 5, datetime(2024, 3, 11), datetime(2024, 3, 13))
+    pd.testing.assert_frame_equal(data, bars, check_freq=False, check_names=False, check_dtype=False)
+    assert mt5_sim.symbol_info_tick('EURUSD').bid == bars['Close'].iloc[-1]
+
+
+def test_trading_loop_against_simulator(clock):
+    terminal = mt5_sim.configure(latency=0.001, jitter=0.0005, clock=lambda: clock['now'])
+    provider = make_provider()
+    executor = MT5Executor(provider)
+    strategy = EMAVWAPStrategy()
+
+    def analyze(symbol):
+        data = provider.get_historical_data(symbol, 5, datetime(2024, 3, 6), datetime(2024, 3, 13, 12))
+        strategy.get_current_signal(data, symbol)
+        return mt5_sim.symbol_info(symbol)
+
+    def execute(symbol, info):
+        # Stop larghi su entrambi i lati del prezzo corrente
+        width = 500 * info.point
+        executor.execute_trade(symbol, 'long', 0.1, info.bid - width, info.ask + 2 * width)
+
+    loop = TradingLoop(max_workers=4)
+    symbols = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD']
+    asyncio.run(loop.run_cycle(symbols, analyze, execute))
+    loop.close()
+
+    assert sorted(executor.get_active_positions()) == sorted(symbols)
+    assert len(mt5_sim.positions_get()) == 4
+    assert terminal.get_statistics()['calls']['copy_rates_range'] == 4
+
+
+def test_paper_cycle_sees_only_closed_bars(clock):
+    # Sveglia 2 secondi dopo la chiusura delle 12:00: il terminale ha già la barra delle 12:00 in formazione
+    clock['now'] = NOW + 2
+    mt5_sim.configure(clock=lambda: clock['now'])
+    provider = make_provider()
+    loop = TradingLoop(max_workers=2)
+    windows = {}
+
+    def analyze(symbol):
+        fetched = provider.get_historical_data(symbol, 5, loop.bar_close - timedelta(days=7), loop.bar_close)
+        windows[symbol] = (fetched, closed_bars(fetched, loop.bar_close, 5))
+        return None
+
+    close = datetime(2024, 3, 13, 12, 0)
+    asyncio.run(loop.run_cycle(['EURUSD', 'GBPUSD'], analyze, lambda symbol, result: None, close))
+    loop.close()
+
+    for fetched, window in windows.values():
+        assert fetched.index[-1] == pd.Timestamp(close)
+        assert window.index[-1] == pd.Timestamp(close) - pd.Timedelta(minutes=5)
+        pd.testing.assert_frame_equal(window, fetched.iloc[:-1])
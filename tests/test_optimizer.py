@@ -0,0 +1,114 @@
+import pytest
+import pandas as pd
+import numpy as np
+from src.backtest.optimizer import DEFAULT_GRID, ParameterOptimizer, expand_grid, load_grid
+from src.analytics.performance import periods_per_year, sharpe_ratio, simple_returns
+from src.backtest.vectorized import VectorizedBacktester
+
+
+SMALL_GRID = {
+    'ema_fast': [5, 9],
+    'ema_slow': [9, 21],
+    'atr_period': [14],
+    'atr_sl_multiplier': [1.5, 2.0],
+    'atr_tp_multiplier': [3.0],
+}
+
+
+def make_data(seed, periods=1500):
+    dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+    rng = np.random.default_rng(seed)
+    close = 1.09 + np.cumsum(rng.normal(0, 0.0004, periods))
+    open_ = np.concatenate(([1.09], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0002, periods))
+    
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, periods)
+    }, index=dates)
+
+
+@pytest.fixture
+def symbols_data():
+    return {'EURUSD': make_data(1), 'GBPUSD': make_data(2)}
+
+
+def test_expand_grid_skips_invalid_ema():
+    combinations = expand_grid(SMALL_GRID)
+    
+    # (9, 9) viene scartata
+    assert len(combinations) == 6
+    assert all(c['ema_fast'] < c['ema_slow'] for c in combinations)
+
+
+def test_load_grid():
+    grid = load_grid('{"ema_fast": [5, 9], "atr_period": 14}')
+    
+    assert grid == {'ema_fast': [5, 9], 'atr_period': [14]}
+    
+    with pytest.raises(ValueError):
+        load_grid('{"unknown": [1]}')
+
+
+def test_partial_grid_keeps_strategy_defaults():
+    optimizer = ParameterOptimizer(grid={'ema_fast': [5, 9]})
+    
+    # Solo gli assi indicati vengono esplorati
+    assert optimizer.grid == {
+        'ema_fast': [5, 9],
+        'ema_slow': [21],
+        'atr_period': [14],
+        'atr_sl_multiplier': [2.0],
+        'atr_tp_multiplier': [3.0],
+    }
+    assert len(expand_grid(optimizer.grid)) == 2
+    assert ParameterOptimizer().grid == DEFAULT_GRID
+
+
+def test_rank_by_sharpe(symbols_data):
+    optimizer = ParameterOptimizer(grid=SMALL_GRID, workers=1)
+    table = optimizer.run(symbols_data, rank_by='sharpe_ratio')
+    
+    # Pochi giorni di dati: lo Sharpe per barra è comunque definito
+    assert table['sharpe_ratio'].notna().all()
+    assert table['sharpe_ratio'].is_monotonic_decreasing
+    
+    row = optimizer.results.iloc[0]
+    backtester = VectorizedBacktester()
+    backtester.run(symbols_data[row['symbol']], {**{name: row[name] for name in SMALL_GRID}, 'risk_percent': 1.0})
+    equity = backtester.equity_curve
+    expected = sharpe_ratio(simple_returns(equity.to_numpy(), 10000.0), periods_per_year(equity.index))
+    assert row['sharpe_ratio'] == pytest.approx(expected)
+    
+    with pytest.raises(ValueError):
+        ParameterOptimizer.rank(optimizer.results.assign(sharpe_ratio=None), 'sharpe_ratio')
+
+
+def test_optimizer_matches_single_backtest(symbols_data):
+    optimizer = ParameterOptimizer(grid=SMALL_GRID, workers=1)
+    table = optimizer.run(symbols_data)
+    
+    assert len(table) == 6
+    assert list(table['rank']) == list(range(1, 7))
+    assert table['total_return'].is_monotonic_decreasing
+    assert (table['symbols'] == 2).all()
+    
+    # Gli indicatori in cache danno lo stesso risultato del percorso standard
+    row = optimizer.results.iloc[0]
+    params = {name: row[name] for name in SMALL_GRID}
+    expected = VectorizedBacktester().run(
+        symbols_data[row['symbol']],
+        {**params, 'risk_percent': 1.0}
+    )
+    assert row['final_value'] == pytest.approx(expected['final_value'])
+    assert row['total_trades'] == expected['total_trades']
+
+
+def test_optimizer_process_pool(symbols_data):
+    serial = ParameterOptimizer(grid=SMALL_GRID, workers=1).run(symbols_data)
+    parallel = ParameterOptimizer(grid=SMALL_GRID, workers=2).run(symbols_data)
+    
+    pd.testing.assert_frame_equal(serial, parallel)
@@ -0,0 +1,41 @@
+import os
+import pytest
+from src.backtest.parallel import run_per_symbol
+from src.backtest.vectorized import VectorizedBacktester
+from tests.test_portfolio import make_bars
+
+
+def backtest(symbol, periods):
+    # Carica i "dati" nel worker, come backtest_symbol_worker
+    if symbol == 'BROKEN':
+        raise ValueError("no data")
+    seed = sum(map(ord, symbol))
+    results = VectorizedBacktester().run(make_bars(periods, seed))
+    return {**results, 'pid': os.getpid()}
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_run_per_symbol_matches_serial(workers):
+    symbols = ['EURUSD', 'GBPUSD', 'USDJPY']
+    
+    results = dict(run_per_symbol(backtest, symbols, 1500, workers=workers))
+    expected = {symbol: backtest(symbol, 1500) for symbol in symbols}
+    
+    assert set(results) == set(symbols)
+    for symbol in symbols:
+        assert results[symbol]['final_value'] == pytest.approx(expected[symbol]['final_value'])
+        assert results[symbol]['total_trades'] == expected[symbol]['total_trades']
+    
+    pids = {result['pid'] for result in results.values()}
+    if workers == 1:
+        assert pids == {os.getpid()}
+    else:
+        assert os.getpid() not in pids
+
+
+def test_failed_symbol_does_not_stop_others():
+    results = dict(run_per_symbol(backtest, ['EURUSD', 'BROKEN', 'GBPUSD'], 500, workers=2))
+    
+    assert results['BROKEN'] is None
+    assert results['EURUSD']['total_trades'] >= 0
+    assert results['GBPUSD'] is not None
@@ -0,0 +1,125 @@
+import pytest
+import pandas as pd
+import numpy as np
+from src.backtest.vectorized import VectorizedBacktester
+from src.backtest.portfolio import PortfolioBacktester
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+
+
+def make_bars(periods, seed, start='2024-01-01'):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start=start, periods=periods, freq='5min')
+    close = 1.09 + np.cumsum(rng.normal(0, 0.0004, periods))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0003, periods))
+    
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, periods).astype(float)
+    }, index=dates)
+
+
+@pytest.fixture
+def portfolio_data():
+    # Simboli con storici non allineati: GBPUSD parte più tardi
+    return {
+        'EURUSD': make_bars(3000, 0),
+        'GBPUSD': make_bars(2500, 1, start='2024-01-02 17:40'),
+        'USDJPY': make_bars(3000, 2),
+        'AUDUSD': make_bars(3000, 3),
+    }
+
+
+def test_single_symbol_matches_vectorized():
+    data = make_bars(3000, 5)
+    vectorized = VectorizedBacktester()
+    expected = vectorized.run(data)
+    
+    portfolio = PortfolioBacktester(max_positions=1, max_drawdown=100.0)
+    results = portfolio.run({'EURUSD': data})
+    
+    for key in ['final_value', 'max_drawdown', 'total_trades', 'won_trades', 'win_rate']:
+        assert results[key] == pytest.approx(expected[key])
+    assert np.allclose(portfolio.equity_curve.to_numpy(), vectorized.equity_curve.to_numpy())
+    assert results['symbols']['EURUSD']['total_trades'] == expected['total_trades']
+
+
+def test_max_positions_respected(portfolio_data):
+    portfolio = PortfolioBacktester(max_positions=2)
+    results = portfolio.run(portfolio_data)
+    trades = portfolio.trades
+    
+    # Posizioni aperte a ogni ingresso, contando quelle non ancora chiuse
+    for entry_time in trades['entry_time']:
+        open_trades = ((trades['entry_time'] <= entry_time) & (trades['exit_time'] > entry_time)).sum()
+        assert open_trades <= 2
+    
+    assert results['blocked_signals'] > 0
+    assert results['total_trades'] == sum(s['total_trades'] for s in results['symbols'].values())
+    assert results['final_value'] == pytest.approx(
+        portfolio.initial_capital + trades['pnlcomm'].sum()
+    )
+    assert set(trades['symbol']) == set(portfolio_data)
+
+
+def test_unconstrained_symbols_trade_independently(portfolio_data):
+    # Senza limiti ogni simbolo apre e chiude negli stessi istanti del
+    # backtest singolo; cambia solo il capitale su cui si dimensiona
+    portfolio = PortfolioBacktester(max_positions=len(portfolio_data), max_drawdown=100.0)
+    results = portfolio.run(portfolio_data)
+    
+    assert results['blocked_signals'] == 0
+    for symbol, data in portfolio_data.items():
+        vectorized = VectorizedBacktester()
+        vectorized.run(data)
+        trades = portfolio.trades[portfolio.trades['symbol'] == symbol]
+        assert list(trades['entry_time']) == list(vectorized.trades['entry_time'])
+        assert list(trades['exit_time']) == list(vectorized.trades['exit_time'])
+
+
+def test_drawdown_stop_blocks_entries(portfolio_data):
+    # Soglia minima: dopo la prima perdita realizzata non si apre più nulla
+    portfolio = PortfolioBacktester(max_positions=1, max_drawdown=0.0001)
+    results = portfolio.run(portfolio_data)
+    trades = portfolio.trades
+    
+    first_loss = trades[trades['pnlcomm'] < 0]['exit_time'].min()
+    assert (trades['entry_time'] <= first_loss).all()
+    assert results['blocked_signals'] > 0
+
+
+def candidate_times(data):
+    # Barre con segnale su cui il motore proverebbe a entrare
+    strategy = EMAVWAPStrategy()
+    signals = strategy.generate_signals(data)
+    atr = signals['ATR'].to_numpy()
+    valid = ~np.isnan(atr) & (atr > 0)
+    valid[:max(strategy.ema_slow, strategy.atr_period + 1) - 1] = False
+    fire = ((signals['Long_Signal'] | signals['Short_Signal']).to_numpy() & valid)[:-1]
+    return data.index[:-1][fire]
+
+
+def test_blocked_signals_count_every_skipped_signal(portfolio_data):
+    # Ogni segnale è un ingresso, cade dentro un trade già aperto dello
+    # stesso simbolo o è bloccato dai limiti di rischio
+    portfolio = PortfolioBacktester(max_positions=2)
+    results = portfolio.run({symbol: portfolio_data[symbol] for symbol in ['EURUSD', 'USDJPY']})
+    
+    for symbol in ['EURUSD', 'USDJPY']:
+        candidates = candidate_times(portfolio_data[symbol])
+        trades = portfolio.trades[portfolio.trades['symbol'] == symbol]
+        inside = sum(
+            ((candidates >= entry) & (candidates < exit)).sum()
+            for entry, exit in zip(trades['entry_time'], trades['exit_time'])
+        )
+        assert results['symbols'][symbol]['blocked_signals'] == len(candidates) - len(trades) - inside
+    
+    # Stop sul drawdown: dopo la prima perdita tutti i segnali restano bloccati
+    data = portfolio_data['EURUSD']
+    portfolio = PortfolioBacktester(max_positions=1, max_drawdown=0.0001)
+    results = portfolio.run({'EURUSD': data})
+    first_loss = portfolio.trades[portfolio.trades['pnlcomm'] < 0]['exit_time'].min()
+    assert results['blocked_signals'] == (candidate_times(data) >= first_loss).sum()
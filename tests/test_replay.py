@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
+from src.risk.manager import RiskManager
+from src.execution.paper_trader import PaperTrader
+from src.execution.paper_session import PaperSession
+from src.execution.replay import ReplayEngine, SimulatedClock
+from src.execution.scheduler import closed_bars
+
+
+def make_bars(n, seed, start='2024-01-01'):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n, freq='5min')
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0004, n))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0003, n))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(1, 100, n).astype(float)
+    }, index=index)
+
+
+def make_session(clock=None):
+    paper_trader = PaperTrader(clock=clock.datetime) if clock else PaperTrader()
+    return PaperSession(EMAVWAPStrategy(), RiskManager(), paper_trader)
+
+
+@pytest.fixture
+def data():
+    return {'EURUSD': make_bars(1500, 0), 'GBPUSD': make_bars(1500, 1)}
+
+
+def test_replay_matches_paper_loop(data):
+    clock = SimulatedClock(data['EURUSD'].index[0].timestamp())
+    session = make_session(clock)
+    result = ReplayEngine(session, data, 5, clock).run()
+    
+    # Stesso ciclo del paper trading: il provider restituisce anche la barra
+    # appena aperta e closed_bars la scarta, come il replay
+    manual = make_session()
+    for close in data['EURUSD'].index[1:].append(pd.DatetimeIndex([data['EURUSD'].index[-1] + pd.Timedelta(minutes=5)])):
+        for symbol, df in data.items():
+            fetched = df[(df.index >= close - pd.Timedelta(days=7)) & (df.index <= close)]
+            window = closed_bars(fetched, close.to_pydatetime(), 5)
+            assert window.index[-1] == close - pd.Timedelta(minutes=5)
+            analysis = manual.analyze(symbol, window)
+            if analysis is not None:
+                manual.execute(symbol, analysis)
+    
+    replayed = session.paper_trader.closed_trades.to_frame()
+    expected = manual.paper_trader.closed_trades.to_frame()
+    
+    assert result['bars'] == 2 * (1500 - 49)
+    assert len(replayed) > 0
+    assert list(replayed['symbol']) == list(expected['symbol'])
+    assert np.allclose(replayed['profit'], expected['profit'])
+    assert session.paper_trader.capital == pytest.approx(manual.paper_trader.capital)
+
+
+def test_replay_uses_simulated_time(data):
+    start = data['EURUSD'].index[0]
+    clock = SimulatedClock(start.timestamp())
+    session = make_session(clock)
+    ReplayEngine(session, data, 5, clock, offset=2.0).run()
+    
+    trades = session.paper_trader.closed_trades.to_frame()
+    end = data['EURUSD'].index[-1] + pd.Timedelta(minutes=10)
+    
+    # Il tempo simulato avanza fino alla fine dei dati, senza attese reali
+    assert clock.datetime() > data['EURUSD'].index[-1]
+    assert (trades['entry_time'] >= start).all()
+    assert (trades['exit_time'] <= end).all()
+    assert (trades['exit_time'] >= trades['entry_time']).all()
+
+
+def test_session_releases_risk_slots():
+    session = make_session()
+    session.strategy.get_current_signal = lambda data, symbol: {
+        'direction': 'long', 'entry_price': 1.09, 'sl': 1.089, 'tp': 1.0915
+    }
+    bars = make_bars(60, 0)
+    
+    session.execute('EURUSD', session.analyze('EURUSD', bars.iloc[:-1]))
+    assert session.risk_manager.current_positions == 1
+    
+    # La barra successiva tocca il TP: posizione chiusa e slot liberato
+    session.execute('EURUSD', {'time': bars.index[-1], 'high': 1.0920, 'low': 1.0895, 'signal': None})
+    assert session.paper_trader.get_open_positions('EURUSD') == []
+    assert session.risk_manager.current_positions == 0
+    assert session.risk_manager.capital > 10000.0
+    
+    # Stessa barra rianalizzata: nessun nuovo segnale
+    session.analyze('EURUSD', bars)
+    assert session.analyze('EURUSD', bars) is None
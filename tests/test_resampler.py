@@ -0,0 +1,49 @@
+import pytest
+import pandas as pd
+import numpy as np
+from src.data.mmap_bars import MmapBars
+from src.data.resampler import resample_bars
+
+
+@pytest.fixture
+def m1_data():
+    # Due giorni di M1 con un buco (barre mancanti come nel weekend)
+    dates = pd.date_range(start='2024-01-01 00:03', periods=2880, freq='1min')
+    dates = dates.delete(slice(600, 700))
+    rng = np.random.default_rng(5)
+    close = 1.09 + np.cumsum(rng.normal(0, 0.0001, len(dates)))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.00005, len(dates)),
+        'High': close + 0.0003,
+        'Low': close - 0.0003,
+        'Close': close,
+        'Volume': rng.integers(1, 100, len(dates)).astype(float)
+    }, index=dates)
+
+
+@pytest.mark.parametrize('timeframe', [5, 15, 30, 60])
+def test_matches_pandas_resample(m1_data, timeframe):
+    expected = m1_data.resample(f'{timeframe}min').agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum'
+    }).dropna()
+    
+    result = resample_bars(m1_data, timeframe)
+    
+    pd.testing.assert_frame_equal(result, expected, check_names=False, check_freq=False)
+    # Confini allineati come le barre del broker
+    assert (result.index.minute % timeframe == 0).all()
+
+
+def test_resample_mmap_bars(tmp_path, m1_data):
+    bars = MmapBars.write(tmp_path / "m1", m1_data)
+    
+    pd.testing.assert_frame_equal(resample_bars(bars, 15), resample_bars(m1_data, 15))
+
+
+def test_rejects_incompatible_timeframe(m1_data):
+    with pytest.raises(ValueError):
+        resample_bars(m1_data, 7, base_timeframe=5)
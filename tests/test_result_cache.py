@@ -0,0 +1,122 @@
+import os
+import time
+import pytest
+import pandas as pd
+from src.backtest import result_cache
+from src.backtest.backtester import Backtester
+from src.backtest.result_cache import ResultCache, hash_bars
+from src.backtest.optimizer import ParameterOptimizer
+from src.backtest.vectorized import VectorizedBacktester
+from src.data.mmap_bars import MmapBars
+from tests.test_portfolio import make_bars
+
+
+PARAMS = {'ema_fast': 9, 'ema_slow': 21, 'risk_percent': 1.0}
+
+
+class CountingBacktester(VectorizedBacktester):
+    runs = 0
+    
+    def run(self, data, strategy_params=None):
+        CountingBacktester.runs += 1
+        return super().run(data, strategy_params)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+
+def test_cache_hit_skips_backtest(cache):
+    data = make_bars(1500, 0)
+    CountingBacktester.runs = 0
+    
+    first = cache.run(CountingBacktester(), data, PARAMS)
+    second = cache.run(CountingBacktester(), data.copy(), PARAMS)
+    
+    assert CountingBacktester.runs == 1
+    assert second == first
+    assert cache.hits == 1
+    
+    # Parametri, commissioni o dati diversi sono chiavi diverse
+    cache.run(CountingBacktester(), data, {**PARAMS, 'ema_fast': 5})
+    cache.run(CountingBacktester(commission=0.0002), data, PARAMS)
+    cache.run(CountingBacktester(), make_bars(1500, 1), PARAMS)
+    assert CountingBacktester.runs == 4
+
+
+def test_hash_bars_content_addressed(tmp_path):
+    data = make_bars(500, 0)
+    mmap = MmapBars.write(tmp_path / "bars", data)
+    changed = data.copy()
+    changed.iloc[100, changed.columns.get_loc('Close')] += 0.0001
+    
+    assert hash_bars(mmap) == hash_bars(data)
+    assert hash_bars(changed) != hash_bars(data)
+    assert hash_bars({'EURUSD': data}) != hash_bars({'GBPUSD': data})
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_size_mb=0.05)
+    payload = 'x' * 10_000
+    
+    for i in range(4):
+        cache.put(f"{i:02d}" * 32, {'payload': payload})
+        os.utime(cache._path(f"{i:02d}" * 32), (time.time() - 100 + i, time.time() - 100 + i))
+    # Lettura di 00: diventa il più recente
+    assert cache.get("00" * 32) is not None
+    
+    for i in range(4, 6):
+        cache.put(f"{i:02d}" * 32, {'payload': payload})
+    
+    assert cache.size() <= cache.max_bytes
+    assert cache.get("00" * 32) is not None
+    assert cache.get("01" * 32) is None
+
+
+def test_rewritten_key_is_counted_once(cache):
+    for _ in range(3):
+        cache.put("ab" * 32, {'payload': 'x' * 1000})
+    
+    assert cache._size == cache.size()
+
+
+def test_source_hash_covers_imported_modules(monkeypatch):
+    hashed = []
+    getsource = result_cache.inspect.getsource
+    
+    def recording(module):
+        hashed.append(module.__name__)
+        return getsource(module)
+    
+    monkeypatch.setattr(result_cache.inspect, 'getsource', recording)
+    result_cache.source_hash.__wrapped__(Backtester)
+    
+    # Il feed NumPy non è tra le basi del motore ma ne cambia i risultati
+    assert 'src.backtest.numpy_feed' in hashed
+    assert 'src.backtest.backtester' in hashed
+
+
+def test_invalidate(cache):
+    data = make_bars(500, 0)
+    cache.run(VectorizedBacktester(), data, PARAMS)
+    
+    assert cache.invalidate() == 1
+    assert cache.size() == 0
+
+
+def test_optimizer_reuses_cached_combinations(cache):
+    data = {'EURUSD': make_bars(1500, 0), 'GBPUSD': make_bars(1500, 1)}
+    grid = {'ema_fast': [5, 9], 'ema_slow': [21], 'atr_period': [14],
+            'atr_sl_multiplier': [2.0], 'atr_tp_multiplier': [3.0]}
+    
+    ParameterOptimizer(grid=grid, workers=1, cache=cache).run(data)
+    assert cache.hits == 0
+    
+    # Un nuovo valore su un asse: solo le nuove combinazioni vengono eseguite
+    wider = {**grid, 'atr_tp_multiplier': [3.0, 4.0]}
+    table = ParameterOptimizer(grid=wider, workers=1, cache=cache).run(data)
+    expected = ParameterOptimizer(grid=wider, workers=1).run(data)
+    
+    assert cache.hits == 4
+    pd.testing.assert_frame_equal(table, expected)
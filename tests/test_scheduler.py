@@ -0,0 +1,83 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from src.data.mmap_bars import MmapBars
+from src.execution.scheduler import BarCloseScheduler, closed_bars
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock, timeframes, offset=2.0):
+    return BarCloseScheduler(timeframes, offset=offset, clock=clock.time, sleep=clock.sleep)
+
+
+def test_wakes_at_bar_close_plus_offset():
+    # 2024-01-01 00:01:10 UTC
+    clock = FakeClock(1704067270.0)
+    scheduler = make_scheduler(clock, {'EURUSD': 5})
+    
+    bar_close = scheduler.wait()
+    
+    assert clock.now == 1704067500.0 + 2.0
+    assert bar_close['close_time'] == datetime(2024, 1, 1, 0, 5)
+    assert bar_close['symbols'] == ['EURUSD']
+    assert bar_close['lag'] == 0.0
+    
+    scheduler.wait()
+    assert clock.now == 1704067800.0 + 2.0
+
+
+def test_only_symbols_with_closed_bar():
+    clock = FakeClock(1704067200.0 + 10)
+    scheduler = make_scheduler(clock, {'EURUSD': 5, 'GBPUSD': 15})
+    
+    symbols = [scheduler.wait()['symbols'] for _ in range(3)]
+    
+    assert symbols == [['EURUSD'], ['EURUSD'], ['EURUSD', 'GBPUSD']]
+
+
+def test_reports_lag_and_skipped_bars():
+    clock = FakeClock(1704067200.0 + 10)
+    scheduler = make_scheduler(clock, {'EURUSD': 1})
+    scheduler.wait()
+    
+    # Il ciclo è durato 2.5 barre: si salta all'ultima chiusura
+    clock.now += 150
+    bar_close = scheduler.wait()
+    
+    assert bar_close['skipped'] == 1
+    assert bar_close['close_time'] == datetime(2024, 1, 1, 0, 3)
+    assert bar_close['lag'] == pytest.approx(30.0)
+    assert scheduler.get_statistics()['max_lag'] == pytest.approx(30.0)
+
+
+def test_closed_bars_window(tmp_path):
+    index = pd.date_range('2024-03-11 00:00', periods=300, freq='5min')
+    bars = pd.DataFrame({name: np.arange(300.0) for name in ['Open', 'High', 'Low', 'Close', 'Volume']}, index=index)
+    close = datetime(2024, 3, 11, 12, 0)
+
+    # La barra aperta alla chiusura (e le successive) resta fuori
+    window = closed_bars(bars, close, 5, lookback=timedelta(hours=2))
+    assert window.index[0] == pd.Timestamp('2024-03-11 10:00')
+    assert window.index[-1] == pd.Timestamp('2024-03-11 11:55')
+    assert len(window) == 24
+
+    # Stessa finestra su MmapBars
+    mmap = closed_bars(MmapBars.write(tmp_path / 'bars', bars), close, 5, lookback=timedelta(hours=2))
+    np.testing.assert_array_equal(mmap['Close'].to_numpy(), window['Close'].to_numpy())
+
+    # Manca la barra appena chiusa: nessuna finestra
+    assert closed_bars(bars.drop(pd.Timestamp('2024-03-11 11:55')), close, 5) is None
+    assert closed_bars(None, close, 5) is None
@@ -3,7 +3,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from src.strategy.ema_vwap_strategy import EMAVWAPStrategy
-from src.strategy.indicators import calculate_ema, calculate_vwap, calculate_atr
+from src.strategy.indicators import align_panel, calculate_ema, calculate_vwap, calculate_atr
 
 
 @pytest.fixture
@@ -102,4 +102,104 @@ def test_get_current_signal(sample_data):
         assert 'sl' in signal
         assert 'tp' in signal
         assert 'atr' in signal
-        assert signal['direction'] in ['long', 'short']
\ No newline at end of file
+        assert signal['direction'] in ['long', 'short']
+
+def test_streaming_indicators_match_batch(sample_data):
+    strategy = EMAVWAPStrategy()
+    batch = strategy.generate_signals(sample_data)
+    
+    # Prima finestra, poi una barra alla volta
+    for end in range(60, len(sample_data) + 1):
+        state = strategy.indicator_engine.update('EURUSD', sample_data.iloc[:end])
+        current = state.current()
+        expected = batch.iloc[end - 1]
+        for column in ['EMA_Fast', 'EMA_Slow', 'VWAP', 'ATR']:
+            assert np.isclose(current[column], expected[column])
+
+
+def test_streaming_indicators_reapply_revised_last_bar(sample_data):
+    strategy = EMAVWAPStrategy()
+    data = sample_data.astype({'Volume': float})
+
+    # Ultima barra in formazione: cambia due volte prima di chiudersi,
+    # poi arrivano le barre successive
+    revised = data.iloc[:80].copy()
+    windows = [data.iloc[:80]]
+    for delta in (0.002, -0.001):
+        revised = revised.copy()
+        revised.iloc[-1, revised.columns.get_indexer(['High', 'Low', 'Close'])] += delta
+        revised.iloc[-1, revised.columns.get_loc('Volume')] += 50
+        windows.append(revised)
+    windows.append(pd.concat([revised, data.iloc[80:90]]))
+
+    for window in windows:
+        state = strategy.indicator_engine.update('EURUSD', window)
+        expected = strategy.generate_signals(window)
+        for column in ['EMA_Fast', 'EMA_Slow', 'VWAP', 'ATR']:
+            assert np.isclose(state.current()[column], expected[column].iloc[-1])
+            assert np.isclose(state.previous()[column], expected[column].iloc[-2])
+
+
+def test_streaming_signal_matches_batch_on_sliding_window():
+    dates = pd.date_range(start='2024-01-01', periods=400, freq='5min')
+    np.random.seed(7)
+    close = 1.09 + np.cumsum(np.random.normal(0, 0.0005, 400))
+    data = pd.DataFrame({
+        'Open': close,
+        'High': close + 0.0003,
+        'Low': close - 0.0003,
+        'Close': close,
+        'Volume': np.random.randint(100, 1000, 400)
+    }, index=dates)
+    
+    batch_strategy = EMAVWAPStrategy()
+    streaming_strategy = EMAVWAPStrategy()
+    signals = 0
+    
+    # Finestra mobile di 200 barre, come il refetch del loop live
+    for end in range(200, len(data) + 1):
+        window = data.iloc[end - 200:end]
+        expected = batch_strategy.get_current_signal(window)
+        signal = streaming_strategy.get_current_signal(window, 'EURUSD')
+        
+        assert (signal is None) == (expected is None)
+        if signal is not None:
+            signals += 1
+            assert signal['direction'] == expected['direction']
+            assert signal['sl'] == expected['sl']
+            assert signal['tp'] == expected['tp']
+    
+    assert signals > 0
+
+
+def test_panel_signals_match_per_symbol():
+    data = {}
+    for seed, start in [(1, '2024-01-01'), (2, '2024-01-01 06:00'), (3, '2024-01-01')]:
+        dates = pd.date_range(start=start, periods=600, freq='5min')
+        rng = np.random.default_rng(seed)
+        close = 1.09 + np.cumsum(rng.normal(0, 0.0005, 600))
+        data[f'S{seed}'] = pd.DataFrame({
+            'Open': close,
+            'High': close + 0.0003,
+            'Low': close - 0.0003,
+            'Close': close,
+            'Volume': rng.integers(100, 1000, 600)
+        }, index=dates)
+    # Barre mancanti su un solo simbolo
+    data['S3'] = data['S3'].drop(data['S3'].index[50:200:4])
+    
+    strategy = EMAVWAPStrategy()
+    index, symbols, panel = align_panel(data)
+    signals = strategy.generate_panel_signals(panel)
+    
+    assert signals['Close'].shape == (len(index), 3)
+    for j, symbol in enumerate(symbols):
+        expected = strategy.generate_signals(data[symbol])
+        rows = index.get_indexer(expected.index)
+        for column in ['EMA_Fast', 'EMA_Slow', 'VWAP', 'ATR']:
+            np.testing.assert_array_equal(signals[column][rows, j], expected[column].to_numpy())
+        for column in ['Long_Signal', 'Short_Signal', 'Long_Entry', 'Short_Entry']:
+            np.testing.assert_array_equal(signals[column][rows, j], expected[column].to_numpy())
+        # Nessun segnale sulle barre mancanti
+        missing = np.setdiff1d(np.arange(len(index)), rows)
+        assert not signals['Long_Signal'][missing, j].any()
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+from src.execution.trading_loop import TradingLoop
+
+
+def test_symbols_analyzed_concurrently():
+    loop = TradingLoop(max_workers=4)
+    symbols = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD']
+    
+    def analyze(symbol):
+        time.sleep(0.2)
+        return symbol
+    
+    executed = []
+    started = time.perf_counter()
+    results = asyncio.run(loop.run_cycle(symbols, analyze, lambda s, r: executed.append(s)))
+    elapsed = time.perf_counter() - started
+    loop.close()
+    
+    # Quattro analisi da 200ms in parallelo, non in sequenza
+    assert elapsed < 0.6
+    assert results == {s: s for s in symbols}
+    assert sorted(executed) == sorted(symbols)
+
+
+def test_execute_is_serialized():
+    loop = TradingLoop(max_workers=4)
+    symbols = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD']
+    state = {'open': 0, 'active': 0, 'overlap': False}
+    guard = threading.Lock()
+    max_positions = 2
+    
+    def execute(symbol, result):
+        with guard:
+            state['active'] += 1
+            if state['active'] > 1:
+                state['overlap'] = True
+        # Check-then-act come RiskManager.can_open_position
+        if state['open'] < max_positions:
+            time.sleep(0.05)
+            state['open'] += 1
+        with guard:
+            state['active'] -= 1
+    
+    asyncio.run(loop.run_cycle(symbols, lambda s: True, execute))
+    loop.close()
+    
+    assert not state['overlap']
+    assert state['open'] == max_positions
+
+
+def test_errors_do_not_stop_other_symbols():
+    loop = TradingLoop(max_workers=2)
+    executed = []
+    
+    def analyze(symbol):
+        if symbol == 'BAD':
+            raise RuntimeError("no data")
+        if symbol == 'NONE':
+            return None
+        return 1
+    
+    def execute(symbol, result):
+        if symbol == 'FAIL':
+            raise RuntimeError("order rejected")
+        executed.append(symbol)
+    
+    results = asyncio.run(loop.run_cycle(['BAD', 'NONE', 'FAIL', 'EURUSD'], analyze, execute))
+    loop.close()
+    
+    assert results['BAD'] is None
+    assert results['NONE'] is None
+    assert executed == ['EURUSD']
@@ -0,0 +1,125 @@
+import threading
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from src.data.twelvedata_downloader import TokenBucket, TwelveDataDownloader
+
+
+class FakeTimeSeries:
+    def __init__(self, df):
+        self.df = df
+    
+    def as_pandas(self):
+        return self.df
+
+
+class FakeTDClient:
+    # Simula time_series: massimo outputsize barre, dalla più recente,
+    # senza colonna volume come per il forex
+    def __init__(self, periods=20000):
+        dates = pd.date_range(start='2024-01-01', periods=periods, freq='5min')
+        close = 1.09 + np.cumsum(np.random.default_rng(9).normal(0, 0.0004, periods))
+        self.bars = pd.DataFrame({
+            'open': close,
+            'high': close + 0.0002,
+            'low': close - 0.0002,
+            'close': close
+        }, index=dates)
+        self.calls = []
+        self.lock = threading.Lock()
+    
+    def time_series(self, symbol, interval, start_date, end_date, outputsize):
+        with self.lock:
+            self.calls.append((symbol, start_date, end_date))
+        df = self.bars.loc[start_date:end_date]
+        if df.empty:
+            raise Exception("No data is available on the specified dates")
+        return FakeTimeSeries(df.iloc[-outputsize:].iloc[::-1])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.lock = threading.Lock()
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+
+def make_downloader(client, tmp_path, **kwargs):
+    clock = FakeClock()
+    bucket = TokenBucket(8, clock=clock.time, sleep=clock.sleep)
+    return TwelveDataDownloader(client, cache_dir=str(tmp_path / "td"), bucket=bucket, **kwargs)
+
+
+def test_long_range_is_not_truncated(tmp_path):
+    client = FakeTDClient()
+    downloader = make_downloader(client, tmp_path, chunk_size=1000)
+    
+    df = downloader.download('EURUSD', '5min', datetime(2024, 1, 2), datetime(2024, 2, 5))
+    
+    expected = client.bars.loc[datetime(2024, 1, 2):datetime(2024, 2, 5)]
+    assert len(df) == len(expected) > 5000
+    assert df.index.is_monotonic_increasing
+    assert not df.index.duplicated().any()
+    np.testing.assert_allclose(df['Close'].to_numpy(), expected['close'].to_numpy())
+    assert (df['Volume'] == 0).all()
+    assert client.calls[0][0] == 'EUR/USD'
+
+
+def test_rerun_is_served_from_cache(tmp_path):
+    client = FakeTDClient()
+    downloader = make_downloader(client, tmp_path, chunk_size=1000)
+    
+    first = downloader.download('EURUSD', '5min', datetime(2024, 1, 2), datetime(2024, 1, 20))
+    calls = len(client.calls)
+    
+    # Intervallo diverso ma negli stessi chunk: nessuna chiamata API
+    second = make_downloader(client, tmp_path, chunk_size=1000).download(
+        'EURUSD', '5min', datetime(2024, 1, 5), datetime(2024, 1, 10)
+    )
+    
+    assert len(client.calls) == calls
+    pd.testing.assert_frame_equal(second, first.loc[datetime(2024, 1, 5):datetime(2024, 1, 10)], check_freq=False)
+
+
+def test_empty_chunks_are_cached(tmp_path):
+    client = FakeTDClient(periods=3000)
+    downloader = make_downloader(client, tmp_path, chunk_size=1000)
+    
+    downloader.download('EURUSD', '5min', datetime(2024, 1, 1), datetime(2024, 2, 1))
+    calls = len(client.calls)
+    downloader.download('EURUSD', '5min', datetime(2024, 1, 1), datetime(2024, 2, 1))
+    
+    assert len(client.calls) == calls
+
+
+def test_failed_chunk_returns_none(tmp_path):
+    client = FakeTDClient()
+    original = client.time_series
+    
+    def flaky(symbol, interval, start_date, end_date, outputsize):
+        if start_date.startswith('2024-01-1'):
+            raise Exception("API credits exhausted")
+        return original(symbol, interval, start_date, end_date, outputsize)
+    
+    client.time_series = flaky
+    downloader = make_downloader(client, tmp_path, chunk_size=1000)
+    
+    assert downloader.download('EURUSD', '5min', datetime(2024, 1, 2), datetime(2024, 1, 25)) is None
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(8, clock=clock.time, sleep=clock.sleep)
+    
+    for _ in range(24):
+        bucket.acquire()
+    
+    # 8 crediti subito, poi 8 al minuto
+    assert clock.now == pytest.approx(120.0)
@@ -0,0 +1,100 @@
+import pytest
+import pandas as pd
+import numpy as np
+from src.backtest.optimizer import ParameterOptimizer, build_indicator_cache, window_vwap
+from src.backtest.walk_forward import WalkForwardOptimizer, walk_forward_windows
+from src.strategy.indicators import calculate_vwap
+from tests.test_portfolio import make_bars
+
+
+SMALL_GRID = {
+    'ema_fast': [5, 9],
+    'ema_slow': [21, 30],
+    'atr_period': [14],
+    'atr_sl_multiplier': [1.5, 2.0],
+    'atr_tp_multiplier': [3.0],
+}
+
+
+@pytest.fixture
+def symbols_data():
+    return {
+        'EURUSD': make_bars(12000, 0),
+        'GBPUSD': make_bars(10000, 1, start='2024-01-05'),
+    }
+
+
+def test_walk_forward_windows():
+    start = pd.Timestamp('2024-01-01')
+    windows = walk_forward_windows(start, pd.Timestamp('2024-03-15'), pd.Timedelta(days=30), pd.Timedelta(days=14))
+
+    assert windows[0] == (start, start + pd.Timedelta(days=30), start + pd.Timedelta(days=30), start + pd.Timedelta(days=44))
+    # Out-of-sample contigui fino alla fine dello storico
+    for previous, current in zip(windows, windows[1:]):
+        assert current[2] == previous[3]
+        assert current[1] - current[0] == pd.Timedelta(days=30)
+    assert windows[-1][3] == pd.Timestamp('2024-03-15')
+
+    anchored = walk_forward_windows(start, pd.Timestamp('2024-03-15'), pd.Timedelta(days=30), pd.Timedelta(days=14), anchored=True)
+    assert all(window[0] == start for window in anchored)
+
+
+def test_window_vwap_matches_recomputed():
+    bars = make_bars(3000, 2)
+    cache = build_indicator_cache(bars, {})
+
+    vwap = window_vwap(cache['vwap'], cache['cum_volume'], 1200, 2500)
+    expected = calculate_vwap(bars.iloc[1200:2500]).to_numpy()
+    np.testing.assert_allclose(vwap, expected, rtol=1e-10)
+
+
+def test_walk_forward_selects_in_sample_winner(symbols_data):
+    optimizer = WalkForwardOptimizer(
+        pd.Timedelta(days=14), pd.Timedelta(days=7), grid=SMALL_GRID, workers=1
+    )
+    folds = optimizer.run(symbols_data)
+
+    assert len(folds) > 2
+    assert list(folds['fold']) == list(range(len(folds)))
+    for fold, row in folds.iterrows():
+        table = ParameterOptimizer.rank(optimizer.in_sample[optimizer.in_sample['fold'] == fold])
+        assert row['ema_fast'] == table['ema_fast'].iloc[0]
+        assert row['ema_slow'] == table['ema_slow'].iloc[0]
+        assert row['is_total_return'] == table['total_return'].iloc[0]
+
+    # Equity out-of-sample concatenata: parte dal primo test e arriva a fine storico
+    equity = optimizer.equity['EURUSD']
+    assert equity.index[0] == folds['test_start'].iloc[0]
+    assert equity.index[-1] == symbols_data['EURUSD'].index[-1]
+    assert equity.index.is_monotonic_increasing
+    summary = optimizer.summary.set_index('symbol')
+    assert summary.loc['EURUSD', 'final_value'] == pytest.approx(equity.iloc[-1])
+    assert summary.loc['EURUSD', 'total_trades'] == (optimizer.trades['symbol'] == 'EURUSD').sum()
+
+
+def test_walk_forward_process_pool(symbols_data):
+    serial = WalkForwardOptimizer(pd.Timedelta(days=14), pd.Timedelta(days=7), grid=SMALL_GRID, workers=1)
+    parallel = WalkForwardOptimizer(pd.Timedelta(days=14), pd.Timedelta(days=7), grid=SMALL_GRID, workers=2)
+
+    pd.testing.assert_frame_equal(serial.run(symbols_data), parallel.run(symbols_data))
+    pd.testing.assert_frame_equal(serial.summary, parallel.summary)
+
+
+def test_walk_forward_rank_by_sharpe(symbols_data):
+    # Prezzi piatti nel primo in-sample: nessun trade, Sharpe non definito
+    for bars in symbols_data.values():
+        flat = bars.index < pd.Timestamp('2024-01-15')
+        bars.loc[flat, ['Open', 'High', 'Low', 'Close']] = 1.09
+
+    optimizer = WalkForwardOptimizer(pd.Timedelta(days=14), pd.Timedelta(days=7), grid=SMALL_GRID, workers=1)
+    folds = optimizer.run(symbols_data, rank_by='sharpe_ratio')
+
+    # Il fold senza Sharpe ripiega sul rendimento, gli altri ordinano per Sharpe
+    first = optimizer.in_sample[optimizer.in_sample['fold'] == 0]
+    assert first['sharpe_ratio'].isna().all()
+    assert np.isnan(folds['is_sharpe_ratio'].iloc[0])
+    assert folds['ema_fast'].iloc[0] == ParameterOptimizer.rank(first)['ema_fast'].iloc[0]
+    for fold, row in folds.iloc[1:].iterrows():
+        table = ParameterOptimizer.rank(optimizer.in_sample[optimizer.in_sample['fold'] == fold], 'sharpe_ratio')
+        assert row['is_sharpe_ratio'] == table['sharpe_ratio'].iloc[0]
+        assert not np.isnan(row['is_sharpe_ratio'])